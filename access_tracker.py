@@ -0,0 +1,66 @@
+"""
+تتبع أوقات الوصول إلى المدخلات بالكتابة المؤجلة
+
+تُسجل أوقات الوصول في الذاكرة وتُكتب على دفعات بشكل دوري أو عند الطلب،
+فتبقى قراءة المدخل عملية قراءة فقط.
+"""
+import threading
+from datetime import datetime, timezone
+
+
+class AccessTracker:
+    """تسجيل أوقات الوصول في الذاكرة وكتابتها على دفعات"""
+
+    def __init__(self, write_batch, flush_interval=30.0):
+        """write_batch(accesses) تكتب قائمة من (timestamp, entry_id, user_id)"""
+        self._write_batch = write_batch
+        self.flush_interval = flush_interval
+
+        # (user_id, entry_id) -> آخر وقت وصول
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="access-tracker", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def timestamp():
+        """وقت الوصول بصيغة CURRENT_TIMESTAMP في SQLite (UTC)"""
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    def touch(self, user_id, entry_id):
+        """تسجيل وصول إلى مدخل"""
+        with self._lock:
+            self._pending[(user_id, entry_id)] = self.timestamp()
+
+    def flush(self):
+        """كتابة أوقات الوصول المعلقة؛ عند الفشل تبقى لإعادة المحاولة"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+
+            try:
+                self._write_batch([
+                    (timestamp, entry_id, user_id)
+                    for (user_id, entry_id), timestamp in pending.items()
+                ])
+            except Exception:
+                with self._lock:
+                    # الوصول الأحدث المسجل أثناء الكتابة له الأولوية
+                    pending.update(self._pending)
+                    self._pending = pending
+
+    def close(self):
+        """إيقاف الكتابة الدورية وكتابة المتبقي"""
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        """الكتابة الدورية من الخيط الخلفي"""
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
@@ -0,0 +1,78 @@
+"""
+الاحتفاظ بسجل التدقيق وأرشفته
+
+تُنقل السجلات الأقدم من مدة الاحتفاظ أو الزائدة عن الحد الأقصى للصفوف إلى
+جدول أرشيف مضغوط على دفعات صغيرة من خيط خلفي، فيبقى جدول audit_log صغيراً
+وسريعاً لعارض السجلات.
+"""
+import threading
+
+
+class AuditRetention:
+    """أرشفة سجل التدقيق تدريجياً في الخلفية"""
+
+    DEFAULT_MAX_AGE_DAYS = 180
+    DEFAULT_MAX_ROWS = 5000
+
+    def __init__(self, db, batch_size=500, pause=0.05):
+        """db: PasswordDatabase، وpause مهلة بين الدفعات لإفساح المجال للكتابة"""
+        self.db = db
+        self.batch_size = batch_size
+        self.pause = pause
+
+        # user_id -> (max_age_days, max_rows)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def schedule(self, user_id, max_age_days=None, max_rows=None):
+        """جدولة أرشفة سجلات مستخدم في الخلفية"""
+        with self._lock:
+            if self._stop.is_set():
+                return
+            self._jobs[user_id] = (
+                max_age_days or self.DEFAULT_MAX_AGE_DAYS,
+                max_rows or self.DEFAULT_MAX_ROWS
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-retention", daemon=True)
+                self._thread.start()
+
+    def run_once(self, user_id, max_age_days=None, max_rows=None):
+        """أرشفة جميع السجلات المستحقة لمستخدم بشكل متزامن وإرجاع عددها"""
+        max_age_days = max_age_days or self.DEFAULT_MAX_AGE_DAYS
+        max_rows = max_rows or self.DEFAULT_MAX_ROWS
+        total = 0
+
+        while not self._stop.is_set():
+            archived = self.db.archive_audit_logs(user_id, max_age_days, max_rows, self.batch_size)
+            total += archived
+            if archived < self.batch_size:
+                break
+            self._stop.wait(self.pause)
+
+        return total
+
+    def stop(self):
+        """إيقاف الأرشفة وانتظار انتهاء الدفعة الحالية"""
+        with self._lock:
+            self._stop.set()
+            thread = self._thread
+        if thread:
+            thread.join()
+
+    def _run(self):
+        """معالجة المهام المجدولة واحدة تلو الأخرى"""
+        while True:
+            with self._lock:
+                if not self._jobs or self._stop.is_set():
+                    self._thread = None
+                    return
+                user_id, (max_age_days, max_rows) = self._jobs.popitem()
+
+            try:
+                self.run_once(user_id, max_age_days, max_rows)
+            except Exception:
+                # تُعاد المحاولة عند الجدولة التالية (الدخول القادم)
+                continue
@@ -0,0 +1,115 @@
+"""
+كاتب سجل التدقيق غير المتزامن
+
+تُوضع السجلات في طابور ويكتبها خيط خلفي على دفعات في معاملة واحدة عند
+بلوغ حجم الدفعة أو انقضاء مهلة الحفظ، فلا تنتظر عمليات المستخدم الكتابة
+على القرص.
+"""
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+
+# علامة انتهاء مهلة الانتظار دون وصول سجل جديد
+_TIMEOUT = object()
+
+
+class _FlushRequest:
+    """طلب انتظار الكتابة مع نتيجتها"""
+
+    __slots__ = ('done', 'ok')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+
+
+class AuditWriter:
+    """كتابة سجلات التدقيق على دفعات من خيط خلفي"""
+
+    def __init__(self, write_batch, max_batch=100, flush_interval=1.0):
+        """write_batch(records) تكتب قائمة من
+        (user_id, action, details, ip_address, timestamp) في معاملة واحدة"""
+        self._write_batch = write_batch
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def timestamp():
+        """وقت الحدث بصيغة CURRENT_TIMESTAMP في SQLite (UTC)"""
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    def submit(self, user_id, action, details=None, ip_address=None, timestamp=None):
+        """إضافة سجل إلى الطابور دون انتظار الكتابة"""
+        if self._closed:
+            raise RuntimeError("كاتب سجل التدقيق مغلق")
+        self._queue.put((user_id, action, details, ip_address, timestamp or self.timestamp()))
+
+    def flush(self, timeout=None):
+        """انتظار كتابة جميع السجلات المرسلة قبل هذا الاستدعاء
+
+        تُرجع True فقط إذا كُتبت السجلات فعلاً، وFalse عند انتهاء المهلة أو
+        فشل الكتابة (تبقى السجلات لإعادة المحاولة).
+        """
+        if not self._thread.is_alive():
+            return self._queue.empty()
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout) and request.ok
+
+    def close(self, timeout=None):
+        """كتابة السجلات المتبقية وإيقاف الخيط"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _write(self, batch):
+        """كتابة دفعة؛ عند الفشل تبقى الدفعة لإعادة المحاولة لاحقاً"""
+        try:
+            self._write_batch(batch)
+            return []
+        except Exception:
+            return batch
+
+    def _run(self):
+        """حلقة الخيط الخلفي: تجميع السجلات وكتابتها حسب الحجم أو المهلة"""
+        batch = []
+        waiters = []
+        deadline = None
+        stop = False
+
+        while not stop:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _TIMEOUT
+
+            if item is None:
+                stop = True
+            elif isinstance(item, _FlushRequest):
+                waiters.append(item)
+            elif item is not _TIMEOUT:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if stop or waiters or due or len(batch) >= self.max_batch:
+                if batch:
+                    batch = self._write(batch)
+                deadline = time.monotonic() + self.flush_interval if batch else None
+
+                # الدفعة المتبقية بعد الكتابة تعني أنها فشلت
+                for waiter in waiters:
+                    waiter.ok = not batch
+                    waiter.done.set()
+                waiters = []
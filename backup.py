@@ -0,0 +1,120 @@
+"""
+النسخ الاحتياطي الدوري لقاعدة البيانات
+
+لقطات من ملف الخزنة المشفر تُنسخ تدريجياً بواجهة النسخ الاحتياطي في SQLite
+من خيط خلفي، فلا تتجمد الواجهة ولا تُفك أي بيانات. تُحفظ اللقطات في مجلد
+مستقل ويُحذف الأقدم منها عند تجاوز العدد المحدد.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+
+class BackupManager:
+    """لقطات دورية مُدوَّرة لقاعدة بيانات PasswordDatabase"""
+
+    PREFIX = 'vault-'
+    SUFFIX = '.db'
+
+    def __init__(self, db, directory, interval=24 * 3600, keep=7,
+                 pages=64, pause=0.01, startup_delay=60.0):
+        """db: PasswordDatabase، وinterval الفاصل بين اللقطات بالثواني
+
+        startup_delay مهلة قبل أول لقطة مستحقة حتى لا يتأخر بدء التطبيق.
+        """
+        self.db = db
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.pages = pages
+        self.pause = pause
+        self.startup_delay = startup_delay
+
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshots(self):
+        """مسارات اللقطات من الأحدث إلى الأقدم"""
+        if not os.path.isdir(self.directory):
+            return []
+
+        # الاسم يتضمن الوقت فالترتيب الأبجدي ترتيب زمني
+        names = sorted((
+            name for name in os.listdir(self.directory)
+            if name.startswith(self.PREFIX) and name.endswith(self.SUFFIX)
+        ), reverse=True)
+        return [os.path.join(self.directory, name) for name in names]
+
+    def create_snapshot(self):
+        """إنشاء لقطة جديدة وتدوير القديمة؛ تُرجع مسار اللقطة"""
+        with self._lock:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+            name = f"{self.PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{self.SUFFIX}"
+            path = os.path.join(self.directory, name)
+            partial = path + '.partial'
+
+            # الكتابة في ملف مؤقت ثم النقل، فلا تظهر لقطة ناقصة أبداً
+            try:
+                self.db.backup(partial, pages=self.pages, pause=self.pause)
+                os.chmod(partial, 0o600)
+                os.replace(partial, path)
+            except BaseException:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+
+            self.rotate()
+            return path
+
+    def rotate(self):
+        """حذف اللقطات الزائدة عن العدد المحدد"""
+        for path in self.snapshots()[self.keep:]:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+    def seconds_until_due(self):
+        """الثواني المتبقية حتى اللقطة التالية بناءً على أحدث لقطة"""
+        snapshots = self.snapshots()
+        if not snapshots:
+            return 0
+        try:
+            age = time.time() - os.path.getmtime(snapshots[0])
+        except OSError:
+            return 0
+        return max(0, self.interval - age)
+
+    def start(self):
+        """بدء النسخ الدوري في الخلفية (يمكن إعادة البدء بعد stop)"""
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="backup", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """إيقاف النسخ الدوري وانتظار انتهاء اللقطة الحالية"""
+        self._stop.set()
+        thread = self._thread
+        if thread:
+            thread.join()
+        with self._lock:
+            if self._thread is thread:
+                self._thread = None
+
+    def _run(self):
+        """إنشاء اللقطات كلما حان موعدها"""
+        delay = max(self.startup_delay, self.seconds_until_due())
+        while not self._stop.wait(delay):
+            try:
+                self.create_snapshot()
+                self.last_error = None
+            except Exception as e:
+                # تُعاد المحاولة في الموعد التالي
+                self.last_error = e
+            delay = self.seconds_until_due() or self.interval
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+مجموعة قياس أداء دوال التشفير في CryptoManager
+
+تعمل دون اتصال بالشبكة وتطبع النتائج بصيغة JSON (عمليات/ثانية ونسب مئوية
+للزمن)، ويمكن مقارنتها بنتائج أساسية محفوظة:
+
+    python benchmarks/bench_crypto.py --output baseline.json
+    python benchmarks/bench_crypto.py --baseline baseline.json --threshold 10
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# إضافة مسارات المشروع إلى مسار البحث
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'githab')]
+
+from crypto_utils import CryptoManager  # noqa: E402
+from password_generator import PasswordPolicy  # noqa: E402
+
+
+PAYLOAD_SIZES = (16, 256, 4096, 65536)
+SCRYPT_COSTS = (2 ** 14, 2 ** 15, 2 ** 16)
+PASSWORD_LENGTHS = (16, 32, 64)
+
+
+def percentile(sorted_values, fraction):
+    """نسبة مئوية بالاستيفاء الخطي من قائمة مرتبة"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def measure(func, min_time, min_samples, max_samples):
+    """تشغيل الدالة حتى يتجاوز الزمن min_time وإرجاع الإحصاءات"""
+    func()  # إحماء
+
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_samples and (
+            len(samples) < min_samples or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+
+    samples.sort()
+    mean = statistics.fmean(samples)
+    return {
+        'ops_per_sec': round(1 / mean, 2) if mean else None,
+        'mean_ms': round(mean * 1000, 4),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 4),
+        'p90_ms': round(percentile(samples, 0.90) * 1000, 4),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 4),
+        'samples': len(samples)
+    }
+
+
+def build_cases(quick=False):
+    """بناء حالات القياس: (الاسم، الدالة، هل هي KDF بطيئة)"""
+    password = "correct horse battery staple"
+    salt = CryptoManager.generate_salt()
+    key = CryptoManager.derive_key(password, salt)
+    session = CryptoManager.create_session_cipher(key)
+    hashed = CryptoManager.hash_password(password, salt)
+
+    cases = []
+
+    costs = SCRYPT_COSTS[:1] if quick else SCRYPT_COSTS
+    for n in costs:
+        params = {'n': n, 'r': CryptoManager.SCRYPT_R, 'p': CryptoManager.SCRYPT_P}
+        cases.append((
+            f'derive_key[scrypt,n=2^{n.bit_length() - 1}]',
+            lambda params=params: CryptoManager.derive_key(password, salt, kdf_params=params),
+            True
+        ))
+
+    cases.append(('hash_password', lambda: CryptoManager.hash_password(password, salt), True))
+    cases.append((
+        'verify_password',
+        lambda: CryptoManager.verify_password(password, hashed['hash'], hashed['salt']),
+        True
+    ))
+
+    sizes = PAYLOAD_SIZES[:2] if quick else PAYLOAD_SIZES
+    for size in sizes:
+        payload = os.urandom(size)
+        encrypted = CryptoManager.encrypt_data(payload, key)
+        blob = session.encrypt_blob(payload)
+
+        cases.append((f'encrypt_data[{size}B]', lambda p=payload: CryptoManager.encrypt_data(p, key), False))
+        cases.append((f'decrypt_data[{size}B]', lambda e=encrypted: CryptoManager.decrypt_data(e, key), False))
+        cases.append((f'session.encrypt_blob[{size}B]', lambda p=payload: session.encrypt_blob(p), False))
+        cases.append((f'session.decrypt_blob[{size}B]', lambda b=blob: session.decrypt_blob(b), False))
+
+    for length in PASSWORD_LENGTHS:
+        cases.append((
+            f'generate_secure_password[{length}]',
+            lambda length=length: CryptoManager.generate_secure_password(length),
+            False
+        ))
+
+    policy = PasswordPolicy(length=16)
+    cases.append((
+        'generate_secure_passwords[1000x16]',
+        lambda: CryptoManager.generate_secure_passwords(1000, policy),
+        False
+    ))
+
+    return cases
+
+
+def run(args):
+    """تشغيل جميع الحالات وإرجاع تقرير JSON"""
+    results = {}
+    for name, func, slow in build_cases(args.quick):
+        if args.filter and args.filter not in name:
+            continue
+        if slow:
+            results[name] = measure(func, args.min_time, 3, args.max_samples // 10 or 3)
+        else:
+            results[name] = measure(func, args.min_time, 20, args.max_samples)
+        print(f"{name:40s} {results[name]['ops_per_sec']:>14,.2f} ops/s", file=sys.stderr)
+
+    try:
+        import cryptography
+        cryptography_version = cryptography.__version__
+    except Exception:
+        cryptography_version = None
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cryptography': cryptography_version,
+            'min_time': args.min_time
+        },
+        'results': results
+    }
+
+
+def compare(report, baseline, threshold):
+    """مقارنة النتائج بالأساس وإرجاع قائمة التراجعات"""
+    comparison = {}
+    regressions = []
+
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous.get('ops_per_sec'):
+            continue
+
+        change = (current['ops_per_sec'] / previous['ops_per_sec'] - 1) * 100
+        comparison[name] = {
+            'baseline_ops_per_sec': previous['ops_per_sec'],
+            'ops_per_sec': current['ops_per_sec'],
+            'change_pct': round(change, 2)
+        }
+        if change < -threshold:
+            regressions.append(name)
+
+    return comparison, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس أداء دوال التشفير")
+    parser.add_argument('--output', help="حفظ التقرير في ملف JSON")
+    parser.add_argument('--baseline', help="ملف JSON لنتائج أساسية للمقارنة")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="نسبة التراجع المسموح بها قبل الفشل (%%)")
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help="أقل زمن قياس لكل حالة (ثانية)")
+    parser.add_argument('--max-samples', type=int, default=10000)
+    parser.add_argument('--filter', help="تشغيل الحالات التي يحتوي اسمها على هذا النص فقط")
+    parser.add_argument('--quick', action='store_true', help="مجموعة مختصرة من الحالات")
+    args = parser.parse_args()
+
+    report = run(args)
+    exit_code = 0
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison, regressions = compare(report, baseline, args.threshold)
+        report['comparison'] = comparison
+        report['regressions'] = regressions
+        if regressions:
+            exit_code = 1
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+مدير اتصالات SQLite الآمن للخيوط
+
+اتصال كتابة واحد محمي بقفل، ومجموعة صغيرة من اتصالات القراءة يستعير كل
+خيط واحداً منها طوال عملية القراءة. وضع WAL يسمح للقراء بالعمل بالتوازي
+مع الكاتب دون أن يحجب أحدهما الآخر.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionManager:
+    """إدارة اتصال الكتابة ومجموعة اتصالات القراءة لملف قاعدة بيانات واحد"""
+
+    def __init__(self, db_path, max_readers=4, timeout=5.0):
+        """تهيئة المدير وفتح اتصال الكتابة"""
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self.timeout = timeout
+
+        # قاعدة البيانات في الذاكرة لا تُشارك بين الاتصالات
+        self.shared_writer_only = db_path == ':memory:'
+
+        self.writer = self._connect()
+        if not self.shared_writer_only:
+            # يجب ضبطه قبل WAL ليسري على الملفات الجديدة (والقائمة تُحوّل بـ VACUUM)
+            self.writer.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.writer.execute("PRAGMA journal_mode = WAL")
+            # NORMAL آمن مع WAL ويتجنب المزامنة عند كل حفظ
+            self.writer.execute("PRAGMA synchronous = NORMAL")
+
+        self.write_lock = threading.RLock()
+        self._writer_owner = None
+        self._writer_depth = 0
+
+        self._idle_readers = []
+        self._readers_available = threading.BoundedSemaphore(max_readers)
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    def _connect(self):
+        """فتح اتصال جديد بإعدادات موحدة"""
+        # إدارة المعاملات يدوياً بدلاً من المعاملات الضمنية
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def write(self):
+        """الحصول الحصري على اتصال الكتابة (قابل للتداخل في الخيط نفسه)"""
+        with self.write_lock:
+            self._writer_owner = threading.get_ident()
+            self._writer_depth += 1
+            try:
+                yield self.writer
+            finally:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer_owner = None
+
+    def owns_writer(self):
+        """هل يحمل الخيط الحالي اتصال الكتابة"""
+        return self._writer_owner == threading.get_ident()
+
+    @contextmanager
+    def reader(self):
+        """استعارة اتصال قراءة للخيط الحالي طوال الكتلة
+
+        الخيط الذي يحمل اتصال الكتابة يقرأ منه ليرى تعديلاته غير المحفوظة،
+        والاستدعاءات المتداخلة في الخيط نفسه تعيد استخدام الاتصال المستعار.
+        """
+        if self.shared_writer_only or self.owns_writer():
+            with self.write() as conn:
+                yield conn
+            return
+
+        held = getattr(self._local, 'reader', None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._acquire_reader()
+        self._local.reader = conn
+        try:
+            yield conn
+        finally:
+            self._local.reader = None
+            self._release_reader(conn)
+
+    def _acquire_reader(self):
+        """أخذ اتصال قراءة خامل أو فتح اتصال جديد ضمن الحد الأقصى"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("مدير الاتصالات مغلق")
+
+        self._readers_available.acquire()
+        try:
+            with self._pool_lock:
+                if self._idle_readers:
+                    return self._idle_readers.pop()
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            return conn
+        except Exception:
+            self._readers_available.release()
+            raise
+
+    def _release_reader(self, conn):
+        """إرجاع اتصال القراءة إلى المجموعة"""
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._pool_lock:
+            if self._closed:
+                conn.close()
+            else:
+                self._idle_readers.append(conn)
+        self._readers_available.release()
+
+    def close(self):
+        """إغلاق جميع الاتصالات"""
+        with self._pool_lock:
+            self._closed = True
+            idle, self._idle_readers = self._idle_readers, []
+        for conn in idle:
+            conn.close()
+
+        with self.write_lock:
+            self.writer.close()
@@ -2,26 +2,80 @@
 وحدة قاعدة البيانات باستخدام SQLite مع تشفير
 """
 import sqlite3
+import re
+import zlib
 import json
 import base64
-from datetime import datetime, timedelta
 import os
-from typing import List, Dict, Optional, Tuple
+import threading
+import time
+from contextlib import contextmanager
 
+from crypto_utils import CryptoManager
+from audit_writer import AuditWriter
+from access_tracker import AccessTracker
+from connection_manager import ConnectionManager
+from rate_limiter import pack_attempts, unpack_attempts
+from records import EntryRecord, EncryptedEntryRecord, AuditRecord, SettingsRecord
+from storage import StorageBackend
 
-class PasswordDatabase:
-    """قاعدة بيانات آمنة لكلمات المرور"""
+
+class PasswordDatabase(StorageBackend):
+    """قاعدة بيانات آمنة لكلمات المرور (محرك التخزين SQLite)"""
+
+    # ترحيلات المخطط: (الإصدار، اسم الدالة) بترتيب التطبيق، ويجب ألا يتغير
+    # ترتيب أو رقم أي ترحيل بعد نشره
+    MIGRATIONS = (
+        (1, '_migration_001_indexes'),
+        (2, '_migration_002_login_scheme'),
+        (3, '_migration_003_quick_unlock_window'),
+        (4, '_migration_004_reencryption_journal'),
+        (5, '_migration_005_blob_storage'),
+        (6, '_migration_006_search_index'),
+        (7, '_migration_007_audit_archive'),
+        (8, '_migration_008_login_throttle'),
+    )
+    SCHEMA_VERSION = MIGRATIONS[-1][0]
 
     def __init__(self, db_path="passwords.db"):
         """تهيئة قاعدة البيانات"""
         self.db_path = db_path
+        self.connections = None
         self.conn = None
+
+        # عمق المعاملات المتداخلة على اتصال الكتابة
+        self._tx_depth = 0
+        self._search_index_enabled = None
+
+        # سجلات التدقيق المؤجلة حتى حفظ المعاملة الخارجية
+        self._tx_audit = []
+
+        # عدد الصفوف المعدلة أو المحذوفة منذ آخر ANALYZE (لجدولة الصيانة)
+        self.churn = 0
+
+        # ذاكرة مؤقتة لإعدادات المستخدمين: user_id -> SettingsRecord
+        self._settings_cache = {}
+        # أرقام تزداد عند كل إبطال (لكل مستخدم ولجميع المستخدمين) حتى لا
+        # تُخزن قراءة بدأت قبل إبطال لاحق
+        self._settings_generation = {}
+        self._settings_epoch = 0
+        self._settings_lock = threading.Lock()
+        # المستخدمون الذين تغيرت إعداداتهم في المعاملة الحالية
+        self._tx_settings = set()
+
         self.setup_database()
 
+        # كتابة سجل التدقيق على دفعات من خيط خلفي
+        self.audit_writer = AuditWriter(self.add_audit_logs)
+
+        # أوقات الوصول تُجمع في الذاكرة وتُكتب دورياً
+        self.access_tracker = AccessTracker(self.record_access_times)
+
     def setup_database(self):
         """إنشاء الجداول المطلوبة"""
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        # اتصال كتابة واحد (WAL) واتصالات قراءة لكل خيط
+        self.connections = ConnectionManager(self.db_path)
+        self.conn = self.connections.writer
         cursor = self.conn.cursor()
 
         # جدول المستخدم الرئيسي
@@ -31,6 +85,9 @@ class PasswordDatabase:
                 username TEXT UNIQUE NOT NULL,
                 password_hash TEXT NOT NULL,
                 salt TEXT NOT NULL,
+                kdf_version INTEGER NOT NULL DEFAULT 1,
+                kdf_algorithm TEXT NOT NULL DEFAULT 'scrypt',
+                kdf_params TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
@@ -43,14 +100,10 @@ class PasswordDatabase:
                 title TEXT NOT NULL,
                 username TEXT,
                 email TEXT,
-                password_cipher TEXT NOT NULL,
-                password_tag TEXT NOT NULL,
-                iv TEXT NOT NULL,
+                password_blob BLOB NOT NULL,
                 url TEXT,
                 category TEXT,
-                notes_cipher TEXT,
-                notes_tag TEXT,
-                notes_iv TEXT,
+                notes_blob BLOB,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 last_accessed TIMESTAMP,
@@ -71,7 +124,139 @@ class PasswordDatabase:
             )
         ''')
 
-        # جدول للمحاولات الفاشلة
+        # جدول للإعدادات
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                user_id INTEGER PRIMARY KEY,
+                clipboard_timeout INTEGER DEFAULT 30,
+                auto_lock_timeout INTEGER DEFAULT 300,
+                theme TEXT DEFAULT 'dark',
+                language TEXT DEFAULT 'ar',
+                quick_unlock_window INTEGER DEFAULT 600,
+                audit_retention_days INTEGER DEFAULT 180,
+                audit_max_rows INTEGER DEFAULT 5000,
+                FOREIGN KEY (user_id) REFERENCES master_user (id)
+            )
+        ''')
+
+        # تطبيق ترحيلات المخطط المعلقة
+        self.migrate()
+
+    def migrate(self):
+        """تطبيق ترحيلات المخطط المعلقة بالترتيب، كل منها في معاملة مستقلة
+
+        رقم آخر ترحيل مطبق يُحفظ في PRAGMA user_version داخل المعاملة نفسها،
+        لذلك لا يبقى الملف أبداً في حالة ترحيل جزئي.
+        """
+        current = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if current > self.SCHEMA_VERSION:
+            raise RuntimeError(
+                f"إصدار قاعدة البيانات ({current}) أحدث من إصدار التطبيق ({self.SCHEMA_VERSION})"
+            )
+
+        for version, name in self.MIGRATIONS:
+            if version <= current:
+                continue
+            with self.transaction() as cursor:
+                getattr(self, name)(cursor)
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
+
+    @contextmanager
+    def transaction(self):
+        """وحدة عمل: تأجيل الحفظ حتى خروج الكتلة الخارجية
+
+        الكتل المتداخلة تستخدم SAVEPOINT، فالخطأ داخلها يتراجع عنها فقط
+        ويُعاد رفعه للكتلة الأعلى. تُرجع مؤشراً على الاتصال.
+        """
+        with self.connections.write() as conn:
+            cursor = conn.cursor()
+            savepoint = f"sp_{self._tx_depth}" if self._tx_depth else None
+            cursor.execute(f"SAVEPOINT {savepoint}" if savepoint else "BEGIN IMMEDIATE")
+            self._tx_depth += 1
+            audit_mark = len(self._tx_audit)
+
+            try:
+                yield cursor
+            except BaseException:
+                self._tx_depth -= 1
+                del self._tx_audit[audit_mark:]
+                if savepoint:
+                    cursor.execute(f"ROLLBACK TO {savepoint}")
+                    cursor.execute(f"RELEASE {savepoint}")
+                else:
+                    self._tx_settings.clear()
+                    cursor.execute("ROLLBACK")
+                raise
+
+            self._tx_depth -= 1
+            try:
+                cursor.execute(f"RELEASE {savepoint}" if savepoint else "COMMIT")
+            except Exception:
+                if not savepoint:
+                    self._tx_audit.clear()
+                    self._tx_settings.clear()
+                    if conn.in_transaction:
+                        cursor.execute("ROLLBACK")
+                raise
+
+            if not savepoint:
+                # سجلات التدقيق لا تُرسل إلا بعد نجاح الحفظ
+                pending, self._tx_audit = self._tx_audit, []
+                for record in pending:
+                    self.audit_writer.submit(*record)
+
+                # إبطال الإعدادات المخزنة بعد الحفظ حتى لا يُخزن قارئ آخر القيمة القديمة
+                changed, self._tx_settings = self._tx_settings, set()
+                for user_id in changed:
+                    self.invalidate_settings(user_id)
+
+    @contextmanager
+    def snapshot(self):
+        """لقطة قراءة متسقة على اتصال قراءة دون حجز اتصال الكتابة
+
+        معاملة قراءة مؤجلة (WAL) تبقى مفتوحة طوال الكتلة، فتقرأ كل
+        الاستعلامات المتداخلة في الخيط نفسه الحالة ذاتها بينما تستمر
+        الكتابة من الخيوط الأخرى. تُرجع اتصال القراءة.
+        """
+        with self.connections.reader() as conn:
+            # داخل معاملة قائمة (أو قاعدة في الذاكرة) الاتصال ثابت بالفعل
+            pinned = not conn.in_transaction and not self.connections.owns_writer()
+            if pinned:
+                conn.execute("BEGIN")
+                conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+            try:
+                yield conn
+            finally:
+                if pinned:
+                    conn.execute("COMMIT")
+
+    @staticmethod
+    def _query(conn, record_type, query, params=()):
+        """تنفيذ استعلام يبني نوع السجل مباشرة من الصفوف (دون sqlite3.Row أو dict)"""
+        cursor = conn.cursor()
+        cursor.row_factory = record_type.row_factory
+        return cursor.execute(query, params)
+
+    @staticmethod
+    def _create_password_indexes(cursor):
+        """فهارس جدول passwords (تُعاد بعد إعادة بناء الجدول)"""
+        # العرض مرتب حسب العنوان، والتصفية حسب الفئة مرتبة حسب العنوان أيضاً
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_passwords_user_title ON passwords (user_id, title)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_passwords_user_category "
+            "ON passwords (user_id, category, title)"
+        )
+
+    def _migration_001_indexes(self, cursor):
+        """فهارس الاستعلامات المتكررة: القوائم، السجل، وحد المحاولات الفاشلة"""
+        self._create_password_indexes(cursor)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_user_time ON audit_log (user_id, timestamp)"
+        )
+
+        # جدول المحاولات الفاشلة القديم (يُنقل إلى login_throttle ويُحذف في الترحيل 8)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS failed_attempts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -80,180 +265,568 @@ class PasswordDatabase:
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_failed_attempts_user_time "
+            "ON failed_attempts (username, timestamp)"
+        )
 
-        # جدول للإعدادات
+    def _migration_002_login_scheme(self, cursor):
+        """إصدار مخطط تسجيل الدخول ومعاملات KDF لكل مستخدم"""
+        self._ensure_column(cursor, 'master_user', 'kdf_version', 'INTEGER NOT NULL DEFAULT 1')
+        # NULL = المعاملات الافتراضية القديمة
+        self._ensure_column(cursor, 'master_user', 'kdf_algorithm', "TEXT NOT NULL DEFAULT 'scrypt'")
+        self._ensure_column(cursor, 'master_user', 'kdf_params', 'TEXT')
+
+    def _migration_003_quick_unlock_window(self, cursor):
+        """مدة نافذة الفتح السريع بعد القفل التلقائي"""
+        self._ensure_column(cursor, 'settings', 'quick_unlock_window', 'INTEGER DEFAULT 600')
+
+    def _migration_004_reencryption_journal(self, cursor):
+        """سجل تقدم إعادة التشفير عند تغيير كلمة المرور الرئيسية"""
+        # المفتاح الجديد مغلف بالقديم والعكس حتى يمكن الاستئناف بأي منهما
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
+            CREATE TABLE IF NOT EXISTS reencryption_journal (
                 user_id INTEGER PRIMARY KEY,
-                clipboard_timeout INTEGER DEFAULT 30,
-                auto_lock_timeout INTEGER DEFAULT 300,
-                theme TEXT DEFAULT 'dark',
-                language TEXT DEFAULT 'ar',
+                new_password_hash TEXT NOT NULL,
+                new_salt TEXT NOT NULL,
+                new_kdf_algorithm TEXT NOT NULL,
+                new_kdf_params TEXT,
+                wrapped_new_key BLOB NOT NULL,
+                wrapped_old_key BLOB NOT NULL,
+                last_entry_id INTEGER NOT NULL DEFAULT 0,
+                processed INTEGER NOT NULL DEFAULT 0,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES master_user (id)
             )
         ''')
 
-        self.conn.commit()
+    @staticmethod
+    def _pack_legacy_fields(iv, ciphertext, tag):
+        """تحويل ثلاثة أعمدة base64 قديمة إلى كتلة واحدة (دالة SQL)"""
+        if not (iv and ciphertext and tag):
+            return None
+        return CryptoManager.pack_encrypted({
+            'ciphertext': base64.b64decode(ciphertext),
+            'tag': base64.b64decode(tag),
+            'iv': base64.b64decode(iv)
+        })
 
-    def create_master_user(self, username, password_hash, salt):
-        """إنشاء مستخدم رئيسي جديد"""
-        cursor = self.conn.cursor()
+    def _migration_005_blob_storage(self, cursor):
+        """إعادة بناء جدول passwords بصيغة الكتل الثنائية بدلاً من أعمدة base64
+
+        التحويل يتم داخل SQLite عبر دالة مسجلة، ولا يحتاج إلى مفتاح لأن
+        البيانات المشفرة تُعاد تعبئتها فقط دون فك تشفيرها.
+        """
+        cursor.execute("PRAGMA table_info(passwords)")
+        if 'password_cipher' not in {row['name'] for row in cursor.fetchall()}:
+            return
+
+        self.conn.create_function('pack_legacy_fields', 3, self._pack_legacy_fields, deterministic=True)
+
+        cursor.execute('''
+            CREATE TABLE passwords_blob (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                username TEXT,
+                email TEXT,
+                password_blob BLOB NOT NULL,
+                url TEXT,
+                category TEXT,
+                notes_blob BLOB,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_accessed TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES master_user (id)
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO passwords_blob (
+                id, user_id, title, username, email, password_blob, url, category,
+                notes_blob, created_at, updated_at, last_accessed
+            )
+            SELECT
+                id, user_id, title, username, email,
+                pack_legacy_fields(iv, password_cipher, password_tag),
+                url, category,
+                pack_legacy_fields(notes_iv, notes_cipher, notes_tag),
+                created_at, updated_at, last_accessed
+            FROM passwords
+        ''')
+        cursor.execute("DROP TABLE passwords")
+        cursor.execute("ALTER TABLE passwords_blob RENAME TO passwords")
+        self._create_password_indexes(cursor)
+
+    def _migration_006_search_index(self, cursor):
+        """فهرس FTS5 على بيانات المدخلات غير المشفرة مع مشغلات للمزامنة
+
+        الجدول بمحتوى خارجي (content=passwords) فلا تتكرر البيانات، ومشغل
+        التحديث لا يعمل إلا عند تغيير الأعمدة المفهرسة. إذا كانت SQLite
+        مبنية بدون FTS5 يُتخطى الفهرس ويستخدم البحث LIKE.
+        """
         try:
-            cursor.execute(
-                "INSERT INTO master_user (username, password_hash, salt) VALUES (?, ?, ?)",
-                (username, password_hash, salt)
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS passwords_fts USING fts5(
+                    title, username, email, url, category,
+                    content='passwords',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return
+
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS passwords_fts_insert AFTER INSERT ON passwords BEGIN
+                INSERT INTO passwords_fts (rowid, title, username, email, url, category)
+                VALUES (new.id, new.title, new.username, new.email, new.url, new.category);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS passwords_fts_delete AFTER DELETE ON passwords BEGIN
+                INSERT INTO passwords_fts (passwords_fts, rowid, title, username, email, url, category)
+                VALUES ('delete', old.id, old.title, old.username, old.email, old.url, old.category);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS passwords_fts_update
+            AFTER UPDATE OF title, username, email, url, category ON passwords BEGIN
+                INSERT INTO passwords_fts (passwords_fts, rowid, title, username, email, url, category)
+                VALUES ('delete', old.id, old.title, old.username, old.email, old.url, old.category);
+                INSERT INTO passwords_fts (rowid, title, username, email, url, category)
+                VALUES (new.id, new.title, new.username, new.email, new.url, new.category);
+            END
+        ''')
+
+        # فهرسة المدخلات الموجودة
+        cursor.execute("INSERT INTO passwords_fts (passwords_fts) VALUES ('rebuild')")
+
+    def _migration_007_audit_archive(self, cursor):
+        """أرشيف سجل التدقيق المضغوط وإعدادات الاحتفاظ"""
+        # كل صف يحمل دفعة من السجلات بصيغة JSON مضغوطة بـ zlib
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS audit_archive (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                first_timestamp TIMESTAMP NOT NULL,
+                last_timestamp TIMESTAMP NOT NULL,
+                record_count INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES master_user (id)
             )
+        ''')
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_archive_user_time "
+            "ON audit_archive (user_id, last_timestamp)"
+        )
+        self._ensure_column(cursor, 'settings', 'audit_retention_days', 'INTEGER DEFAULT 180')
+        self._ensure_column(cursor, 'settings', 'audit_max_rows', 'INTEGER DEFAULT 5000')
 
-            # إنشاء إعدادات افتراضية للمستخدم
-            user_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO settings (user_id) VALUES (?)",
-                (user_id,)
+    def _migration_008_login_throttle(self, cursor):
+        """حالة محدد محاولات الدخول: صف واحد لكل مستخدم بدلاً من صف لكل محاولة"""
+        # attempts: أوقات آخر المحاولات الفاشلة (uint32 متتالية)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS login_throttle (
+                username TEXT PRIMARY KEY,
+                attempts BLOB NOT NULL,
+                last_attempt INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_login_throttle_last ON login_throttle (last_attempt)"
+        )
+
+        # نقل محاولات الساعة الأخيرة من الجدول القديم ثم حذفه
+        if cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'failed_attempts'"
+        ).fetchone():
+            throttle = {}
+            for row in cursor.execute('''
+                SELECT username, CAST(strftime('%s', timestamp) AS INTEGER) AS attempted_at
+                FROM failed_attempts
+                WHERE timestamp > datetime('now', '-1 hour')
+                ORDER BY username, timestamp
+            ''').fetchall():
+                throttle.setdefault(row['username'], []).append(row['attempted_at'])
+
+            cursor.executemany(
+                "INSERT OR REPLACE INTO login_throttle (username, attempts, last_attempt) VALUES (?, ?, ?)",
+                [
+                    (username, pack_attempts(attempts[-5:]), attempts[-1])
+                    for username, attempts in throttle.items()
+                ]
             )
+            cursor.execute("DROP TABLE failed_attempts")
+
+    @staticmethod
+    def _ensure_column(cursor, table, column, definition):
+        """إضافة عمود إلى جدول موجود إذا لم يكن موجوداً"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in {row['name'] for row in cursor.fetchall()}:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def create_master_user(self, username, password_hash, salt, kdf_version=1,
+                           kdf_algorithm='scrypt', kdf_params=None):
+        """إنشاء مستخدم رئيسي جديد"""
+        try:
+            with self.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO master_user (
+                        username, password_hash, salt, kdf_version, kdf_algorithm, kdf_params
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                ''', (
+                    username,
+                    password_hash,
+                    salt,
+                    kdf_version,
+                    kdf_algorithm,
+                    json.dumps(kdf_params) if kdf_params else None
+                ))
+
+                # إنشاء إعدادات افتراضية للمستخدم
+                user_id = cursor.lastrowid
+                cursor.execute(
+                    "INSERT INTO settings (user_id) VALUES (?)",
+                    (user_id,)
+                )
 
-            self.conn.commit()
             return user_id
         except sqlite3.IntegrityError:
             return None
 
     def verify_master_user(self, username, password_hash, salt):
         """التحقق من بيانات المستخدم الرئيسي"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "SELECT id, password_hash, salt FROM master_user WHERE username = ?",
-            (username,)
-        )
-        user = cursor.fetchone()
+        with self.connections.reader() as conn:
+            user = conn.execute(
+                "SELECT id, password_hash, salt FROM master_user WHERE username = ?",
+                (username,)
+            ).fetchone()
 
         if user:
             return user['id']
         return None
 
-    def get_user_settings(self, user_id):
-        """الحصول على إعدادات المستخدم"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "SELECT * FROM settings WHERE user_id = ?",
-            (user_id,)
-        )
-        settings = cursor.fetchone()
-        return dict(settings) if settings else None
+    @staticmethod
+    def _master_user_dict(user):
+        """تحويل صف المستخدم الرئيسي إلى قاموس مع فك معاملات KDF"""
+        if not user:
+            return None
+        user = dict(user)
+        user['kdf_params'] = json.loads(user['kdf_params']) if user['kdf_params'] else None
+        return user
 
-    def update_user_settings(self, user_id, settings):
-        """تحديث إعدادات المستخدم"""
-        cursor = self.conn.cursor()
+    def get_master_user(self, username):
+        """الحصول على بيانات المستخدم الرئيسي باسم المستخدم"""
+        with self.connections.reader() as conn:
+            user = conn.execute('''
+                SELECT id, username, password_hash, salt, kdf_version, kdf_algorithm, kdf_params
+                FROM master_user WHERE username = ?
+            ''', (username,)).fetchone()
+        return self._master_user_dict(user)
 
-        # التحقق من وجود إعدادات
-        cursor.execute("SELECT 1 FROM settings WHERE user_id = ?", (user_id,))
-        if cursor.fetchone():
-            # تحديث الإعدادات الموجودة
+    def get_master_user_by_id(self, user_id):
+        """الحصول على بيانات المستخدم الرئيسي بالمعرف"""
+        with self.connections.reader() as conn:
+            user = conn.execute('''
+                SELECT id, username, password_hash, salt, kdf_version, kdf_algorithm, kdf_params
+                FROM master_user WHERE id = ?
+            ''', (user_id,)).fetchone()
+        return self._master_user_dict(user)
+
+    def update_master_credentials(self, user_id, password_hash, salt, kdf_version,
+                                  kdf_algorithm='scrypt', kdf_params=None):
+        """تحديث بيانات اعتماد المستخدم الرئيسي ومعاملات KDF"""
+        with self.transaction() as cursor:
             cursor.execute('''
-                UPDATE settings SET 
-                clipboard_timeout = ?,
-                auto_lock_timeout = ?,
-                theme = ?,
-                language = ?
-                WHERE user_id = ?
+                UPDATE master_user
+                SET password_hash = ?, salt = ?, kdf_version = ?, kdf_algorithm = ?, kdf_params = ?
+                WHERE id = ?
             ''', (
-                settings.get('clipboard_timeout', 30),
-                settings.get('auto_lock_timeout', 300),
-                settings.get('theme', 'dark'),
-                settings.get('language', 'ar'),
+                password_hash,
+                salt,
+                kdf_version,
+                kdf_algorithm,
+                json.dumps(kdf_params) if kdf_params else None,
                 user_id
             ))
+
+        return cursor.rowcount > 0
+
+    def get_user_settings(self, user_id):
+        """الحصول على إعدادات المستخدم (من الذاكرة المؤقتة بعد أول قراءة)"""
+        with self._settings_lock:
+            settings = self._settings_cache.get(user_id)
+            generation = (self._settings_epoch, self._settings_generation.get(user_id, 0))
+        if settings is not None:
+            return settings.copy()
+
+        # القراءة داخل معاملة قد ترى تعديلات غير محفوظة فلا تُخزن
+        cacheable = not self.connections.owns_writer()
+        with self.connections.reader() as conn:
+            settings = self._query(
+                conn, SettingsRecord,
+                f"SELECT {SettingsRecord.columns()} FROM settings WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+
+        if settings is None:
+            return None
+        if cacheable:
+            with self._settings_lock:
+                # تحديث حُفظ بعد بدء القراءة يجعل الصف المقروء قديماً
+                if (self._settings_epoch, self._settings_generation.get(user_id, 0)) == generation:
+                    self._settings_cache[user_id] = settings
+        return settings.copy()
+
+    def invalidate_settings(self, user_id=None):
+        """إبطال إعدادات مستخدم في الذاكرة المؤقتة (أو جميع المستخدمين)"""
+        with self._settings_lock:
+            if user_id is None:
+                self._settings_cache.clear()
+                self._settings_epoch += 1
+            else:
+                self._settings_cache.pop(user_id, None)
+                self._settings_generation[user_id] = self._settings_generation.get(user_id, 0) + 1
+
+    def update_user_settings(self, user_id, settings):
+        """تحديث إعدادات المستخدم (إنشاؤها إن لم توجد)
+
+        تُحدَّث الحقول المرسلة فقط، والحقول الناقصة في صف جديد تأخذ قيمها
+        الافتراضية من الجدول.
+        """
+        unknown = set(settings) - set(SettingsRecord.FIELDS[1:])
+        if unknown:
+            raise ValueError(f"إعدادات غير معروفة: {', '.join(sorted(unknown))}")
+
+        columns = [name for name in SettingsRecord.FIELDS[1:] if name in settings]
+
+        if columns:
+            query = f'''
+                INSERT INTO settings (user_id, {', '.join(columns)})
+                VALUES ({', '.join('?' * (len(columns) + 1))})
+                ON CONFLICT(user_id) DO UPDATE SET
+                {', '.join(f"{name} = excluded.{name}" for name in columns)}
+            '''
         else:
-            # إنشاء إعدادات جديدة
+            query = "INSERT OR IGNORE INTO settings (user_id) VALUES (?)"
+
+        with self.transaction() as cursor:
+            cursor.execute(query, [user_id] + [settings[name] for name in columns])
+            self.invalidate_settings(user_id)
+            self._tx_settings.add(user_id)
+
+    def add_password_entry(self, user_id, entry_data, encrypted_password, notes_encrypted=None):
+        """إضافة مدخل كلمة مرور جديد"""
+        with self.transaction() as cursor:
+
             cursor.execute('''
-                INSERT INTO settings (user_id, clipboard_timeout, auto_lock_timeout, theme, language)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO passwords (
+                    user_id, title, username, email, password_blob, url, category, notes_blob
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 user_id,
-                settings.get('clipboard_timeout', 30),
-                settings.get('auto_lock_timeout', 300),
-                settings.get('theme', 'dark'),
-                settings.get('language', 'ar')
+                entry_data.get('title'),
+                entry_data.get('username'),
+                entry_data.get('email'),
+                encrypted_password,
+                entry_data.get('url'),
+                entry_data.get('category', 'عام'),
+                notes_encrypted
             ))
 
-        self.conn.commit()
+            entry_id = cursor.lastrowid
 
-    def add_password_entry(self, user_id, entry_data, encrypted_password, notes_encrypted=None):
-        """إضافة مدخل كلمة مرور جديد"""
-        cursor = self.conn.cursor()
+            # تسجيل العملية في سجل التدقيق
+            self.add_audit_log(user_id, "ADD_PASSWORD", f"Added entry: {entry_data.get('title')}")
 
-        cursor.execute('''
-            INSERT INTO passwords (
-                user_id, title, username, email, password_cipher, password_tag, iv,
-                url, category, notes_cipher, notes_tag, notes_iv
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id,
-            entry_data.get('title'),
-            entry_data.get('username'),
-            entry_data.get('email'),
-            base64.b64encode(encrypted_password['ciphertext']).decode('utf-8'),
-            base64.b64encode(encrypted_password['tag']).decode('utf-8'),
-            base64.b64encode(encrypted_password['iv']).decode('utf-8'),
-            entry_data.get('url'),
-            entry_data.get('category', 'عام'),
-            base64.b64encode(notes_encrypted['ciphertext']).decode('utf-8') if notes_encrypted else None,
-            base64.b64encode(notes_encrypted['tag']).decode('utf-8') if notes_encrypted else None,
-            base64.b64encode(notes_encrypted['iv']).decode('utf-8') if notes_encrypted else None
-        ))
-
-        entry_id = cursor.lastrowid
-
-        # تسجيل العملية في سجل التدقيق
-        self.add_audit_log(user_id, "ADD_PASSWORD", f"Added entry: {entry_data.get('title')}")
-
-        self.conn.commit()
         return entry_id
 
+    def add_password_entries_bulk(self, user_id, entries, source=None):
+        """إضافة مدخلات مشفرة مسبقاً بـ executemany في معاملة واحدة
+
+        entries: مُكرِّر من (entry_data, password_blob, notes_blob) يُستهلك
+        تدريجياً، فيمكن أن يكون مولداً يشفّر الدفعات أثناء الإدراج. يُكتب سجل
+        تدقيق واحد ملخص بدلاً من سجل لكل مدخل. تُرجع عدد المدخلات المضافة.
+        """
+        count = 0
+
+        def rows():
+            nonlocal count
+            for entry_data, encrypted_password, notes_encrypted in entries:
+                count += 1
+                yield (
+                    user_id,
+                    entry_data.get('title'),
+                    entry_data.get('username'),
+                    entry_data.get('email'),
+                    encrypted_password,
+                    entry_data.get('url'),
+                    entry_data.get('category', 'عام'),
+                    notes_encrypted
+                )
+
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO passwords (
+                    user_id, title, username, email, password_blob, url, category, notes_blob
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows())
+
+            self.churn += count
+
+            # سجل تدقيق ملخص واحد
+            if count:
+                details = f"Imported {count} entries" + (f" from {source}" if source else "")
+                self.add_audit_log(user_id, "IMPORT", details)
+
+        return count
+
     def get_password_entry(self, user_id, entry_id):
         """الحصول على مدخل كلمة مرور"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM passwords 
-            WHERE id = ? AND user_id = ?
-        ''', (entry_id, user_id))
+        with self.connections.reader() as conn:
+            entry = self._query(conn, EncryptedEntryRecord, f'''
+                SELECT {EncryptedEntryRecord.columns()} FROM passwords 
+                WHERE id = ? AND user_id = ?
+            ''', (entry_id, user_id)).fetchone()
 
-        entry = cursor.fetchone()
         if entry:
-            # تحديث وقت آخر وصول
-            cursor.execute('''
-                UPDATE passwords SET last_accessed = CURRENT_TIMESTAMP 
-                WHERE id = ? AND user_id = ?
-            ''', (entry_id, user_id))
-            self.conn.commit()
+            # تسجيل وقت آخر وصول في الذاكرة (يُكتب لاحقاً على دفعات)
+            self.access_tracker.touch(user_id, entry_id)
 
-            return dict(entry)
-        return None
+        return entry
 
-    def get_all_entries(self, user_id, category=None):
-        """الحصول على جميع المدخلات"""
-        cursor = self.conn.cursor()
+    def record_access_times(self, accesses):
+        """كتابة دفعة من أوقات الوصول في معاملة واحدة
+
+        accesses: قائمة (timestamp, entry_id, user_id)
+        """
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                UPDATE passwords SET last_accessed = ?1
+                WHERE id = ?2 AND user_id = ?3
+                AND (last_accessed IS NULL OR last_accessed < ?1)
+            ''', accesses)
+
+    def flush_access_times(self):
+        """كتابة أوقات الوصول المعلقة"""
+        self.access_tracker.flush()
+
+    def get_entries_page(self, user_id, category=None, after=None, limit=100):
+        """صفحة من المدخلات مرتبة حسب العنوان بترقيم حسب المفتاح
+
+        after: آخر مدخل في الصفحة السابقة (title و id)، فيبدأ الاستعلام من
+        موضعه في الفهرس مباشرة بدلاً من تخطي الصفوف كما في OFFSET.
+        """
+        conditions = ["user_id = ?"]
+        params = [user_id]
 
         if category:
-            cursor.execute('''
-                SELECT id, title, username, email, url, category, created_at, updated_at
+            conditions.append("category = ?")
+            params.append(category)
+
+        if after is not None:
+            conditions.append("(title, id) > (?, ?)")
+            params.extend([after['title'], after['id']])
+
+        params.append(limit)
+
+        with self.connections.reader() as conn:
+            return self._query(conn, EntryRecord, f'''
+                SELECT {EntryRecord.columns()}
                 FROM passwords 
-                WHERE user_id = ? AND category = ?
-                ORDER BY title
-            ''', (user_id, category))
+                WHERE {' AND '.join(conditions)}
+                ORDER BY title, id
+                LIMIT ?
+            ''', params).fetchall()
+
+    @property
+    def search_index_enabled(self):
+        """هل فهرس البحث FTS5 متاح في هذا الملف"""
+        if self._search_index_enabled is None:
+            with self.connections.reader() as conn:
+                self._search_index_enabled = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'passwords_fts'"
+                ).fetchone() is not None
+        return self._search_index_enabled
+
+    @staticmethod
+    def _fts_query(query):
+        """تحويل نص البحث إلى استعلام FTS5: كل كلمة بادئة، والكلمات مجتمعة (AND)"""
+        terms = re.findall(r'\w+', query)
+        return ' '.join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+    def search_entries(self, user_id, query, limit=50):
+        """البحث في العنوان واسم المستخدم والبريد والرابط والتصنيف
+
+        يطابق بدايات الكلمات ويرتب النتائج حسب bm25 (العنوان أعلى وزناً).
+        """
+        if self.search_index_enabled:
+            match = self._fts_query(query)
+            if not match:
+                return []
+
+            with self.connections.reader() as conn:
+                return self._query(conn, EntryRecord, f'''
+                    SELECT {EntryRecord.columns('p.')}
+                    FROM passwords_fts
+                    JOIN passwords p ON p.id = passwords_fts.rowid
+                    WHERE passwords_fts MATCH ? AND p.user_id = ?
+                    ORDER BY bm25(passwords_fts, 10.0, 4.0, 4.0, 2.0, 1.0)
+                    LIMIT ?
+                ''', (match, user_id, limit)).fetchall()
         else:
-            cursor.execute('''
-                SELECT id, title, username, email, url, category, created_at, updated_at
-                FROM passwords 
-                WHERE user_id = ?
-                ORDER BY title
-            ''', (user_id,))
+            # بديل عند عدم توفر FTS5
+            pattern = f"%{query.strip()}%"
+            if pattern == "%%":
+                return []
 
-        entries = cursor.fetchall()
-        return [dict(entry) for entry in entries]
+            with self.connections.reader() as conn:
+                return self._query(conn, EntryRecord, f'''
+                    SELECT {EntryRecord.columns()}
+                    FROM passwords
+                    WHERE user_id = ? AND (
+                        title LIKE ? OR username LIKE ? OR email LIKE ? OR url LIKE ? OR category LIKE ?
+                    )
+                    ORDER BY title, id
+                    LIMIT ?
+                ''', (user_id, pattern, pattern, pattern, pattern, pattern, limit)).fetchall()
+
+    def get_categories(self, user_id):
+        """التصنيفات المستخدمة مرتبة أبجدياً"""
+        with self.connections.reader() as conn:
+            rows = conn.execute('''
+                SELECT DISTINCT category FROM passwords 
+                WHERE user_id = ? ORDER BY category
+            ''', (user_id,)).fetchall()
+
+        return [row['category'] for row in rows]
+
+    def iter_encrypted_entries(self, user_id, chunk_size=500, after_id=0):
+        """جلب المدخلات المشفرة على دفعات مرتبة حسب المعرف
+
+        لا يحدّث وقت آخر وصول، ويستخدم ترقيماً حسب المفتاح بدلاً من
+        الإبقاء على مؤشر مفتوح بين الدفعات.
+        """
+        last_id = after_id
+        while True:
+            with self.connections.reader() as conn:
+                rows = self._query(conn, EncryptedEntryRecord, f'''
+                    SELECT {EncryptedEntryRecord.columns()} FROM passwords
+                    WHERE user_id = ? AND id > ?
+                    ORDER BY id
+                    LIMIT ?
+                ''', (user_id, last_id, chunk_size)).fetchall()
+
+            if not rows:
+                return
+
+            last_id = rows[-1].id
+            yield rows
 
     def update_password_entry(self, user_id, entry_id, entry_data, encrypted_password=None, notes_encrypted=None):
         """تحديث مدخل كلمة مرور"""
-        cursor = self.conn.cursor()
-
         # بناء استعلام التحديث الديناميكي
         update_fields = []
         params = []
@@ -279,24 +852,12 @@ class PasswordDatabase:
             params.append(entry_data['category'])
 
         if encrypted_password:
-            update_fields.append("password_cipher = ?")
-            update_fields.append("password_tag = ?")
-            update_fields.append("iv = ?")
-            params.extend([
-                base64.b64encode(encrypted_password['ciphertext']).decode('utf-8'),
-                base64.b64encode(encrypted_password['tag']).decode('utf-8'),
-                base64.b64encode(encrypted_password['iv']).decode('utf-8')
-            ])
+            update_fields.append("password_blob = ?")
+            params.append(encrypted_password)
 
         if notes_encrypted:
-            update_fields.append("notes_cipher = ?")
-            update_fields.append("notes_tag = ?")
-            update_fields.append("notes_iv = ?")
-            params.extend([
-                base64.b64encode(notes_encrypted['ciphertext']).decode('utf-8'),
-                base64.b64encode(notes_encrypted['tag']).decode('utf-8'),
-                base64.b64encode(notes_encrypted['iv']).decode('utf-8')
-            ])
+            update_fields.append("notes_blob = ?")
+            params.append(notes_encrypted)
 
         # إضافة وقت التحديث
         update_fields.append("updated_at = CURRENT_TIMESTAMP")
@@ -313,65 +874,349 @@ class PasswordDatabase:
 
         params.extend([entry_id, user_id])
 
-        cursor.execute(query, params)
-        affected = cursor.rowcount
+        with self.transaction() as cursor:
+            cursor.execute(query, params)
+            affected = cursor.rowcount
 
-        if affected > 0:
-            # تسجيل العملية في سجل التدقيق
-            self.add_audit_log(user_id, "UPDATE_PASSWORD", f"Updated entry ID: {entry_id}")
+            if affected > 0:
+                self.churn += affected
+
+                # تسجيل العملية في سجل التدقيق
+                self.add_audit_log(user_id, "UPDATE_PASSWORD", f"Updated entry ID: {entry_id}")
 
-        self.conn.commit()
         return affected > 0
 
     def delete_password_entry(self, user_id, entry_id):
         """حذف مدخل كلمة مرور"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            DELETE FROM passwords 
-            WHERE id = ? AND user_id = ?
-        ''', (entry_id, user_id))
+        with self.transaction() as cursor:
+            cursor.execute('''
+                DELETE FROM passwords 
+                WHERE id = ? AND user_id = ?
+            ''', (entry_id, user_id))
 
-        affected = cursor.rowcount
+            affected = cursor.rowcount
 
-        if affected > 0:
-            # تسجيل العملية في سجل التدقيق
-            self.add_audit_log(user_id, "DELETE_PASSWORD", f"Deleted entry ID: {entry_id}")
+            if affected > 0:
+                self.churn += affected
+
+                # تسجيل العملية في سجل التدقيق
+                self.add_audit_log(user_id, "DELETE_PASSWORD", f"Deleted entry ID: {entry_id}")
 
-        self.conn.commit()
         return affected > 0
 
     def add_audit_log(self, user_id, action, details=None, ip_address=None):
-        """إضافة سجل تدقيق"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO audit_log (user_id, action, details, ip_address)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, action, details, ip_address))
-        self.conn.commit()
+        """إضافة سجل تدقيق (يُكتب لاحقاً من الخيط الخلفي)
 
-    def get_audit_logs(self, user_id, limit=50):
-        """الحصول على سجلات التدقيق"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM audit_log 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (user_id, limit))
+        داخل معاملة يُؤجل السجل حتى حفظها، ويُلغى إذا تم التراجع عنها.
+        """
+        record = (user_id, action, details, ip_address, AuditWriter.timestamp())
+        if self._tx_depth and self.connections.owns_writer():
+            self._tx_audit.append(record)
+        else:
+            self.audit_writer.submit(*record)
 
-        logs = cursor.fetchall()
-        return [dict(log) for log in logs]
+    def add_audit_logs(self, records):
+        """كتابة دفعة من سجلات التدقيق في معاملة واحدة
 
-    def clear_old_failed_attempts(self, hours=24):
-        """مسح محاولات الدخول الفاشلة القديمة"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            DELETE FROM failed_attempts 
-            WHERE timestamp < datetime('now', ?)
-        ''', (f'-{hours} hours',))
-        self.conn.commit()
+        records: قائمة (user_id, action, details, ip_address, timestamp)
+        """
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO audit_log (user_id, action, details, ip_address, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', records)
+
+    def flush_audit_log(self, timeout=None):
+        """انتظار كتابة جميع سجلات التدقيق المعلقة؛ True إذا كُتبت فعلاً
+
+        الخيط الذي يحمل اتصال الكتابة (داخل معاملة) لا ينتظر، لأن الخيط
+        الخلفي يحتاج الاتصال نفسه للكتابة فيبقى الانتظار معلقاً إلى الأبد.
+        """
+        if self.connections.owns_writer():
+            return False
+        return self.audit_writer.flush(timeout)
+
+    def get_audit_logs_page(self, user_id, before=None, limit=50):
+        """صفحة من سجلات التدقيق من الأحدث إلى الأقدم بترقيم حسب المفتاح
+
+        before: آخر سجل في الصفحة السابقة (timestamp و id).
+        """
+        conditions = ["user_id = ?"]
+        params = [user_id]
+
+        if before is not None:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend([before['timestamp'], before['id']])
+
+        params.append(limit)
+
+        with self.connections.reader() as conn:
+            return self._query(conn, AuditRecord, f'''
+                SELECT {AuditRecord.columns()} FROM audit_log 
+                WHERE {' AND '.join(conditions)} 
+                ORDER BY timestamp DESC, id DESC 
+                LIMIT ?
+            ''', params).fetchall()
+
+    def archive_audit_logs(self, user_id, max_age_days, max_rows, batch_size=500):
+        """نقل دفعة من أقدم السجلات المستحقة إلى الأرشيف المضغوط
+
+        المستحق هو الأقدم من max_age_days أو ما يزيد عن أحدث max_rows سجل.
+        النقل والحذف في معاملة واحدة. تُرجع عدد السجلات المؤرشفة.
+        """
+        with self.transaction() as cursor:
+            conditions = ["timestamp < datetime('now', ?)"]
+            params = [user_id, f'-{int(max_age_days)} days']
+
+            # حد الصفوف: كل ما هو أقدم من السجل رقم max_rows (من الأحدث)
+            boundary = cursor.execute('''
+                SELECT timestamp, id FROM audit_log
+                WHERE user_id = ?
+                ORDER BY timestamp DESC, id DESC
+                LIMIT 1 OFFSET ?
+            ''', (user_id, max_rows)).fetchone()
+            if boundary:
+                conditions.append("(timestamp, id) <= (?, ?)")
+                params.extend([boundary['timestamp'], boundary['id']])
+
+            params.append(batch_size)
+            records = cursor.execute(f'''
+                SELECT id, action, details, ip_address, timestamp FROM audit_log
+                WHERE user_id = ? AND ({' OR '.join(conditions)})
+                ORDER BY timestamp, id
+                LIMIT ?
+            ''', params).fetchall()
+
+            if not records:
+                return 0
+
+            payload = zlib.compress(
+                json.dumps([list(record) for record in records], ensure_ascii=False).encode('utf-8'),
+                9
+            )
+            cursor.execute('''
+                INSERT INTO audit_archive (
+                    user_id, first_timestamp, last_timestamp, record_count, payload
+                ) VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, records[0]['timestamp'], records[-1]['timestamp'], len(records), payload))
+
+            cursor.executemany(
+                "DELETE FROM audit_log WHERE id = ?",
+                [(record['id'],) for record in records]
+            )
+            self.churn += len(records)
+
+        return len(records)
+
+    def iter_archived_audit_logs(self, user_id):
+        """تدفق السجلات المؤرشفة من الأحدث إلى الأقدم"""
+        last_id = None
+        while True:
+            with self.connections.reader() as conn:
+                row = conn.execute('''
+                    SELECT id, payload FROM audit_archive
+                    WHERE user_id = ? AND (? IS NULL OR id < ?)
+                    ORDER BY id DESC
+                    LIMIT 1
+                ''', (user_id, last_id, last_id)).fetchone()
+
+            if not row:
+                return
+
+            last_id = row['id']
+            records = json.loads(zlib.decompress(row['payload']).decode('utf-8'))
+            for record_id, action, details, ip_address, timestamp in reversed(records):
+                yield AuditRecord(record_id, user_id, action, details, ip_address, timestamp)
+
+    def get_login_throttle(self, username):
+        """أوقات المحاولات الفاشلة المحفوظة لمستخدم"""
+        with self.connections.reader() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM login_throttle WHERE username = ?", (username,)
+            ).fetchone()
+        return unpack_attempts(row['attempts']) if row else []
+
+    def save_login_throttle(self, username, attempts):
+        """حفظ أوقات المحاولات الفاشلة لمستخدم (صف واحد)"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO login_throttle (username, attempts, last_attempt) VALUES (?, ?, ?)
+                ON CONFLICT (username) DO UPDATE SET
+                    attempts = excluded.attempts,
+                    last_attempt = excluded.last_attempt
+            ''', (username, pack_attempts(attempts), attempts[-1]))
+
+    def delete_login_throttle(self, username):
+        """مسح المحاولات الفاشلة لمستخدم"""
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM login_throttle WHERE username = ?", (username,))
+
+    def purge_login_throttle(self, before):
+        """حذف حالات المستخدمين التي انتهت كل محاولاتها قبل before (ثوانٍ منذ epoch)"""
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM login_throttle WHERE last_attempt <= ?", (before,))
+
+    def start_reencryption_journal(self, user_id, journal):
+        """بدء سجل إعادة التشفير"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO reencryption_journal (
+                    user_id, new_password_hash, new_salt, new_kdf_algorithm, new_kdf_params,
+                    wrapped_new_key, wrapped_old_key, last_entry_id, processed
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0)
+            ''', (
+                user_id,
+                journal['new_password_hash'],
+                journal['new_salt'],
+                journal['new_kdf_algorithm'],
+                json.dumps(journal['new_kdf_params']) if journal.get('new_kdf_params') else None,
+                journal['wrapped_new_key'],
+                journal['wrapped_old_key']
+            ))
+
+    def get_reencryption_journal(self, user_id):
+        """الحصول على سجل إعادة تشفير غير مكتمل (إن وجد)"""
+        with self.connections.reader() as conn:
+            journal = conn.execute(
+                "SELECT * FROM reencryption_journal WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if not journal:
+            return None
+        journal = dict(journal)
+        journal['new_kdf_params'] = json.loads(journal['new_kdf_params']) if journal['new_kdf_params'] else None
+        return journal
+
+    def apply_reencrypted_batch(self, user_id, updates, last_entry_id):
+        """حفظ دفعة معاد تشفيرها وتقدم السجل في معاملة واحدة
+
+        updates: قائمة (entry_id, password_blob, notes_blob)
+        """
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                UPDATE passwords SET password_blob = ?, notes_blob = ?
+                WHERE id = ? AND user_id = ?
+            ''', [
+                (password_blob, notes_blob, entry_id, user_id)
+                for entry_id, password_blob, notes_blob in updates
+            ])
+
+            cursor.execute('''
+                UPDATE reencryption_journal
+                SET last_entry_id = ?, processed = processed + ?
+                WHERE user_id = ?
+            ''', (last_entry_id, len(updates), user_id))
+            self.churn += len(updates)
+
+    def finish_reencryption(self, user_id, journal, kdf_version):
+        """اعتماد بيانات الدخول الجديدة وحذف السجل في معاملة واحدة"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE master_user
+                SET password_hash = ?, salt = ?, kdf_version = ?, kdf_algorithm = ?, kdf_params = ?
+                WHERE id = ?
+            ''', (
+                journal['new_password_hash'],
+                journal['new_salt'],
+                kdf_version,
+                journal['new_kdf_algorithm'],
+                json.dumps(journal['new_kdf_params']) if journal.get('new_kdf_params') else None,
+                user_id
+            ))
+            cursor.execute("DELETE FROM reencryption_journal WHERE user_id = ?", (user_id,))
+
+    def backup(self, target_path, pages=64, pause=0.01, progress=None):
+        """نسخ قاعدة البيانات (كما هي مشفرة) إلى ملف بواجهة النسخ الاحتياطي في SQLite
+
+        تُنسخ pages صفحة في كل خطوة مع مهلة pause بين الخطوات من اتصال قراءة،
+        فلا يُحجب اتصال الكتابة أثناء النسخ. progress(status, remaining, total)
+        اختيارية. تُرجع عدد صفحات النسخة.
+        """
+        def step(status, remaining, total):
+            if progress:
+                progress(status, remaining, total)
+            # المهلة هنا لا في sleep الذي لا يُطبق إلا عند انشغال القاعدة
+            time.sleep(pause)
+
+        target = sqlite3.connect(target_path)
+        try:
+            # لقطة قراءة ثابتة طوال النسخ: بدونها يُعاد النسخ من البداية
+            # عند كل كتابة من اتصال آخر فقد لا ينتهي أبداً
+            with self.snapshot() as conn:
+                conn.backup(target, pages=pages, progress=step)
+
+            # نسخة مستقلة في ملف واحد دون ملفات WAL
+            target.execute("PRAGMA journal_mode = DELETE")
+            if target.execute("PRAGMA quick_check").fetchone()[0] != 'ok':
+                raise sqlite3.DatabaseError("النسخة الاحتياطية تالفة")
+            return target.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            target.close()
+
+    def storage_stats(self):
+        """حجم الملف ونسبة الصفحات الحرة ووضع auto_vacuum"""
+        with self.connections.reader() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+        in_file = self.db_path != ':memory:'
+        wal_path = f"{self.db_path}-wal"
+        return {
+            'file_size': os.path.getsize(self.db_path) if in_file else page_size * page_count,
+            'wal_size': os.path.getsize(wal_path) if in_file and os.path.exists(wal_path) else 0,
+            'page_size': page_size,
+            'page_count': page_count,
+            'free_pages': free_pages,
+            'free_ratio': free_pages / page_count if page_count else 0.0,
+            'auto_vacuum': ('none', 'full', 'incremental')[auto_vacuum],
+            'churn': self.churn
+        }
+
+    def enable_incremental_vacuum(self):
+        """تحويل ملف قائم إلى auto_vacuum=INCREMENTAL بـ VACUUM كامل (مرة واحدة)"""
+        with self.connections.write() as conn:
+            if conn.in_transaction:
+                return False
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return True
+
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def incremental_vacuum(self, pages=256):
+        """إعادة حتى pages صفحة حرة إلى نظام الملفات؛ تُرجع عدد الصفحات المحررة"""
+        with self.connections.write() as conn:
+            if conn.in_transaction:
+                return 0
+
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # execute ينفذ خطوة واحدة فقط من هذا الأمر (صفحة واحدة)
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def analyze(self):
+        """تحديث إحصاءات المخطط وتصفير عداد التغييرات"""
+        with self.connections.write() as conn:
+            conn.execute("ANALYZE")
+            self.churn = 0
+
+    def optimize(self):
+        """PRAGMA optimize ثم تقليص ملف WAL"""
+        with self.connections.write() as conn:
+            conn.execute("PRAGMA optimize").fetchall()
+            if not self.connections.shared_writer_only:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
 
     def close(self):
         """إغلاق اتصال قاعدة البيانات"""
-        if self.conn:
-            self.conn.close()
\ No newline at end of file
+        # كتابة سجلات التدقيق وأوقات الوصول المتبقية قبل الإغلاق
+        if getattr(self, 'audit_writer', None):
+            self.audit_writer.close()
+
+        if getattr(self, 'access_tracker', None):
+            self.access_tracker.close()
+
+        if self.connections:
+            self.connections.close()
\ No newline at end of file
@@ -6,9 +6,54 @@ import base64
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC # type: ignore
 from cryptography.hazmat.primitives import hashes # type: ignore
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes # type: ignore
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM # type: ignore
 from cryptography.hazmat.backends import default_backend # type: ignore
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt # type: ignore
+from cryptography.hazmat.primitives.kdf.hkdf import HKDFExpand # type: ignore
 import hashlib
+import hmac
+import time
+
+from password_generator import PasswordGenerator, PasswordPolicy
+
+
+class SessionCipher:
+    """سياق تشفير AES-GCM للجلسة يُنشأ مرة واحدة من المفتاح الرئيسي
+
+    يحتفظ بجدول المفتاح جاهزاً طوال الجلسة بدلاً من بناء كائن Cipher
+    جديد في كل عملية، ويعمل على الكتل المخزنة (إصدار + nonce + نص مشفر + وسم).
+    """
+
+    def __init__(self, key):
+        self._aead = AESGCM(key)
+
+    def encrypt_blob(self, plaintext):
+        """تشفير قيمة إلى كتلة مضغوطة: إصدار + nonce + نص مشفر + وسم"""
+        if isinstance(plaintext, str):
+            plaintext = plaintext.encode('utf-8')
+
+        nonce = os.urandom(CryptoManager.BLOB_NONCE_SIZES[CryptoManager.BLOB_VERSION])
+        return bytes((CryptoManager.BLOB_VERSION,)) + nonce + self._aead.encrypt(nonce, plaintext, None)
+
+    def decrypt_blob(self, blob):
+        """فك تشفير كتلة مضغوطة (أي إصدار مدعوم)"""
+        nonce_end = 1 + CryptoManager.BLOB_NONCE_SIZES[blob[0]]
+        decrypted = self._aead.decrypt(blob[1:nonce_end], blob[nonce_end:], None)
+
+        try:
+            return decrypted.decode('utf-8')
+        except UnicodeDecodeError:
+            return decrypted
+
+    def encrypt_many_blobs(self, plaintexts):
+        """تشفير قائمة من القيم إلى كتل (القيم الفارغة None تبقى كما هي)"""
+        encrypt = self.encrypt_blob
+        return [encrypt(p) if p is not None else None for p in plaintexts]
+
+    def decrypt_many_blobs(self, blobs):
+        """فك تشفير قائمة من الكتل مع الحفاظ على الترتيب"""
+        decrypt = self.decrypt_blob
+        return [decrypt(b) if b is not None else None for b in blobs]
 
 
 class CryptoManager:
@@ -18,7 +63,35 @@ class CryptoManager:
     SALT_SIZE = 32
     IV_SIZE = 16
     KEY_SIZE = 32  # 256-bit for AES
-    PBKDF2_ITERATIONS = 1000000  # عدد التكرارات عالي للأمان
+
+    # صيغة الكتلة المخزنة: بايت الإصدار يحدد طول nonce
+    # 1 = IV بطول 16 (بيانات مُرحّلة من الأعمدة القديمة)، 2 = nonce قياسي بطول 12
+    BLOB_VERSION = 2
+    BLOB_NONCE_SIZES = {1: 16, 2: 12}
+    LEGACY_PBKDF2_ITERATIONS = 100000  # تجزئة مخطط الدخول 1
+
+    # معاملات اشتقاق المفتاح الافتراضية والحدود الدنيا/العليا للمعايرة
+    KDF_SCRYPT = 'scrypt'
+    KDF_PBKDF2 = 'pbkdf2-sha512'
+    DEFAULT_KDF = KDF_SCRYPT
+    SCRYPT_N = 2 ** 14
+    SCRYPT_R = 8
+    SCRYPT_P = 1
+    SCRYPT_MAX_N = 2 ** 17  # حد الذاكرة: 128 * r * n = 128 ميغابايت
+    PBKDF2_MIN_ITERATIONS = 100000
+    PBKDF2_MAX_ITERATIONS = 10000000
+    KDF_TARGET_MS = 250  # زمن فتح الخزنة المستهدف
+
+    # الفتح السريع برمز PIN: KDF رخيص لأن المفتاح المغلف لا يغادر الذاكرة
+    # وعدد المحاولات محدود بشدة
+    QUICK_UNLOCK_ITERATIONS = 20000
+
+    # إصدارات مخطط تسجيل الدخول:
+    # 1 = تجزئة PBKDF2 منفصلة + اشتقاق Scrypt للمفتاح (تمددان لكل دخول)
+    # 2 = تشغيل Scrypt واحد يُشتق منه المفتاح وقيمة التحقق عبر HKDF
+    LOGIN_SCHEME_LEGACY = 1
+    LOGIN_SCHEME_VERSION = 2
+    VERIFIER_INFO = b'secure-password-manager/login-verifier/v2'
 
     @staticmethod
     def generate_salt(size=SALT_SIZE):
@@ -31,22 +104,137 @@ class CryptoManager:
         return os.urandom(size)
 
     @staticmethod
-    def derive_key(password, salt, iterations=PBKDF2_ITERATIONS):
-        """اشتقاق مفتاح من كلمة المرور باستخدام PBKDF2"""
+    def default_kdf_params(algorithm=DEFAULT_KDF):
+        """معاملات KDF الافتراضية (المستخدمة للحسابات التي لم تُعاير)"""
+        if algorithm == CryptoManager.KDF_PBKDF2:
+            return {'iterations': CryptoManager.PBKDF2_MIN_ITERATIONS}
+        return {
+            'n': CryptoManager.SCRYPT_N,
+            'r': CryptoManager.SCRYPT_R,
+            'p': CryptoManager.SCRYPT_P
+        }
+
+    @staticmethod
+    def derive_key(password, salt, algorithm=DEFAULT_KDF, kdf_params=None):
+        """اشتقاق مفتاح من كلمة المرور باستخدام Scrypt (أو PBKDF2 حسب المعاملات)
+
+        التكلفة تأتي من kdf_params (المعايرة والمخزنة لكل مستخدم)، وإلا
+        فمن default_kdf_params.
+        """
         password_bytes = password.encode('utf-8')
 
-        # استخدام Scrypt بدلاً من PBKDF2HMAC للأفضلية الأمنية
-        kdf = Scrypt(
-            salt=salt,
+        if kdf_params is None:
+            kdf_params = CryptoManager.default_kdf_params(algorithm)
+
+        if algorithm == CryptoManager.KDF_PBKDF2:
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA512(),
+                length=CryptoManager.KEY_SIZE,
+                salt=salt,
+                iterations=kdf_params['iterations'],
+                backend=default_backend()
+            )
+        elif algorithm == CryptoManager.KDF_SCRYPT:
+            # استخدام Scrypt بدلاً من PBKDF2HMAC للأفضلية الأمنية
+            kdf = Scrypt(
+                salt=salt,
+                length=CryptoManager.KEY_SIZE,
+                n=kdf_params['n'],  # عامل التكلفة
+                r=kdf_params['r'],
+                p=kdf_params['p'],
+                backend=default_backend()
+            )
+        else:
+            raise ValueError(f"خوارزمية اشتقاق غير مدعومة: {algorithm}")
+
+        key = kdf.derive(password_bytes)
+        return key
+
+    @staticmethod
+    def _time_kdf(algorithm, kdf_params):
+        """قياس زمن تشغيل واحد لـ KDF بالمللي ثانية"""
+        salt = os.urandom(CryptoManager.SALT_SIZE)
+        start = time.perf_counter()
+        CryptoManager.derive_key('calibration', salt, algorithm=algorithm, kdf_params=kdf_params)
+        return (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    def calibrate_kdf(target_ms=KDF_TARGET_MS, algorithm=DEFAULT_KDF):
+        """معايرة معاملات KDF على الجهاز الحالي للوصول إلى زمن الفتح المستهدف
+
+        تبدأ من المعاملات الافتراضية (لا تنزل تحتها أبداً) وتضاعف التكلفة
+        ما دام التشغيل التالي سيبقى ضمن الزمن المستهدف.
+        """
+        params = CryptoManager.default_kdf_params(algorithm)
+
+        if algorithm == CryptoManager.KDF_PBKDF2:
+            # تكلفة PBKDF2 خطية في عدد التكرارات: قياس واحد يكفي للتقدير
+            elapsed = CryptoManager._time_kdf(algorithm, params)
+            iterations = int(params['iterations'] * target_ms / max(elapsed, 0.001))
+            params['iterations'] = max(
+                CryptoManager.PBKDF2_MIN_ITERATIONS,
+                min(iterations, CryptoManager.PBKDF2_MAX_ITERATIONS)
+            )
+            return {'algorithm': algorithm, 'params': params}
+
+        elapsed = CryptoManager._time_kdf(algorithm, params)
+        while elapsed * 2 <= target_ms and params['n'] < CryptoManager.SCRYPT_MAX_N:
+            params['n'] *= 2
+            elapsed = CryptoManager._time_kdf(algorithm, params)
+
+        return {'algorithm': algorithm, 'params': params}
+
+    @staticmethod
+    def compute_login_verifier(key):
+        """حساب قيمة التحقق من المفتاح المشتق (فصل المجال عبر HKDF-Expand)
+
+        المفتاح نفسه يبقى مفتاح التشفير للخزنة حتى تبقى البيانات المشفرة
+        سابقاً قابلة للقراءة، وقيمة التحقق دالة أحادية الاتجاه منه.
+        """
+        verifier = HKDFExpand(
+            algorithm=hashes.SHA256(),
             length=32,
-            n=2 ** 14,  # عامل التكلفة
-            r=8,
-            p=1,
+            info=CryptoManager.VERIFIER_INFO,
+            backend=default_backend()
+        ).derive(key)
+        return base64.b64encode(verifier).decode('utf-8')
+
+    @staticmethod
+    def derive_login_keys(password, salt, algorithm=DEFAULT_KDF, kdf_params=None):
+        """اشتقاق مفتاح الخزنة وقيمة التحقق من تشغيل KDF واحد"""
+        key = CryptoManager.derive_key(password, salt, algorithm=algorithm, kdf_params=kdf_params)
+        return {
+            'key': key,
+            'verifier': CryptoManager.compute_login_verifier(key)
+        }
+
+    @staticmethod
+    def check_login_verifier(verifier, stored_verifier):
+        """مقارنة قيمة التحقق بزمن ثابت"""
+        return hmac.compare_digest(verifier.encode('utf-8'), stored_verifier.encode('utf-8'))
+
+    @staticmethod
+    def derive_pin_key(pin, salt):
+        """اشتقاق مفتاح تغليف قصير العمر من رمز PIN"""
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=CryptoManager.KEY_SIZE,
+            salt=salt,
+            iterations=CryptoManager.QUICK_UNLOCK_ITERATIONS,
             backend=default_backend()
         )
+        return kdf.derive(pin.encode('utf-8'))
 
-        key = kdf.derive(password_bytes)
-        return key
+    @staticmethod
+    def wrap_key(key, wrapping_key):
+        """تغليف مفتاح بمفتاح آخر باستخدام AES-GCM"""
+        nonce = os.urandom(12)
+        return nonce + AESGCM(wrapping_key).encrypt(nonce, key, None)
+
+    @staticmethod
+    def unwrap_key(wrapped, wrapping_key):
+        """فك تغليف مفتاح (يرفع استثناء عند خطأ مفتاح التغليف)"""
+        return AESGCM(wrapping_key).decrypt(wrapped[:12], wrapped[12:], None)
 
     @staticmethod
     def encrypt_data(plaintext, key, iv=None):
@@ -74,6 +262,18 @@ class CryptoManager:
             'iv': iv
         }
 
+    @staticmethod
+    def create_session_cipher(key):
+        """إنشاء سياق تشفير للجلسة من المفتاح الرئيسي"""
+        return SessionCipher(key)
+
+    @staticmethod
+    def pack_encrypted(encrypted_data):
+        """تحويل نتيجة encrypt_data إلى كتلة مخزنة واحدة"""
+        iv = encrypted_data['iv']
+        version = next(v for v, size in CryptoManager.BLOB_NONCE_SIZES.items() if size == len(iv))
+        return bytes((version,)) + iv + encrypted_data['ciphertext'] + encrypted_data['tag']
+
     @staticmethod
     def decrypt_data(encrypted_data, key):
         """فك تشفير البيانات باستخدام AES-GCM"""
@@ -106,7 +306,7 @@ class CryptoManager:
             algorithm=hashes.SHA512(),
             length=64,
             salt=salt,
-            iterations=100000,
+            iterations=CryptoManager.LEGACY_PBKDF2_ITERATIONS,
             backend=default_backend()
         )
 
@@ -125,7 +325,7 @@ class CryptoManager:
             algorithm=hashes.SHA512(),
             length=64,
             salt=base64.b64decode(salt),
-            iterations=100000,
+            iterations=CryptoManager.LEGACY_PBKDF2_ITERATIONS,
             backend=default_backend()
         )
 
@@ -135,9 +335,25 @@ class CryptoManager:
         except Exception:
             return False
 
+    _generator = PasswordGenerator()
+
+    @staticmethod
+    def generate_secure_password(length=16, policy=None):
+        """إنشاء كلمة مرور عشوائية قوية (بدون انحياز)"""
+        if policy is None:
+            if length < 1:
+                return ''
+            policy = PasswordPolicy(length=length, require_each_class=False)
+            # الأطوال الأقصر من عدد الفئات لا تشترط حرفاً من كل فئة
+            policy.require_each_class = length >= len(policy.classes)
+        return CryptoManager._generator.generate(policy)
+
+    @staticmethod
+    def generate_secure_passwords(count, policy=None):
+        """إنشاء عدد كبير من كلمات المرور في استدعاء واحد"""
+        return CryptoManager._generator.generate_many(count, policy)
+
     @staticmethod
-    def generate_secure_password(length=16):
-        """إنشاء كلمة مرور عشوائية قوية"""
-        chars = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!@#$%^&*()_-+=<>?"
-        password = ''.join(chars[os.urandom(1)[0] % len(chars)] for _ in range(length))
-        return password
\ No newline at end of file
+    def generate_passphrase(words=6, separator='-', capitalize=False):
+        """إنشاء عبارة مرور من كلمات عشوائية"""
+        return CryptoManager._generator.generate_passphrase(words, separator, capitalize)
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""
+مولد كلمات المرور وعبارات المرور الآمن
+"""
+import math
+import os
+import threading
+
+
+# قائمة كلمات مدمجة لعبارات المرور (بأسلوب Diceware)
+_BUILTIN_WORDS = """
+    able acid aged also area army away baby back ball band bank base bath
+    bear beat bell belt best bird blow blue boat body bold bone book boot
+    born boss both bowl bulk burn bush busy cake calm came camp card care
+    cart case cash cast cell chef chin chip city clay club coal coat code
+    coin cold cook cool cope copy core corn cost crew crop cube cure dark
+    data date dawn dead deal dear debt deck deep deer desk dial diet dirt
+    dish dock door dose down draw drop drum duck dust duty each earn ease
+    east easy edge else envy epic even exit face fact fade fair fall farm
+    fast fate fear feed feel file fill film find fine fire firm fish five
+    flag flat flow folk food foot form fort four free frog fuel full fund
+    gain game gate gear gift girl give glad glow glue goal goat gold golf
+    good gray grid grip grow gulf hair half hall hand hang hard harm hat
+    have head heat help herb hero hide high hill hint hold hole home hook
+    hope horn host hour huge hunt idea inch iron item jazz join joke jump
+    jury just keen keep kick kind king kite knee knot lake lamp land lane
+    last late lawn lead leaf lean left lend lens life lift lime line link
+    lion list live load loan lock loft long look loop lord loud love luck
+    lung made mail main make mall many mark mask mass mate math maze meal
+    meat melt menu mild milk mill mind mint miss mode mood moon more moss
+    most move much must nail name navy near neat neck need nest news next
+    nice nine node noon nose note oath odds okay once only open oval oven
+    over pace pack page pain pair palm park part pass past path peak pear
+    peel pier pile pine pink pipe plan play plot plug plum poem poet pole
+    pond pony pool port pose post pour pull pump pure push quiz race rack
+    rail rain ramp rank rare rate read real reed rent rest rice rich ride
+    ring rise risk road rock role roll roof room root rope rose ruby rule
+    rush safe sail salt same sand save scan seal seat seed self sell send
+    ship shoe shop shot show sign silk sing site size skin slot slow snow
+    soap sock soft soil sole song soup sour spin spot star stay stem step
+    stop such suit sure swan swim tail take tale talk tall tank tape task
+    team tent term test text tide tile time tiny tone tool tour town tree
+    trip true tube tune turn twin type unit upon used vase vast verb very
+    vest view vote wage wait wake walk wall want warm wash wave wear week
+    well west wheat when whip wide wife wild will wind wine wing wire wise
+    wish wolf wood wool word work yard yarn year yell zero zone acorn actor
+    adapt admit adult agent agree alarm album alert alien alley amber angle
+    ankle apple april apron arena armor arrow aside atlas audio award bacon
+    badge baker basic basin beach beard bench berry bingo blade blank blaze
+    blend bloom board bonus boost booth brain brave bread brick bride brief
+    broom brush buddy bunch cabin cable camel candy canoe cargo carol chair
+    chalk charm chart chess chief child cider cigar civic claim clerk cliff
+    clock cloud coach coral couch cover crane crate cream crown cubic curve
+    cycle daily dairy daisy dance delta depot diary disco donor draft drama
+    dream dress drill drink eagle early earth elbow elder ember entry equal
+    error essay event fable fairy fancy feast fence ferry fiber field flame
+    flask fleet flint flock flour fluid flute focus forge frame fresh front
+    frost fruit giant glass globe glory grain grape grass great green guard
+    guest guide habit happy harbor heart hedge honey horse hotel house humor
+    ideal image index ivory jelly jewel joint judge juice karma kayak knife
+    label laser lemon level light linen llama lodge logic lunar lunch magic
+    mango maple march medal melon metal meter model money motor mouse music
+    nerve night noble north novel ocean olive onion opera orbit otter owner
+    paint panel paper party pasta patch peace pearl pedal penny piano pilot
+    pizza place plain plane plant plaza point polar porch pouch power press
+    price pride prize proof proud pulse punch quart queen quest quiet radar
+    radio raven razor ready relay rider ridge river robin robot rocky royal
+    rugby ruler salad sauce scale scarf scene scout shape shark shelf shell
+    shine shirt silver skate skill slice smile snack solar sound south space
+    spark spice spoon sport squad stage stamp stand steam steel stone storm
+    story stove straw sugar sunny swift table talon tango teach tiger toast
+    token topaz torch tower track trail train treat trend tribe trout truck
+    tulip tutor ultra uncle union urban valid value valve vapor vault video
+    vigor villa vinyl viola vivid vocal voice wagon water whale wheel whisk
+    width witty world yacht yield young zebra
+"""
+
+_wordlist_cache = None
+_wordlist_lock = threading.Lock()
+
+
+def get_builtin_wordlist():
+    """تحميل قائمة الكلمات المدمجة عند أول استخدام ومشاركتها بين الاستدعاءات"""
+    global _wordlist_cache
+    if _wordlist_cache is None:
+        with _wordlist_lock:
+            if _wordlist_cache is None:
+                _wordlist_cache = tuple(_BUILTIN_WORDS.split())
+    return _wordlist_cache
+
+
+class PasswordPolicy:
+    """سياسة إنشاء كلمات المرور"""
+
+    LOWERCASE = "abcdefghijklmnopqrstuvwxyz"
+    UPPERCASE = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    DIGITS = "0123456789"
+    SYMBOLS = "!@#$%^&*()_-+=<>?"
+    AMBIGUOUS = "Il1|O0o"
+
+    def __init__(self, length=16, min_length=None, max_length=None,
+                 lowercase=True, uppercase=True, digits=True, symbols=True,
+                 require_each_class=True, exclude_ambiguous=False, exclude_chars=''):
+        """إنشاء سياسة (طول ثابت أو مدى أطوال، فئات الأحرف، الأحرف المستبعدة)"""
+        self.min_length = min_length or length
+        self.max_length = max_length or max(length, self.min_length)
+        self.require_each_class = require_each_class
+
+        excluded = set(exclude_chars)
+        if exclude_ambiguous:
+            excluded.update(self.AMBIGUOUS)
+
+        enabled = [
+            (lowercase, self.LOWERCASE),
+            (uppercase, self.UPPERCASE),
+            (digits, self.DIGITS),
+            (symbols, self.SYMBOLS),
+        ]
+        self.classes = [
+            ''.join(c for c in chars if c not in excluded)
+            for flag, chars in enabled if flag
+        ]
+        self.classes = [chars for chars in self.classes if chars]
+        self.alphabet = ''.join(self.classes)
+
+        if not self.alphabet:
+            raise ValueError("السياسة لا تسمح بأي حرف")
+        if self.min_length < 1 or self.min_length > self.max_length:
+            raise ValueError("مدى الطول غير صالح")
+        if require_each_class and self.min_length < len(self.classes):
+            raise ValueError("الطول أقصر من عدد الفئات المطلوبة")
+
+    def entropy_bits(self, length=None):
+        """الإنتروبيا التقريبية لكلمة مرور بهذه السياسة"""
+        return (length or self.min_length) * math.log2(len(self.alphabet))
+
+
+class PasswordGenerator:
+    """مولد كلمات مرور بدون انحياز يسحب العشوائية في مخزن واحد
+
+    يُملأ المخزن باستدعاء os.urandom واحد لكل عدة آلاف من الأحرف، ويتم
+    تحويل البايتات إلى أحرف بأخذ العينات بالرفض (بدون انحياز الباقي)
+    عبر bytes.translate على مستوى C.
+    """
+
+    BUFFER_SIZE = 4096
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._buffer = b''
+        self._lock = threading.Lock()
+        self._tables = {}
+
+    def _random_bytes(self, count):
+        """سحب عدد من البايتات العشوائية من المخزن"""
+        with self._lock:
+            if len(self._buffer) < count:
+                self._buffer += os.urandom(max(self.buffer_size, count))
+            data, self._buffer = self._buffer[:count], self._buffer[count:]
+        return data
+
+    def _translation(self, alphabet):
+        """جدول تحويل البايت إلى حرف مع حذف البايتات المرفوضة"""
+        table = self._tables.get(alphabet)
+        if table is None:
+            size = len(alphabet)
+            limit = 256 - (256 % size)
+            mapping = bytes(ord(alphabet[b % size]) if b < limit else 0 for b in range(256))
+            rejected = bytes(range(limit, 256))
+            table = self._tables[alphabet] = (mapping, rejected, limit)
+        return table
+
+    def _random_chars(self, alphabet, count):
+        """إنشاء سلسلة أحرف موزعة بانتظام من الأبجدية"""
+        if any(ord(c) > 127 for c in alphabet) or len(alphabet) > 256:
+            return ''.join(alphabet[self.randbelow(len(alphabet))] for _ in range(count))
+
+        mapping, rejected, limit = self._translation(alphabet)
+        chunks = []
+        needed = count
+
+        while needed > 0:
+            # طلب بايتات إضافية بقدر نسبة الرفض المتوقعة
+            draw = needed * 256 // limit + 16
+            chars = self._random_bytes(draw).translate(mapping, rejected)[:needed]
+            chunks.append(chars)
+            needed -= len(chars)
+
+        return b''.join(chunks).decode('ascii')
+
+    def randbelow(self, upper):
+        """عدد صحيح عشوائي منتظم في المدى [0, upper)"""
+        if upper <= 0:
+            raise ValueError("الحد الأعلى يجب أن يكون موجباً")
+
+        nbytes = max(1, (upper.bit_length() + 7) // 8)
+        limit = (256 ** nbytes // upper) * upper
+
+        while True:
+            value = int.from_bytes(self._random_bytes(nbytes), 'big')
+            if value < limit:
+                return value % upper
+
+    def _pick_length(self, policy):
+        """اختيار الطول ضمن مدى السياسة"""
+        if policy.min_length == policy.max_length:
+            return policy.min_length
+        return policy.min_length + self.randbelow(policy.max_length - policy.min_length + 1)
+
+    @staticmethod
+    def _satisfies(password, policy):
+        """التحقق من وجود حرف واحد على الأقل من كل فئة مطلوبة"""
+        if not policy.require_each_class:
+            return True
+        return all(any(c in chars for c in password) for chars in policy.classes)
+
+    def generate(self, policy=None):
+        """إنشاء كلمة مرور واحدة"""
+        return self.generate_many(1, policy)[0]
+
+    def generate_many(self, count, policy=None):
+        """إنشاء عدد كبير من كلمات المرور في استدعاء واحد
+
+        المرشحات التي لا تحقق الفئات المطلوبة تُرفض وتُعاد (أخذ عينات
+        بالرفض) حتى يبقى التوزيع منتظماً على كلمات المرور المقبولة.
+        """
+        policy = policy or PasswordPolicy()
+        results = []
+
+        while len(results) < count:
+            lengths = [self._pick_length(policy) for _ in range(count - len(results))]
+            stream = self._random_chars(policy.alphabet, sum(lengths))
+
+            offset = 0
+            for length in lengths:
+                candidate = stream[offset:offset + length]
+                offset += length
+                if self._satisfies(candidate, policy):
+                    results.append(candidate)
+
+        return results
+
+    def generate_passphrase(self, words=6, separator='-', capitalize=False, wordlist=None):
+        """إنشاء عبارة مرور من كلمات عشوائية"""
+        return self.generate_passphrases(1, words, separator, capitalize, wordlist)[0]
+
+    def generate_passphrases(self, count, words=6, separator='-', capitalize=False, wordlist=None):
+        """إنشاء عدد من عبارات المرور"""
+        wordlist = wordlist or get_builtin_wordlist()
+        size = len(wordlist)
+        phrases = []
+
+        for _ in range(count):
+            chosen = [wordlist[self.randbelow(size)] for _ in range(words)]
+            if capitalize:
+                chosen = [w.capitalize() for w in chosen]
+            phrases.append(separator.join(chosen))
+
+        return phrases
+
+    @staticmethod
+    def passphrase_entropy_bits(words=6, wordlist=None):
+        """إنتروبيا عبارة المرور بالبت"""
+        return words * math.log2(len(wordlist or get_builtin_wordlist()))
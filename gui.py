@@ -3,10 +3,12 @@
 """
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
+import itertools
 import threading
 import time
 from datetime import datetime
 from password_manager import PasswordManager
+from password_strength import StrengthEstimator
 from PIL import Image, ImageTk
 import os
 import pyperclip
@@ -29,6 +31,10 @@ class SecurePasswordManagerGUI:
         self.theme = "dark"
         self.language = "ar"
 
+        # تحميل القوائم على صفحات حتى تظهر الصفحة الأولى فوراً
+        self.list_page_size = 200
+        self._list_generation = 0
+
         # إنشاء واجهة المستخدم
         self.setup_ui()
 
@@ -72,6 +78,7 @@ class SecurePasswordManagerGUI:
         menubar.add_cascade(label="ملف", menu=file_menu)
         file_menu.add_command(label="تصدير كلمات المرور", command=self.export_passwords)
         file_menu.add_command(label="استيراد كلمات المرور", command=self.import_passwords)
+        file_menu.add_command(label="نسخة احتياطية الآن", command=self.create_backup)
         file_menu.add_separator()
         file_menu.add_command(label="تسجيل الخروج", command=self.logout)
         file_menu.add_command(label="خروج", command=self.on_closing)
@@ -81,12 +88,15 @@ class SecurePasswordManagerGUI:
         menubar.add_cascade(label="تحرير", menu=edit_menu)
         edit_menu.add_command(label="إضافة كلمة مرور جديدة", command=lambda: self.show_add_password_dialog())
         edit_menu.add_command(label="تغيير كلمة المرور الرئيسية", command=self.change_master_password_dialog)
+        edit_menu.add_command(label="تعيين رمز الفتح السريع", command=self.set_quick_unlock_pin)
 
         # عرض
         view_menu = tk.Menu(menubar, tearoff=0, bg='#2d2d2d', fg='white')
         menubar.add_cascade(label="عرض", menu=view_menu)
         view_menu.add_command(label="تغيير السمة", command=self.toggle_theme)
         view_menu.add_command(label="سجلات التدقيق", command=self.show_audit_logs)
+        view_menu.add_command(label="الإعدادات", command=lambda: self.show_page("settings"))
+        view_menu.add_command(label="معلومات التخزين", command=self.show_storage_report)
 
         # مساعدة
         help_menu = tk.Menu(menubar, tearoff=0, bg='#2d2d2d', fg='white')
@@ -166,7 +176,7 @@ class SecurePasswordManagerGUI:
         button_frame.grid(row=2, column=0, columnspan=2, pady=(10, 0))
 
         # زر تسجيل الدخول
-        login_btn = tk.Button(
+        self.login_btn = tk.Button(
             button_frame,
             text="تسجيل الدخول",
             font=("Arial", 12, "bold"),
@@ -177,7 +187,7 @@ class SecurePasswordManagerGUI:
             command=self.login,
             cursor='hand2'
         )
-        login_btn.pack(side='left', padx=10)
+        self.login_btn.pack(side='left', padx=10)
 
         # زر التسجيل
         register_btn = tk.Button(
@@ -535,9 +545,71 @@ class SecurePasswordManagerGUI:
         )
         language_combo.grid(row=4, column=1, pady=10, padx=(10, 0))
 
+        # نافذة الفتح السريع
+        tk.Label(
+            settings_frame,
+            text="نافذة الفتح السريع (ثانية):",
+            font=("Arial", 12),
+            bg='#2d2d2d',
+            fg='white'
+        ).grid(row=5, column=0, sticky='w', pady=10)
+
+        self.quick_unlock_window_var = tk.StringVar(value="600")
+        quick_unlock_entry = tk.Entry(
+            settings_frame,
+            textvariable=self.quick_unlock_window_var,
+            font=("Arial", 12),
+            bg='#3d3d3d',
+            fg='white',
+            insertbackground='white',
+            width=20
+        )
+        quick_unlock_entry.grid(row=5, column=1, pady=10, padx=(10, 0))
+
+        # الاحتفاظ بسجل التدقيق
+        tk.Label(
+            settings_frame,
+            text="مدة الاحتفاظ بسجل التدقيق (يوم):",
+            font=("Arial", 12),
+            bg='#2d2d2d',
+            fg='white'
+        ).grid(row=6, column=0, sticky='w', pady=10)
+
+        self.audit_retention_var = tk.StringVar(value="180")
+        audit_retention_entry = tk.Entry(
+            settings_frame,
+            textvariable=self.audit_retention_var,
+            font=("Arial", 12),
+            bg='#3d3d3d',
+            fg='white',
+            insertbackground='white',
+            width=20
+        )
+        audit_retention_entry.grid(row=6, column=1, pady=10, padx=(10, 0))
+
+        tk.Label(
+            settings_frame,
+            text="الحد الأقصى لسجلات التدقيق:",
+            font=("Arial", 12),
+            bg='#2d2d2d',
+            fg='white'
+        ).grid(row=7, column=0, sticky='w', pady=10)
+
+        self.audit_max_rows_var = tk.StringVar(value="5000")
+        audit_max_rows_entry = tk.Entry(
+            settings_frame,
+            textvariable=self.audit_max_rows_var,
+            font=("Arial", 12),
+            bg='#3d3d3d',
+            fg='white',
+            insertbackground='white',
+            width=20
+        )
+        audit_max_rows_entry.grid(row=7, column=1, pady=10, padx=(10, 0))
+
         # أزرار
         button_frame = tk.Frame(settings_frame, bg='#2d2d2d')
-        button_frame.grid(row=5, column=0, columnspan=2, pady=(20, 0))
+        button_frame.grid(row=8, column=0, columnspan=2, pady=(20, 0))
 
         tk.Button(
             button_frame,
@@ -574,6 +646,8 @@ class SecurePasswordManagerGUI:
         if page_name == "main" and self.current_user:
             self.load_user_data()
             self.refresh_password_list()
+        elif page_name == "settings" and self.current_user:
+            self.load_settings()
 
     def login(self):
         """تسجيل الدخول"""
@@ -608,6 +682,12 @@ class SecurePasswordManagerGUI:
         else:
             self.login_status.config(text=message, fg='#FF5252')
 
+            # تعطيل زر الدخول حتى انتهاء مدة الحظر
+            wait = self.pm.login_retry_after(username)
+            if wait:
+                self.login_btn.config(state='disabled')
+                self.root.after(wait * 1000, lambda: self.login_btn.config(state='normal'))
+
     def register(self):
         """تسجيل مستخدم جديد"""
         username = self.username_entry.get().strip()
@@ -647,6 +727,42 @@ class SecurePasswordManagerGUI:
         self.current_user = None
         self.show_page("login")
 
+    def set_quick_unlock_pin(self):
+        """تعيين رمز PIN للفتح السريع"""
+        if not self.current_user:
+            messagebox.showerror("خطأ", "يجب تسجيل الدخول أولاً")
+            return
+
+        pin = self.ask_password("الفتح السريع", "أدخل رمز PIN لفتح الخزنة سريعاً بعد القفل التلقائي:")
+        if not pin:
+            return
+
+        success, message = self.pm.set_quick_unlock_pin(pin)
+
+        if success:
+            messagebox.showinfo("نجاح", message)
+        else:
+            messagebox.showerror("خطأ", message)
+
+    def handle_auto_lock(self):
+        """معالجة القفل التلقائي: محاولة الفتح السريع ثم العودة لتسجيل الدخول"""
+        username = self.current_user
+        self.current_user = None
+        self.show_page("login")
+
+        while self.pm.quick_unlock_available(username):
+            pin = self.ask_password("الخزنة مقفلة", "أدخل رمز PIN للفتح السريع:")
+            if not pin:
+                break
+
+            success, message = self.pm.quick_unlock(pin)
+            if success:
+                self.current_user = username
+                self.show_page("main")
+                return
+
+            self.login_status.config(text=message, fg='#FF5252')
+
     def load_user_data(self):
         """تحميل بيانات المستخدم"""
         if self.current_user:
@@ -655,10 +771,6 @@ class SecurePasswordManagerGUI:
 
     def refresh_password_list(self):
         """تحديث قائمة كلمات المرور"""
-        # مسح القائمة الحالية
-        for item in self.password_tree.get_children():
-            self.password_tree.delete(item)
-
         # تحميل التصنيفات
         categories = self.pm.get_categories()
         self.category_listbox.delete(0, tk.END)
@@ -667,19 +779,48 @@ class SecurePasswordManagerGUI:
             self.category_listbox.insert(tk.END, category)
 
         # تحميل كلمات المرور
-        passwords = self.pm.get_all_passwords()
+        self.load_password_rows()
 
-        for pwd in passwords:
-            self.password_tree.insert('', 'end', values=(
-                pwd['id'],
-                pwd['title'],
-                pwd['username'] or '',
-                pwd['email'] or '',
-                pwd['category'],
-                pwd['updated_at']
-            ))
+    def load_password_rows(self, category=None):
+        """تحميل المدخلات في القائمة صفحة بعد صفحة دون تجميد الواجهة"""
+        # مسح القائمة الحالية وإلغاء أي تحميل سابق لم يكتمل
+        for item in self.password_tree.get_children():
+            self.password_tree.delete(item)
 
-        self.status_bar.config(text=f"تم تحميل {len(passwords)} مدخل")
+        self._list_generation += 1
+        generation = self._list_generation
+        rows = self.pm.iter_passwords(category, self.list_page_size)
+        loaded = 0
+
+        def load_next_page():
+            nonlocal loaded
+            if generation != self._list_generation:
+                return
+
+            count = 0
+            for pwd in rows:
+                self.password_tree.insert('', 'end', values=(
+                    pwd['id'],
+                    pwd['title'],
+                    pwd['username'] or '',
+                    pwd['email'] or '',
+                    pwd['category'],
+                    pwd['updated_at']
+                ))
+                count += 1
+                if count == self.list_page_size:
+                    break
+
+            loaded += count
+            if count == self.list_page_size:
+                self.status_bar.config(text=f"جاري التحميل... {loaded} مدخل")
+                self.root.after(1, load_next_page)
+            elif category:
+                self.status_bar.config(text=f"تم تحميل {loaded} مدخل في تصنيف {category}")
+            else:
+                self.status_bar.config(text=f"تم تحميل {loaded} مدخل")
+
+        load_next_page()
 
     def on_category_select(self, event):
         """عند اختيار تصنيف"""
@@ -691,46 +832,35 @@ class SecurePasswordManagerGUI:
         if category == "الكل":
             self.refresh_password_list()
         else:
-            # مسح القائمة الحالية
-            for item in self.password_tree.get_children():
-                self.password_tree.delete(item)
-
             # تحميل كلمات المرور للتصنيف المحدد
-            passwords = self.pm.get_all_passwords(category)
-
-            for pwd in passwords:
-                self.password_tree.insert('', 'end', values=(
-                    pwd['id'],
-                    pwd['title'],
-                    pwd['username'] or '',
-                    pwd['email'] or '',
-                    pwd['category'],
-                    pwd['updated_at']
-                ))
-
-            self.status_bar.config(text=f"تم تحميل {len(passwords)} مدخل في تصنيف {category}")
+            self.load_password_rows(category)
 
     def on_search(self, event):
         """عند البحث"""
-        query = self.search_entry.get().lower()
+        query = self.search_entry.get().strip()
 
         # إذا كان البحث فارغاً، أعد تحميل القائمة الكاملة
         if not query:
+            self.load_password_rows()
             return
 
-        # تصفية العناصر
+        # البحث في فهرس قاعدة البيانات بدلاً من تصفية عناصر القائمة
+        self._list_generation += 1
         for item in self.password_tree.get_children():
-            values = self.password_tree.item(item, 'values')
-            if any(query in str(value).lower() for value in values):
-                self.password_tree.item(item, tags=('match',))
-                self.password_tree.selection_set(item)
-            else:
-                self.password_tree.item(item, tags=('nomatch',))
-                self.password_tree.selection_remove(item)
+            self.password_tree.delete(item)
+
+        results = self.pm.search(query, limit=self.list_page_size)
+        for pwd in results:
+            self.password_tree.insert('', 'end', values=(
+                pwd['id'],
+                pwd['title'],
+                pwd['username'] or '',
+                pwd['email'] or '',
+                pwd['category'],
+                pwd['updated_at']
+            ))
 
-        # إخفاء العناصر غير المتطابقة
-        self.password_tree.tag_configure('match', background='#3d3d3d')
-        self.password_tree.tag_configure('nomatch', background='#2d2d2d')
+        self.status_bar.config(text=f"تم العثور على {len(results)} نتيجة")
 
     def on_password_double_click(self, event):
         """عند النقر المزدوج على عنصر"""
@@ -1045,9 +1175,37 @@ class SecurePasswordManagerGUI:
 
         entries['password'] = password_entry
 
+        # مؤشر قوة كلمة المرور (يُعاد حسابه تزايدياً مع كل تغيير)
+        strength_colors = ('#F44336', '#FF5722', '#FFC107', '#8BC34A', '#4CAF50')
+        strength_label = tk.Label(
+            form_frame,
+            text="",
+            font=("Arial", 10),
+            bg='#3d3d3d',
+            fg='#aaa'
+        )
+        strength_label.grid(row=len(fields) + 1, column=1, sticky='w', padx=(10, 0))
+        estimator = StrengthEstimator()
+
+        def update_strength(*_):
+            password = password_var.get()
+            if not password:
+                strength_label.config(text="")
+                return
+
+            result = estimator.estimate(password)
+            hint = f" - {result.feedback[0]}" if result.feedback else ""
+            strength_label.config(
+                text=f"القوة: {result.label}{hint}",
+                fg=strength_colors[result.score]
+            )
+
+        password_var.trace_add('write', update_strength)
+        update_strength()
+
         # أزرار الإجراءات
         button_frame = tk.Frame(form_frame, bg='#3d3d3d')
-        button_frame.grid(row=len(fields) + 1, column=0, columnspan=2, pady=(20, 0))
+        button_frame.grid(row=len(fields) + 2, column=0, columnspan=2, pady=(20, 0))
 
         def save_entry():
             # جمع البيانات
@@ -1143,6 +1301,20 @@ class SecurePasswordManagerGUI:
         self.category_listbox.selection_clear(0, tk.END)
         self.refresh_password_list()
 
+    def load_settings(self):
+        """تعبئة صفحة الإعدادات بالقيم المحفوظة"""
+        settings = self.pm.get_settings()
+        if not settings:
+            return
+
+        self.clipboard_timeout_var.set(str(settings['clipboard_timeout']))
+        self.auto_lock_var.set(str(settings['auto_lock_timeout']))
+        self.theme_var.set(settings['theme'])
+        self.language_var.set(settings['language'])
+        self.quick_unlock_window_var.set(str(settings['quick_unlock_window']))
+        self.audit_retention_var.set(str(settings['audit_retention_days']))
+        self.audit_max_rows_var.set(str(settings['audit_max_rows']))
+
     def save_settings(self):
         """حفظ الإعدادات"""
         try:
@@ -1150,7 +1322,10 @@ class SecurePasswordManagerGUI:
                 'clipboard_timeout': int(self.clipboard_timeout_var.get()),
                 'auto_lock_timeout': int(self.auto_lock_var.get()),
                 'theme': self.theme_var.get(),
-                'language': self.language_var.get()
+                'language': self.language_var.get(),
+                'quick_unlock_window': int(self.quick_unlock_window_var.get()),
+                'audit_retention_days': int(self.audit_retention_var.get()),
+                'audit_max_rows': int(self.audit_max_rows_var.get())
             }
 
             success, message = self.pm.update_settings(settings)
@@ -1205,6 +1380,22 @@ class SecurePasswordManagerGUI:
         else:
             messagebox.showerror("خطأ", message)
 
+    def create_backup(self):
+        """إنشاء نسخة احتياطية في الخلفية"""
+        if not self.current_user:
+            messagebox.showerror("خطأ", "يجب تسجيل الدخول أولاً")
+            return
+
+        def backup_thread():
+            success, message = self.pm.create_backup()
+
+            # عرض النتيجة في الخيط الرئيسي
+            self.root.after(0, lambda: (
+                messagebox.showinfo("نجاح", message) if success else messagebox.showerror("خطأ", message)
+            ))
+
+        threading.Thread(target=backup_thread, daemon=True).start()
+
     def import_passwords(self):
         """استيراد كلمات المرور"""
         if not self.current_user:
@@ -1312,7 +1503,7 @@ class SecurePasswordManagerGUI:
 
         dialog = tk.Toplevel(self.root)
         dialog.title("تغيير كلمة المرور الرئيسية")
-        dialog.geometry("400x300")
+        dialog.geometry("400x340")
         dialog.configure(bg='#2d2d2d')
         dialog.transient(self.root)
         dialog.grab_set()
@@ -1408,15 +1599,38 @@ class SecurePasswordManagerGUI:
                 messagebox.showerror("خطأ", "كلمة المرور الجديدة يجب أن تكون 8 أحرف على الأقل")
                 return
 
-            # تغيير كلمة المرور
-            success, message = self.pm.change_master_password(current, new)
+            # إعادة التشفير في خيط منفصل مع عرض التقدم، والنافذة معطلة حتى تنتهي
+            set_busy(True)
+            progress_label.config(text="جاري إعادة التشفير...")
+
+            def report_progress(processed, rate):
+                self.root.after(0, lambda: progress_label.config(
+                    text=f"أعيد تشفير {processed} مدخل ({rate:.0f} مدخل/ثانية)"
+                ))
+
+            def change_thread():
+                success, message = self.pm.change_master_password(current, new, report_progress)
+                self.root.after(0, lambda: finish(success, message))
+
+            threading.Thread(target=change_thread, daemon=True).start()
 
+        def finish(success, message):
+            set_busy(False)
             if success:
                 messagebox.showinfo("نجاح", message)
                 dialog.destroy()
             else:
+                progress_label.config(text="")
                 messagebox.showerror("خطأ", message)
 
+        def set_busy(busy):
+            state = 'disabled' if busy else 'normal'
+            for widget in form_frame.winfo_children() + button_frame.winfo_children():
+                if isinstance(widget, (tk.Entry, tk.Button)):
+                    widget.config(state=state)
+            # لا يُغلق الحوار أثناء إعادة التشفير
+            dialog.protocol("WM_DELETE_WINDOW", (lambda: None) if busy else dialog.destroy)
+
         button_frame = tk.Frame(form_frame, bg='#3d3d3d')
         button_frame.grid(row=3, column=0, columnspan=2, pady=(20, 0))
         tk.Button(
@@ -1441,12 +1655,21 @@ class SecurePasswordManagerGUI:
             command=dialog.destroy,
             cursor='hand2'
         ).pack(side='left', padx=5)
+
+        # تقدم إعادة التشفير (عدد المدخلات والسرعة)
+        progress_label = tk.Label(
+            form_frame,
+            text="",
+            font=("Arial", 10),
+            bg='#3d3d3d',
+            fg='#FFC107'
+        )
+        progress_label.grid(row=4, column=0, columnspan=2, pady=(10, 0))
     def show_audit_logs(self):
         """عرض سجلات التدقيق"""
         if not self.current_user:
             messagebox.showerror("خطأ", "يجب تسجيل الدخول أولاً")
             return
-        logs = self.pm.get_audit_logs()
         dialog = tk.Toplevel(self.root)
         dialog.title("سجلات التدقيق")
         dialog.geometry("800x500")
@@ -1484,13 +1707,34 @@ class SecurePasswordManagerGUI:
                         background="#3d3d3d",
                         foreground="white",
                         fieldbackground="#3d3d3d")
-        # إضافة السجلات
-        for log in logs:
-            log_tree.insert('', 'end', values=(
-                log['timestamp'],
-                log['action'],
-                log['details'] or ''
-            ))
+        # إضافة السجلات: الصفحة الأولى فوراً، والمزيد عند الوصول لنهاية القائمة
+        # ثم السجلات المؤرشفة بعد انتهاء السجل الحالي
+        logs = itertools.chain(
+            self.pm.iter_audit_logs(self.list_page_size),
+            self.pm.iter_archived_audit_logs()
+        )
+        state = {'done': False}
+        def load_more_logs():
+            if state['done']:
+                return
+            count = 0
+            for log in logs:
+                log_tree.insert('', 'end', values=(
+                    log['timestamp'],
+                    log['action'],
+                    log['details'] or ''
+                ))
+                count += 1
+                if count == self.list_page_size:
+                    break
+            if count < self.list_page_size:
+                state['done'] = True
+        def on_log_scroll(first, last):
+            scrollbar.set(first, last)
+            if float(last) >= 1.0:
+                dialog.after_idle(load_more_logs)
+        log_tree.configure(yscrollcommand=on_log_scroll)
+        load_more_logs()
         # زر الإغلاق
         tk.Button(
             dialog,
@@ -1503,6 +1747,30 @@ class SecurePasswordManagerGUI:
             command=dialog.destroy,
             cursor='hand2'
         ).pack(pady=10)
+    def show_storage_report(self):
+        """عرض حجم ملف الخزنة ونسبة الصفحات الحرة"""
+        report = self.pm.get_storage_report()
+        if not report:
+            messagebox.showinfo("معلومات التخزين", "غير متاحة لهذا النوع من التخزين")
+            return
+
+        stats = report['stats']
+        lines = [
+            f"حجم الملف: {stats['file_size'] / 1024:.1f} KB",
+            f"حجم ملف WAL: {stats['wal_size'] / 1024:.1f} KB",
+            f"الصفحات الحرة: {stats['free_pages']} من {stats['page_count']} ({stats['free_ratio']:.1%})",
+            f"التغييرات منذ آخر تحليل: {stats['churn']}"
+        ]
+
+        last = report['last_maintenance']
+        if last:
+            lines.append(
+                f"آخر صيانة: من {last['before']['file_size'] / 1024:.1f} KB "
+                f"إلى {last['after']['file_size'] / 1024:.1f} KB"
+            )
+
+        messagebox.showinfo("معلومات التخزين", "\n".join(lines))
+
     def show_about(self):
         """عرض معلومات عن البرنامج"""
         about_text = """مدير كلمات المرور الآمن - الإصدار 1.0
@@ -1547,7 +1815,10 @@ class SecurePasswordManagerGUI:
         messagebox.showinfo("دليل الاستخدام", help_text)
     def update_lock_timer(self):
         """تحديث مؤشر القفل التلقائي"""
-        if self.current_user and self.pm.session_start:
+        if self.current_user and not self.pm.current_user:
+            # تم القفل التلقائي في الخلفية
+            self.handle_auto_lock()
+        elif self.current_user and self.pm.session_start:
             elapsed = (datetime.now() - self.pm.session_start).seconds
             remaining = max(0, self.pm.auto_lock_timeout - elapsed)
             minutes = remaining // 60
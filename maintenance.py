@@ -0,0 +1,97 @@
+"""
+صيانة قاعدة البيانات في أوقات الخمول
+
+تُتابع التغييرات (الحذف والتعديل والأرشفة) ونسبة الصفحات الحرة، وعند
+الخمول (تسجيل الخروج أو القفل التلقائي) تُعاد الصفحات الحرة إلى نظام الملفات
+على دفعات صغيرة وتُحدّث إحصاءات المخطط، فيبقى الملف صغيراً وخطط الاستعلام جيدة.
+"""
+import threading
+
+
+class DatabaseMaintenance:
+    """incremental_vacuum وANALYZE وPRAGMA optimize من خيط خلفي"""
+
+    def __init__(self, db, churn_threshold=500, free_ratio_threshold=0.1,
+                 vacuum_step=256, pause=0.05):
+        """db: PasswordDatabase، وchurn_threshold عدد التغييرات الذي يستدعي ANALYZE"""
+        self.db = db
+        self.churn_threshold = churn_threshold
+        self.free_ratio_threshold = free_ratio_threshold
+        self.vacuum_step = vacuum_step
+        self.pause = pause
+
+        # تقرير آخر صيانة (before/after وما نُفذ)
+        self.last_report = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_due(self, stats=None):
+        """هل تستحق القاعدة الصيانة الآن"""
+        stats = stats or self.db.storage_stats()
+        return (
+            stats['churn'] >= self.churn_threshold
+            or stats['free_ratio'] >= self.free_ratio_threshold
+        )
+
+    def schedule(self):
+        """تشغيل الصيانة في الخلفية إذا كانت مستحقة"""
+        with self._lock:
+            if self._stop.is_set() or self._thread is not None:
+                return
+            if not self.is_due():
+                return
+            self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+            self._thread.start()
+
+    def run_once(self, force=False):
+        """تنفيذ الصيانة بشكل متزامن وإرجاع التقرير"""
+        before = self.db.storage_stats()
+        report = {
+            'before': before,
+            'converted': False,
+            'freed_pages': 0,
+            'analyzed': False
+        }
+
+        if force or self.is_due(before):
+            if before['auto_vacuum'] != 'incremental':
+                # تحويل لمرة واحدة للملفات القديمة؛ VACUUM الكامل يضغط الملف أيضاً
+                report['converted'] = self.db.enable_incremental_vacuum()
+            else:
+                # دفعات صغيرة حتى لا يُحجب الكاتب طويلاً
+                while not self._stop.is_set():
+                    freed = self.db.incremental_vacuum(self.vacuum_step)
+                    report['freed_pages'] += freed
+                    if freed < self.vacuum_step:
+                        break
+                    self._stop.wait(self.pause)
+
+            if force or before['churn'] >= self.churn_threshold:
+                self.db.analyze()
+                report['analyzed'] = True
+
+        self.db.optimize()
+
+        report['after'] = self.db.storage_stats()
+        self.last_report = report
+        return report
+
+    def stop(self):
+        """إيقاف الصيانة وانتظار انتهاء الدفعة الحالية"""
+        with self._lock:
+            self._stop.set()
+            thread = self._thread
+        if thread:
+            thread.join()
+
+    def _run(self):
+        """تنفيذ الصيانة من الخيط الخلفي"""
+        try:
+            self.run_once()
+        except Exception:
+            # تُعاد المحاولة عند الخمول التالي
+            pass
+        finally:
+            with self._lock:
+                self._thread = None
@@ -0,0 +1,540 @@
+"""
+محرك تخزين في الذاكرة
+
+تنفيذ StorageBackend بقواميس بايثون فقط، للمقاييس والاختبارات التي تشغّل
+PasswordManager كاملاً بسرعة الذاكرة. المعاملات تعتمد على سجل تراجع (undo)
+بدلاً من نسخ البيانات، فكلفتها تتناسب مع عدد التعديلات فقط.
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import count
+
+from records import EntryRecord, EncryptedEntryRecord, AuditRecord, SettingsRecord
+from storage import StorageBackend
+
+# أعمدة المدخل القابلة للتحديث من بيانات الإدخال
+_ENTRY_FIELDS = ('title', 'username', 'email', 'url', 'category')
+
+# القيم الافتراضية لأعمدة جدول settings
+_DEFAULT_SETTINGS = {
+    'clipboard_timeout': 30,
+    'auto_lock_timeout': 300,
+    'theme': 'dark',
+    'language': 'ar',
+    'quick_unlock_window': 600,
+    'audit_retention_days': 180,
+    'audit_max_rows': 5000,
+}
+
+
+def _timestamp(delta=None):
+    """الوقت بصيغة CURRENT_TIMESTAMP في SQLite (UTC)"""
+    now = datetime.now(timezone.utc)
+    if delta:
+        now += delta
+    return now.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _title_key(entry):
+    """مفتاح ترتيب المدخلات كما في ORDER BY title, id"""
+    return (entry.title or '', entry.id)
+
+
+class MemoryStorage(StorageBackend):
+    """محرك تخزين في الذاكرة آمن للخيوط"""
+
+    def __init__(self):
+        """تهيئة جداول فارغة"""
+        self._lock = threading.RLock()
+
+        # سجل التراجع للمعاملة الجارية: دوال تعيد الحالة السابقة بترتيب عكسي
+        self._undo = []
+        self._tx_depth = 0
+
+        self._users = {}            # id -> بيانات المستخدم الرئيسي
+        self._usernames = {}        # username -> id
+        self._settings = {}         # user_id -> SettingsRecord
+        self._entries = {}          # user_id -> {id: EncryptedEntryRecord} بترتيب المعرف
+        self._title_index = {}      # user_id -> قائمة مرتبة من (title, id)
+        self._audit = {}            # user_id -> {id: AuditRecord}
+        self._audit_index = {}      # user_id -> قائمة مرتبة من (timestamp, id)
+        self._archive = {}          # user_id -> {id: tuple من AuditRecord}
+        self._throttle = {}         # username -> قائمة أوقات المحاولات
+        self._journals = {}         # user_id -> سجل إعادة التشفير
+
+        self._user_ids = count(1)
+        self._entry_ids = count(1)
+        self._audit_ids = count(1)
+        self._archive_ids = count(1)
+
+    # المعاملات وسجل التراجع
+
+    @contextmanager
+    def transaction(self):
+        """وحدة عمل ذرية: التراجع عن تعديلات الكتلة عند الخطأ"""
+        with self._lock:
+            mark = len(self._undo)
+            self._tx_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._tx_depth -= 1
+                while len(self._undo) > mark:
+                    self._undo.pop()()
+                raise
+
+            self._tx_depth -= 1
+            if not self._tx_depth:
+                self._undo.clear()
+
+    @contextmanager
+    def snapshot(self):
+        """لقطة قراءة متسقة: القفل يمنع الكتابة من الخيوط الأخرى طوال الكتلة"""
+        with self._lock:
+            yield self
+
+    def _set(self, table, key, value):
+        """تعيين قيمة في جدول مع تسجيل التراجع"""
+        if key in table:
+            old = table[key]
+            self._undo.append(lambda: table.__setitem__(key, old))
+        else:
+            self._undo.append(lambda: table.pop(key, None))
+        table[key] = value
+
+    def _delete(self, table, key):
+        """حذف قيمة من جدول مع تسجيل التراجع"""
+        old = table.pop(key)
+        self._undo.append(lambda: table.__setitem__(key, old))
+        return old
+
+    def _index_add(self, user_id, entry):
+        """إضافة مدخل إلى فهرس العناوين"""
+        index = self._title_index.setdefault(user_id, [])
+        key = _title_key(entry)
+        insort(index, key)
+        self._undo.append(lambda: index.remove(key))
+
+    def _index_remove(self, user_id, entry):
+        """حذف مدخل من فهرس العناوين"""
+        index = self._title_index[user_id]
+        key = _title_key(entry)
+        index.remove(key)
+        self._undo.append(lambda: insort(index, key))
+
+    def _audit_index_add(self, user_id, record):
+        """إضافة سجل إلى فهرس التدقيق (غالباً في نهايته لأن الوقت يتزايد)"""
+        index = self._audit_index.setdefault(user_id, [])
+        key = (record.timestamp, record.id)
+        insort(index, key)
+        self._undo.append(lambda: index.remove(key))
+
+    def _audit_index_pop_oldest(self, user_id, count):
+        """حذف أقدم count سجل من فهرس التدقيق وإرجاع مفاتيحها"""
+        index = self._audit_index[user_id]
+        removed = index[:count]
+        del index[:count]
+        self._undo.append(lambda: index.__setitem__(slice(0, 0), removed))
+        return removed
+
+    def close(self):
+        """لا توجد عمليات مؤجلة في الذاكرة"""
+
+    # المستخدم الرئيسي
+
+    def create_master_user(self, username, password_hash, salt, kdf_version=1,
+                           kdf_algorithm='scrypt', kdf_params=None):
+        """إنشاء مستخدم رئيسي جديد"""
+        with self.transaction():
+            if username in self._usernames:
+                return None
+
+            user_id = next(self._user_ids)
+            self._set(self._users, user_id, {
+                'id': user_id,
+                'username': username,
+                'password_hash': password_hash,
+                'salt': salt,
+                'kdf_version': kdf_version,
+                'kdf_algorithm': kdf_algorithm,
+                'kdf_params': dict(kdf_params) if kdf_params else None
+            })
+            self._set(self._usernames, username, user_id)
+            self._set(self._settings, user_id, SettingsRecord(user_id, **_DEFAULT_SETTINGS))
+
+        return user_id
+
+    def _user_copy(self, user):
+        """نسخة من بيانات المستخدم لا تؤثر على المخزن"""
+        if not user:
+            return None
+        user = dict(user)
+        user['kdf_params'] = dict(user['kdf_params']) if user['kdf_params'] else None
+        return user
+
+    def get_master_user(self, username):
+        """الحصول على بيانات المستخدم الرئيسي باسم المستخدم"""
+        with self._lock:
+            return self._user_copy(self._users.get(self._usernames.get(username)))
+
+    def get_master_user_by_id(self, user_id):
+        """الحصول على بيانات المستخدم الرئيسي بالمعرف"""
+        with self._lock:
+            return self._user_copy(self._users.get(user_id))
+
+    def update_master_credentials(self, user_id, password_hash, salt, kdf_version,
+                                  kdf_algorithm='scrypt', kdf_params=None):
+        """تحديث بيانات اعتماد المستخدم الرئيسي ومعاملات KDF"""
+        with self.transaction():
+            user = self._users.get(user_id)
+            if not user:
+                return False
+
+            self._set(self._users, user_id, dict(
+                user,
+                password_hash=password_hash,
+                salt=salt,
+                kdf_version=kdf_version,
+                kdf_algorithm=kdf_algorithm,
+                kdf_params=dict(kdf_params) if kdf_params else None
+            ))
+
+        return True
+
+    # الإعدادات
+
+    def get_user_settings(self, user_id):
+        """الحصول على إعدادات المستخدم"""
+        with self._lock:
+            settings = self._settings.get(user_id)
+            return settings.copy() if settings else None
+
+    def update_user_settings(self, user_id, settings):
+        """تحديث إعدادات المستخدم (إنشاؤها إن لم توجد)"""
+        unknown = set(settings) - set(SettingsRecord.FIELDS[1:])
+        if unknown:
+            raise ValueError(f"إعدادات غير معروفة: {', '.join(sorted(unknown))}")
+
+        with self.transaction():
+            current = self._settings.get(user_id) or SettingsRecord(user_id, **_DEFAULT_SETTINGS)
+            updated = current.copy()
+            for name in SettingsRecord.FIELDS[1:]:
+                if name in settings:
+                    updated[name] = settings[name]
+            self._set(self._settings, user_id, updated)
+
+    # المدخلات
+
+    def _insert_entry(self, user_id, entry_data, encrypted_password, notes_encrypted):
+        """إدراج مدخل في الجدول والفهرس"""
+        now = _timestamp()
+        entry = EncryptedEntryRecord(
+            next(self._entry_ids),
+            user_id,
+            entry_data.get('title'),
+            entry_data.get('username'),
+            entry_data.get('email'),
+            encrypted_password,
+            entry_data.get('url'),
+            entry_data.get('category', 'عام'),
+            notes_encrypted,
+            now,
+            now,
+            None
+        )
+        self._set(self._entries.setdefault(user_id, {}), entry.id, entry)
+        self._index_add(user_id, entry)
+        return entry.id
+
+    def add_password_entry(self, user_id, entry_data, encrypted_password, notes_encrypted=None):
+        """إضافة مدخل كلمة مرور جديد"""
+        with self.transaction():
+            entry_id = self._insert_entry(user_id, entry_data, encrypted_password, notes_encrypted)
+            self.add_audit_log(user_id, "ADD_PASSWORD", f"Added entry: {entry_data.get('title')}")
+
+        return entry_id
+
+    def add_password_entries_bulk(self, user_id, entries, source=None):
+        """إضافة مدخلات مشفرة مسبقاً في معاملة واحدة مع سجل تدقيق ملخص"""
+        count = 0
+        with self.transaction():
+            for entry_data, encrypted_password, notes_encrypted in entries:
+                self._insert_entry(user_id, entry_data, encrypted_password, notes_encrypted)
+                count += 1
+
+            if count:
+                details = f"Imported {count} entries" + (f" from {source}" if source else "")
+                self.add_audit_log(user_id, "IMPORT", details)
+
+        return count
+
+    def get_password_entry(self, user_id, entry_id):
+        """الحصول على مدخل كلمة مرور"""
+        with self._lock:
+            entry = self._entries.get(user_id, {}).get(entry_id)
+            if not entry:
+                return None
+
+            # وقت الوصول لا يدخل في سجل التراجع (كالكتابة المؤجلة في SQLite)
+            entry.last_accessed = _timestamp()
+            return entry.copy()
+
+    def flush_access_times(self):
+        """أوقات الوصول تُسجل مباشرة في الذاكرة"""
+
+    @staticmethod
+    def _summary(entry):
+        """بيانات المدخل غير المشفرة"""
+        return EntryRecord(
+            entry.id, entry.title, entry.username, entry.email,
+            entry.url, entry.category, entry.created_at, entry.updated_at
+        )
+
+    def get_entries_page(self, user_id, category=None, after=None, limit=100):
+        """صفحة من المدخلات مرتبة حسب العنوان بترقيم حسب المفتاح"""
+        with self._lock:
+            index = self._title_index.get(user_id, [])
+            entries = self._entries.get(user_id, {})
+            position = bisect_right(index, (after['title'] or '', after['id'])) if after is not None else 0
+
+            page = []
+            for _, entry_id in self._islice(index, position):
+                entry = entries[entry_id]
+                if category and entry.category != category:
+                    continue
+                page.append(self._summary(entry))
+                if len(page) >= limit:
+                    break
+            return page
+
+    @staticmethod
+    def _islice(index, position):
+        """المرور على الفهرس من موضع دون نسخ بقيته"""
+        for i in range(position, len(index)):
+            yield index[i]
+
+    def search_entries(self, user_id, query, limit=50):
+        """البحث بمطابقة جزئية غير حساسة لحالة الأحرف، مرتباً حسب العنوان"""
+        needle = query.strip().casefold()
+        if not needle:
+            return []
+
+        with self._lock:
+            entries = self._entries.get(user_id, {})
+            results = []
+            for _, entry_id in self._title_index.get(user_id, []):
+                entry = entries[entry_id]
+                fields = (entry.title, entry.username, entry.email, entry.url, entry.category)
+                if any(value and needle in value.casefold() for value in fields):
+                    results.append(self._summary(entry))
+                    if len(results) >= limit:
+                        break
+            return results
+
+    def get_categories(self, user_id):
+        """التصنيفات المستخدمة مرتبة أبجدياً"""
+        with self._lock:
+            return sorted({
+                entry.category for entry in self._entries.get(user_id, {}).values()
+            }, key=lambda category: (category is not None, category or ''))
+
+    def iter_encrypted_entries(self, user_id, chunk_size=500, after_id=0):
+        """جلب المدخلات المشفرة على دفعات مرتبة حسب المعرف"""
+        with self._lock:
+            # التراجع عن حذف يعيد المدخل إلى نهاية القاموس فلا يُعتمد على ترتيبه
+            ids = sorted(entry_id for entry_id in self._entries.get(user_id, {}) if entry_id > after_id)
+
+        for start in range(0, len(ids), chunk_size):
+            with self._lock:
+                entries = self._entries.get(user_id, {})
+                chunk = [
+                    entries[entry_id].copy()
+                    for entry_id in ids[start:start + chunk_size]
+                    if entry_id in entries
+                ]
+            if chunk:
+                yield chunk
+
+    def update_password_entry(self, user_id, entry_id, entry_data, encrypted_password=None, notes_encrypted=None):
+        """تحديث مدخل كلمة مرور"""
+        with self.transaction():
+            entries = self._entries.get(user_id, {})
+            entry = entries.get(entry_id)
+            if not entry:
+                return False
+
+            updated = entry.copy()
+            for name in _ENTRY_FIELDS:
+                if name in entry_data:
+                    updated[name] = entry_data[name]
+            if encrypted_password:
+                updated.password_blob = encrypted_password
+            if notes_encrypted:
+                updated.notes_blob = notes_encrypted
+            updated.updated_at = _timestamp()
+
+            self._index_remove(user_id, entry)
+            self._set(entries, entry_id, updated)
+            self._index_add(user_id, updated)
+
+            self.add_audit_log(user_id, "UPDATE_PASSWORD", f"Updated entry ID: {entry_id}")
+
+        return True
+
+    def delete_password_entry(self, user_id, entry_id):
+        """حذف مدخل كلمة مرور"""
+        with self.transaction():
+            entries = self._entries.get(user_id, {})
+            if entry_id not in entries:
+                return False
+
+            self._index_remove(user_id, self._delete(entries, entry_id))
+            self.add_audit_log(user_id, "DELETE_PASSWORD", f"Deleted entry ID: {entry_id}")
+
+        return True
+
+    # سجل التدقيق
+
+    def add_audit_log(self, user_id, action, details=None, ip_address=None):
+        """إضافة سجل تدقيق"""
+        with self.transaction():
+            record = AuditRecord(next(self._audit_ids), user_id, action, details, ip_address, _timestamp())
+            self._set(self._audit.setdefault(user_id, {}), record.id, record)
+            self._audit_index_add(user_id, record)
+
+    def flush_audit_log(self, timeout=None):
+        """السجلات تُكتب مباشرة في الذاكرة"""
+        return True
+
+    def get_audit_logs_page(self, user_id, before=None, limit=50):
+        """صفحة من سجلات التدقيق من الأحدث إلى الأقدم بترقيم حسب المفتاح"""
+        with self._lock:
+            index = self._audit_index.get(user_id, [])
+            audit = self._audit.get(user_id, {})
+
+            end = bisect_left(index, (before['timestamp'], before['id'])) if before is not None else len(index)
+            start = max(0, end - limit)
+            return [audit[entry_id].copy() for _, entry_id in reversed(index[start:end])]
+
+    def archive_audit_logs(self, user_id, max_age_days, max_rows, batch_size=500):
+        """نقل دفعة من أقدم السجلات المستحقة إلى الأرشيف"""
+        with self.transaction():
+            index = self._audit_index.get(user_id, [])
+            cutoff = _timestamp(-timedelta(days=int(max_age_days)))
+
+            # المستحق (الأقدم من مدة الاحتفاظ أو ما يزيد عن أحدث max_rows سجل)
+            # بداية من الفهرس المرتب
+            due = max(bisect_left(index, (cutoff,)), len(index) - max_rows)
+            count = min(due, batch_size)
+            if count <= 0:
+                return 0
+
+            audit = self._audit[user_id]
+            batch = tuple(
+                self._delete(audit, entry_id)
+                for _, entry_id in self._audit_index_pop_oldest(user_id, count)
+            )
+            self._set(self._archive.setdefault(user_id, {}), next(self._archive_ids), batch)
+
+        return len(batch)
+
+    def iter_archived_audit_logs(self, user_id):
+        """تدفق السجلات المؤرشفة من الأحدث إلى الأقدم"""
+        with self._lock:
+            batches = list(self._archive.get(user_id, {}).values())
+
+        for batch in reversed(batches):
+            for record in reversed(batch):
+                yield record.copy()
+
+    # محاولات الدخول الفاشلة
+
+    def get_login_throttle(self, username):
+        """أوقات المحاولات الفاشلة المحفوظة لمستخدم"""
+        with self._lock:
+            return list(self._throttle.get(username, ()))
+
+    def save_login_throttle(self, username, attempts):
+        """حفظ أوقات المحاولات الفاشلة لمستخدم"""
+        with self.transaction():
+            self._set(self._throttle, username, [int(t) for t in attempts])
+
+    def delete_login_throttle(self, username):
+        """مسح المحاولات الفاشلة لمستخدم"""
+        with self.transaction():
+            if username in self._throttle:
+                self._delete(self._throttle, username)
+
+    def purge_login_throttle(self, before):
+        """حذف حالات المستخدمين التي انتهت كل محاولاتها قبل before"""
+        with self.transaction():
+            expired = [
+                username for username, attempts in self._throttle.items()
+                if not attempts or attempts[-1] <= before
+            ]
+            for username in expired:
+                self._delete(self._throttle, username)
+
+    # إعادة التشفير
+
+    def start_reencryption_journal(self, user_id, journal):
+        """بدء سجل إعادة التشفير"""
+        with self.transaction():
+            self._set(self._journals, user_id, {
+                'user_id': user_id,
+                'new_password_hash': journal['new_password_hash'],
+                'new_salt': journal['new_salt'],
+                'new_kdf_algorithm': journal['new_kdf_algorithm'],
+                'new_kdf_params': dict(journal['new_kdf_params']) if journal.get('new_kdf_params') else None,
+                'wrapped_new_key': journal['wrapped_new_key'],
+                'wrapped_old_key': journal['wrapped_old_key'],
+                'last_entry_id': 0,
+                'processed': 0,
+                'started_at': _timestamp()
+            })
+
+    def get_reencryption_journal(self, user_id):
+        """الحصول على سجل إعادة تشفير غير مكتمل (إن وجد)"""
+        with self._lock:
+            journal = self._journals.get(user_id)
+            if not journal:
+                return None
+            journal = dict(journal)
+            journal['new_kdf_params'] = dict(journal['new_kdf_params']) if journal['new_kdf_params'] else None
+            return journal
+
+    def apply_reencrypted_batch(self, user_id, updates, last_entry_id):
+        """حفظ دفعة معاد تشفيرها وتقدم السجل في معاملة واحدة"""
+        with self.transaction():
+            entries = self._entries.get(user_id, {})
+            for entry_id, password_blob, notes_blob in updates:
+                entry = entries.get(entry_id)
+                if entry:
+                    updated = entry.copy()
+                    updated.password_blob = password_blob
+                    updated.notes_blob = notes_blob
+                    self._set(entries, entry_id, updated)
+
+            journal = self._journals.get(user_id)
+            if journal:
+                self._set(self._journals, user_id, dict(
+                    journal,
+                    last_entry_id=last_entry_id,
+                    processed=journal['processed'] + len(updates)
+                ))
+
+    def finish_reencryption(self, user_id, journal, kdf_version):
+        """اعتماد بيانات الدخول الجديدة وحذف السجل في معاملة واحدة"""
+        with self.transaction():
+            self.update_master_credentials(
+                user_id,
+                journal['new_password_hash'],
+                journal['new_salt'],
+                kdf_version,
+                journal['new_kdf_algorithm'],
+                journal.get('new_kdf_params')
+            )
+            if user_id in self._journals:
+                self._delete(self._journals, user_id)
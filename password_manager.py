@@ -9,24 +9,71 @@ from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import json
 import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from crypto_utils import CryptoManager
+from password_generator import PasswordPolicy
+import password_strength
 from database import PasswordDatabase
+from storage import StorageBackend
+from audit_retention import AuditRetention
+from backup import BackupManager
+from maintenance import DatabaseMaintenance
+from rate_limiter import LoginRateLimiter
+from records import PasswordEntry
 
 class PasswordManager:
     """الفئة الرئيسية لإدارة كلمات المرور"""
 
-    def __init__(self, db_path="passwords.db"):
-        """تهيئة مدير كلمات المرور"""
-        self.db = PasswordDatabase(db_path)
+    # إعدادات فك التشفير الجماعي
+    BULK_CHUNK_SIZE = 500
+    BULK_WORKERS = min(8, os.cpu_count() or 1)
+
+    # الفتح السريع بعد القفل التلقائي
+    QUICK_UNLOCK_MAX_ATTEMPTS = 3
+
+    # حجم دفعة إعادة التشفير (كل دفعة تُحفظ في معاملة واحدة مع تقدم السجل)
+    REENCRYPT_BATCH_SIZE = 500
+
+    def __init__(self, db_path="passwords.db", storage: StorageBackend = None):
+        """تهيئة مدير كلمات المرور
+
+        storage: محرك تخزين بديل (مثل MemoryStorage)، وإلا يُفتح ملف SQLite في db_path
+        """
+        self.db = storage if storage is not None else PasswordDatabase(db_path)
+        self.audit_retention = AuditRetention(self.db)
+
+        # صيانة ملف SQLite عند الخمول (بعد تسجيل الخروج أو القفل التلقائي)
+        self.maintenance = DatabaseMaintenance(self.db) if storage is None else None
+
+        # لقطات يومية لملف الخزنة المشفر في مجلد backups بجواره، تعمل
+        # أثناء الجلسة فقط (تبدأ عند الدخول وتتوقف عند الخروج أو القفل)
+        self.backups = None
+        if storage is None and db_path != ':memory:':
+            backup_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'backups')
+            self.backups = BackupManager(self.db, backup_dir)
+
+        # حد المحاولات الفاشلة: 5 محاولات في الساعة لكل مستخدم
+        self.rate_limiter = LoginRateLimiter(self.db, max_attempts=5, window=3600)
         self.crypto = CryptoManager()
         self.current_user = None
         self.current_user_id = None
         self.master_key = None
+        self.session_cipher = None
         self.session_start = None
         self.lock_timer = None
         self.auto_lock_timeout = 300  # 5 دقائق افتراضياً
 
+        # زمن فتح الخزنة المستهدف لمعايرة KDF (تُحسب مرة واحدة لكل تشغيل)
+        self.kdf_target_ms = CryptoManager.KDF_TARGET_MS
+        self._calibrated_kdf = None
+
+        # الفتح السريع: المفتاح الرئيسي مغلف بمفتاح مشتق من PIN
+        self.quick_unlock_window = 600  # 10 دقائق افتراضياً
+        self._quick_unlock_wrapped = None
+        self._quick_unlock_state = None
+
         # خيط لمسح الحافظة تلقائياً
         self.clipboard_clear_thread = None
         self.clipboard_timeout = 30  # 30 ثانية افتراضياً
@@ -35,16 +82,25 @@ class PasswordManager:
         """تسجيل مستخدم جديد"""
         try:
             # التحقق من وجود المستخدم
-            cursor = self.db.conn.cursor()
-            cursor.execute("SELECT id FROM master_user WHERE username = ?", (username,))
-            if cursor.fetchone():
+            if self.db.get_master_user(username):
                 return False, "اسم المستخدم موجود بالفعل"
 
-            # تجزئة كلمة المرور الرئيسية
-            hashed_data = self.crypto.hash_password(master_password)
+            # اشتقاق قيمة التحقق من تشغيل KDF واحد بمعاملات معايرة لهذا الجهاز
+            kdf = self.get_calibrated_kdf()
+            salt = self.crypto.generate_salt()
+            login_keys = self.crypto.derive_login_keys(
+                master_password, salt, kdf['algorithm'], kdf['params']
+            )
 
             # إنشاء المستخدم
-            user_id = self.db.create_master_user(username, hashed_data['hash'], hashed_data['salt'])
+            user_id = self.db.create_master_user(
+                username,
+                login_keys['verifier'],
+                base64.b64encode(salt).decode('utf-8'),
+                self.crypto.LOGIN_SCHEME_VERSION,
+                kdf['algorithm'],
+                kdf['params']
+            )
 
             if user_id:
                 return True, "تم التسجيل بنجاح"
@@ -58,61 +114,55 @@ class PasswordManager:
         """تسجيل الدخول"""
         try:
             # التحقق من المحاولات الفاشلة
-            cursor = self.db.conn.cursor()
-            cursor.execute('''
-                SELECT COUNT(*) as attempts 
-                FROM failed_attempts 
-                WHERE username = ? AND timestamp > datetime('now', '-1 hour')
-            ''', (username,))
-
-            attempts = cursor.fetchone()['attempts']
-            if attempts >= 5:
-                return False, "تم تجاوز عدد المحاولات المسموح بها. حاول لاحقاً"
+            wait = self.rate_limiter.retry_after(username)
+            if wait:
+                minutes = (wait + 59) // 60
+                return False, f"تم تجاوز عدد المحاولات المسموح بها. حاول بعد {minutes} دقيقة"
 
             # البحث عن المستخدم
-            cursor.execute('''
-                SELECT id, password_hash, salt FROM master_user WHERE username = ?
-            ''', (username,))
-
-            user = cursor.fetchone()
+            user = self.db.get_master_user(username)
             if not user:
                 # تسجيل محاولة فاشلة
-                cursor.execute(
-                    "INSERT INTO failed_attempts (username) VALUES (?)",
-                    (username,)
-                )
-                self.db.conn.commit()
+                self.rate_limiter.record_failure(username)
                 return False, "اسم المستخدم أو كلمة المرور غير صحيحة"
 
-            # التحقق من كلمة المرور
-            is_valid = self.crypto.verify_password(
-                master_password,
-                user['password_hash'],
-                user['salt']
-            )
+            # التحقق من كلمة المرور واشتقاق المفتاح الرئيسي
+            master_key = self._authenticate(user, master_password)
 
-            if is_valid:
+            # استئناف تغيير كلمة مرور رئيسية انقطع قبل اكتماله
+            journal = self.db.get_reencryption_journal(user['id'])
+            if journal:
+                master_key = self._resume_reencryption(user, journal, master_password, master_key)
+
+            if master_key:
                 # تهيئة الجلسة
                 self.current_user = username
                 self.current_user_id = user['id']
                 self.session_start = datetime.now()
-
-                # اشتقاق المفتاح الرئيسي
-                salt_bytes = base64.b64decode(user['salt'])
-                self.master_key = self.crypto.derive_key(master_password, salt_bytes)
+                self.master_key = master_key
+                self.session_cipher = self.crypto.create_session_cipher(self.master_key)
 
                 # الحصول على الإعدادات
                 settings = self.db.get_user_settings(user['id'])
                 if settings:
                     self.auto_lock_timeout = settings.get('auto_lock_timeout', 300)
                     self.clipboard_timeout = settings.get('clipboard_timeout', 30)
+                    self.quick_unlock_window = settings.get('quick_unlock_window', 600)
 
-                # بدء مؤتمر القفل التلقائي
+                    # أرشفة سجلات التدقيق القديمة في الخلفية
+                    self.audit_retention.schedule(
+                        user['id'],
+                        settings.get('audit_retention_days'),
+                        settings.get('audit_max_rows')
+                    )
+
+                # بدء مؤتمر القفل التلقائي والنسخ الدوري
                 self.start_auto_lock_timer()
+                if self.backups:
+                    self.backups.start()
 
                 # مسح المحاولات الفاشلة للمستخدم
-                cursor.execute("DELETE FROM failed_attempts WHERE username = ?", (username,))
-                self.db.conn.commit()
+                self.rate_limiter.reset(username)
 
                 # تسجيل الدخول الناجح
                 self.db.add_audit_log(user['id'], "LOGIN", "تم تسجيل الدخول بنجاح")
@@ -120,28 +170,162 @@ class PasswordManager:
                 return True, "تم تسجيل الدخول بنجاح"
             else:
                 # تسجيل محاولة فاشلة
-                cursor.execute(
-                    "INSERT INTO failed_attempts (username) VALUES (?)",
-                    (username,)
-                )
-                self.db.conn.commit()
+                self.rate_limiter.record_failure(username)
                 return False, "اسم المستخدم أو كلمة المرور غير صحيحة"
 
         except Exception as e:
             return False, f"خطأ في تسجيل الدخول: {str(e)}"
 
+    def _authenticate(self, user: Dict, master_password: str) -> Optional[bytes]:
+        """التحقق من كلمة المرور الرئيسية وإرجاع مفتاح الخزنة
+
+        المخطط 2 يشغّل KDF مرة واحدة فقط. الحسابات بالمخطط 1 تُتحقق
+        بالطريقة القديمة ثم تُرقّى تلقائياً بعد أول دخول ناجح.
+        """
+        salt_bytes = base64.b64decode(user['salt'])
+
+        if user['kdf_version'] >= self.crypto.LOGIN_SCHEME_VERSION:
+            login_keys = self.crypto.derive_login_keys(
+                master_password, salt_bytes, user['kdf_algorithm'], user['kdf_params']
+            )
+            if self.crypto.check_login_verifier(login_keys['verifier'], user['password_hash']):
+                return login_keys['key']
+            return None
+
+        # المخطط القديم: تجزئة PBKDF2 منفصلة
+        if not self.crypto.verify_password(master_password, user['password_hash'], user['salt']):
+            return None
+
+        master_key = self.crypto.derive_key(master_password, salt_bytes)
+
+        # ترقية الحساب إلى المخطط الجديد (نفس الملح ونفس مفتاح الخزنة،
+        # لذا تبقى معاملات KDF الافتراضية حتى تغيير كلمة المرور)
+        self.db.update_master_credentials(
+            user['id'],
+            self.crypto.compute_login_verifier(master_key),
+            user['salt'],
+            self.crypto.LOGIN_SCHEME_VERSION
+        )
+
+        return master_key
+
+    def get_calibrated_kdf(self) -> Dict:
+        """الحصول على معاملات KDF المعايرة لهذا الجهاز"""
+        if self._calibrated_kdf is None:
+            self._calibrated_kdf = self.crypto.calibrate_kdf(self.kdf_target_ms)
+        return self._calibrated_kdf
+
     def logout(self):
         """تسجيل الخروج"""
         if self.current_user_id:
             self.db.add_audit_log(self.current_user_id, "LOGOUT", "تم تسجيل الخروج")
 
+        # ضمان كتابة سجلات التدقيق وأوقات الوصول المعلقة قبل إنهاء الجلسة
+        self.db.flush_audit_log()
+        self.db.flush_access_times()
+
         self.clear_clipboard()
         self.stop_auto_lock_timer()
+        if self.backups:
+            self.backups.stop()
 
         self.current_user = None
         self.current_user_id = None
         self.master_key = None
+        self.session_cipher = None
         self.session_start = None
+        self._quick_unlock_wrapped = None
+        self._quick_unlock_state = None
+        password_strength.clear_cache()
+
+        # وقت خمول: صيانة القاعدة في الخلفية إن كانت مستحقة
+        if self.maintenance:
+            self.maintenance.schedule()
+
+    def lock(self):
+        """قفل الجلسة مع الاحتفاظ بالمفتاح مغلفاً للفتح السريع إن كان مفعلاً"""
+        wrapped = self._quick_unlock_wrapped
+        username = self.current_user
+        user_id = self.current_user_id
+
+        self.logout()
+
+        if wrapped and username and self.quick_unlock_window > 0:
+            self._quick_unlock_state = {
+                'username': username,
+                'user_id': user_id,
+                'wrapped': wrapped,
+                'expires_at': time.monotonic() + self.quick_unlock_window,
+                'attempts_left': self.QUICK_UNLOCK_MAX_ATTEMPTS
+            }
+
+    def set_quick_unlock_pin(self, pin: str) -> Tuple[bool, str]:
+        """تعيين رمز PIN للفتح السريع بعد القفل التلقائي"""
+        if not self.current_user_id or not self.master_key:
+            return False, "يجب تسجيل الدخول أولاً"
+
+        if not pin or len(pin) < 4:
+            return False, "رمز PIN يجب أن يكون 4 أحرف على الأقل"
+
+        salt = self.crypto.generate_salt()
+        pin_key = self.crypto.derive_pin_key(pin, salt)
+        self._quick_unlock_wrapped = {
+            'salt': salt,
+            'key': self.crypto.wrap_key(self.master_key, pin_key)
+        }
+
+        return True, "تم تفعيل الفتح السريع"
+
+    def login_retry_after(self, username: str) -> int:
+        """الثواني المتبقية قبل السماح بمحاولة دخول جديدة (0 إذا لم يكن محظوراً)"""
+        return self.rate_limiter.retry_after(username)
+
+    def quick_unlock_available(self, username: str = None) -> bool:
+        """هل يمكن الفتح السريع حالياً (ضمن النافذة ولم تُستنفد المحاولات)"""
+        state = self._quick_unlock_state
+        if not state:
+            return False
+
+        if time.monotonic() > state['expires_at'] or state['attempts_left'] <= 0:
+            self._quick_unlock_state = None
+            return False
+
+        return username is None or username == state['username']
+
+    def quick_unlock(self, pin: str) -> Tuple[bool, str]:
+        """استعادة الجلسة المقفلة برمز PIN دون إعادة تشغيل KDF الكامل"""
+        if not self.quick_unlock_available():
+            return False, "الفتح السريع غير متاح. يرجى تسجيل الدخول بكلمة المرور الرئيسية"
+
+        state = self._quick_unlock_state
+        wrapped = state['wrapped']
+
+        try:
+            pin_key = self.crypto.derive_pin_key(pin, wrapped['salt'])
+            master_key = self.crypto.unwrap_key(wrapped['key'], pin_key)
+        except Exception:
+            state['attempts_left'] -= 1
+            if state['attempts_left'] <= 0:
+                # استنفاد المحاولات: مسح المفتاح المغلف والعودة للدخول الكامل
+                self._quick_unlock_state = None
+                return False, "تم تجاوز عدد المحاولات. يرجى تسجيل الدخول بكلمة المرور الرئيسية"
+            return False, f"رمز PIN غير صحيح (المحاولات المتبقية: {state['attempts_left']})"
+
+        # استعادة الجلسة
+        self._quick_unlock_state = None
+        self._quick_unlock_wrapped = wrapped
+        self.current_user = state['username']
+        self.current_user_id = state['user_id']
+        self.session_start = datetime.now()
+        self.master_key = master_key
+        self.session_cipher = self.crypto.create_session_cipher(master_key)
+
+        self.start_auto_lock_timer()
+        if self.backups:
+            self.backups.start()
+        self.db.add_audit_log(self.current_user_id, "QUICK_UNLOCK", "تم الفتح السريع برمز PIN")
+
+        return True, "تم فتح الخزنة"
 
     def start_auto_lock_timer(self):
         """بدء مؤقت القفل التلقائي"""
@@ -149,8 +333,9 @@ class PasswordManager:
 
         def lock_session():
             time.sleep(self.auto_lock_timeout)
-            if self.current_user:
-                self.logout()
+            # تجاهل المؤقتات القديمة التي أعيد تعيينها
+            if self.current_user and self.lock_timer is threading.current_thread():
+                self.lock()
 
         self.lock_timer = threading.Thread(target=lock_session, daemon=True)
         self.lock_timer.start()
@@ -179,19 +364,11 @@ class PasswordManager:
             if 'password' not in entry_data or not entry_data['password']:
                 return False, "كلمة المرور مطلوبة"
 
-            # تشفير كلمة المرور
-            encrypted_password = self.crypto.encrypt_data(
+            # تشفير كلمة المرور والملاحظات (إذا وجدت) بسياق الجلسة
+            encrypted_password, notes_encrypted = self.session_cipher.encrypt_many_blobs([
                 entry_data['password'],
-                self.master_key
-            )
-
-            # تشفير الملاحظات إذا وجدت
-            notes_encrypted = None
-            if 'notes' in entry_data and entry_data['notes']:
-                notes_encrypted = self.crypto.encrypt_data(
-                    entry_data['notes'],
-                    self.master_key
-                )
+                entry_data.get('notes') or None
+            ])
 
             # إضافة المدخل إلى قاعدة البيانات
             entry_id = self.db.add_password_entry(
@@ -221,67 +398,122 @@ class PasswordManager:
             if not entry:
                 return False, {}, "المدخل غير موجود"
 
-            # فك تشفير كلمة المرور
-            password_encrypted = {
-                'ciphertext': base64.b64decode(entry['password_cipher']),
-                'tag': base64.b64decode(entry['password_tag']),
-                'iv': base64.b64decode(entry['iv'])
-            }
-
-            decrypted_password = self.crypto.decrypt_data(password_encrypted, self.master_key)
-
-            # فك تشفير الملاحظات إذا وجدت
-            decrypted_notes = None
-            if entry['notes_cipher'] and entry['notes_tag'] and entry['notes_iv']:
-                notes_encrypted = {
-                    'ciphertext': base64.b64decode(entry['notes_cipher']),
-                    'tag': base64.b64decode(entry['notes_tag']),
-                    'iv': base64.b64decode(entry['notes_iv'])
-                }
-                decrypted_notes = self.crypto.decrypt_data(notes_encrypted, self.master_key)
-
-            # بناء بيانات الإرجاع
-            entry_data = {
-                'id': entry['id'],
-                'title': entry['title'],
-                'username': entry['username'],
-                'email': entry['email'],
-                'password': decrypted_password,
-                'url': entry['url'],
-                'category': entry['category'],
-                'notes': decrypted_notes,
-                'created_at': entry['created_at'],
-                'updated_at': entry['updated_at']
-            }
-
-            return True, entry_data, "تم الاسترجاع بنجاح"
+            return True, self._decrypt_entry(entry), "تم الاسترجاع بنجاح"
 
         except Exception as e:
             return False, {}, f"خطأ في الاسترجاع: {str(e)}"
 
+    def _decrypt_entry(self, entry) -> PasswordEntry:
+        """فك تشفير صف مدخل وبناء بيانات الإرجاع"""
+        # فك تشفير كلمة المرور والملاحظات (إذا وجدت)
+        decrypted_password, decrypted_notes = self.session_cipher.decrypt_many_blobs(
+            [entry.password_blob, entry.notes_blob]
+        )
+
+        # بناء بيانات الإرجاع
+        return PasswordEntry(
+            entry.id,
+            entry.title,
+            entry.username,
+            entry.email,
+            decrypted_password,
+            entry.url,
+            entry.category,
+            decrypted_notes,
+            entry.created_at,
+            entry.updated_at
+        )
+
+    def _decrypt_entries_chunk(self, entries: List[Dict]) -> List[PasswordEntry]:
+        """فك تشفير دفعة من المدخلات (يتم تخطي المدخلات التالفة)"""
+        results = []
+        for entry in entries:
+            try:
+                results.append(self._decrypt_entry(entry))
+            except Exception:
+                continue
+        return results
+
+    def iter_decrypted_entries(self, chunk_size: int = None, workers: int = None):
+        """فك تشفير جميع المدخلات على دفعات بالتوازي مع الحفاظ على الترتيب
+
+        تُجلب الدفعات من قاعدة البيانات بينما تُفك الدفعات السابقة في
+        مجموعة خيوط، ويبقى عدد الدفعات المعلقة محدوداً لضبط الذاكرة.
+        """
+        if not self.current_user_id or not self.master_key:
+            return
+
+        chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+        workers = workers or self.BULK_WORKERS
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk in self.db.iter_encrypted_entries(self.current_user_id, chunk_size):
+                pending.append(pool.submit(self._decrypt_entries_chunk, chunk))
+
+                if len(pending) > workers * 2:
+                    yield from pending.popleft().result()
+
+            while pending:
+                yield from pending.popleft().result()
+
+    def decrypt_all_entries(self, chunk_size: int = None, workers: int = None) -> List[PasswordEntry]:
+        """فك تشفير جميع مدخلات المستخدم دفعة واحدة"""
+        return list(self.iter_decrypted_entries(chunk_size, workers))
+
+    def _encrypt_entries_chunk(self, entries: List[Dict]) -> List[tuple]:
+        """تشفير كلمات المرور والملاحظات لدفعة من المدخلات"""
+        plaintexts = []
+        for entry_data in entries:
+            plaintexts.append(entry_data['password'])
+            plaintexts.append(entry_data.get('notes') or None)
+
+        blobs = self.session_cipher.encrypt_many_blobs(plaintexts)
+        return [
+            (entry_data, blobs[2 * i], blobs[2 * i + 1])
+            for i, entry_data in enumerate(entries)
+        ]
+
+    def iter_encrypt_entries(self, entries: List[Dict], chunk_size: int = None, workers: int = None):
+        """تشفير مدخلات جديدة على دفعات بالتوازي مع الحفاظ على الترتيب
+
+        تُرجع (entry_data, password_blob, notes_blob) لكل مدخل، بصيغة
+        add_password_entries_bulk، مع إبقاء عدد الدفعات المعلقة محدوداً.
+        """
+        chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+        workers = workers or self.BULK_WORKERS
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for i in range(0, len(entries), chunk_size):
+                pending.append(pool.submit(self._encrypt_entries_chunk, entries[i:i + chunk_size]))
+
+                if len(pending) > workers * 2:
+                    yield from pending.popleft().result()
+
+            while pending:
+                yield from pending.popleft().result()
+
     def update_password(self, entry_id: int, entry_data: Dict) -> Tuple[bool, str]:
         """تحديث كلمة مرور"""
         if not self.current_user_id or not self.master_key:
             return False, "يجب تسجيل الدخول أولاً"
 
         try:
+            # نسخة قابلة للتعديل (تقبل قاموساً أو سجلاً)
+            entry_data = dict(entry_data)
+
             # إعداد بيانات التشفير
             encrypted_password = None
             if 'password' in entry_data and entry_data['password']:
-                encrypted_password = self.crypto.encrypt_data(
-                    entry_data['password'],
-                    self.master_key
-                )
+                encrypted_password = self.session_cipher.encrypt_blob(entry_data['password'])
                 # إزالة كلمة المرور من البيانات المرسلة للقاعدة
                 entry_data.pop('password')
 
             notes_encrypted = None
             if 'notes' in entry_data and entry_data['notes'] is not None:
                 if entry_data['notes']:  # إذا كانت الملاحظات غير فارغة
-                    notes_encrypted = self.crypto.encrypt_data(
-                        entry_data['notes'],
-                        self.master_key
-                    )
+                    notes_encrypted = self.session_cipher.encrypt_blob(entry_data['notes'])
                 # إزالة الملاحظات من البيانات المرسلة للقاعدة
                 entry_data.pop('notes')
 
@@ -318,26 +550,39 @@ class PasswordManager:
         except Exception as e:
             return False, f"خطأ في الحذف: {str(e)}"
 
-    def get_all_passwords(self, category: str = None) -> List[Dict]:
-        """الحصول على جميع كلمات المرور"""
+    def get_all_passwords(self, category: str = None, limit: int = None,
+                          after: Dict = None) -> List[Dict]:
+        """الحصول على جميع كلمات المرور (بدون فك التشفير)
+
+        مع limit تُرجع صفحة واحدة فقط؛ ولجلب الصفحة التالية يُمرر آخر مدخل
+        من الصفحة السابقة في after.
+        """
         if not self.current_user_id:
             return []
 
-        return self.db.get_all_entries(self.current_user_id, category)
+        if limit is None:
+            return self.db.get_all_entries(self.current_user_id, category)
+        return self.db.get_entries_page(self.current_user_id, category, after, limit)
+
+    def iter_passwords(self, category: str = None, page_size: int = 500):
+        """تدفق المدخلات (بدون فك التشفير) صفحة بعد صفحة"""
+        if not self.current_user_id:
+            return iter(())
+        return self.db.iter_entries(self.current_user_id, category, page_size)
+
+    def search(self, query: str, limit: int = 50) -> List[Dict]:
+        """البحث في بيانات المدخلات (بدون فك التشفير) مرتبة حسب الصلة"""
+        if not self.current_user_id:
+            return []
+
+        return self.db.search_entries(self.current_user_id, query, limit)
 
     def get_categories(self) -> List[str]:
         """الحصول على التصنيفات المتاحة"""
         if not self.current_user_id:
             return []
 
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-            SELECT DISTINCT category FROM passwords 
-            WHERE user_id = ? ORDER BY category
-        ''', (self.current_user_id,))
-
-        categories = [row['category'] for row in cursor.fetchall()]
-        return categories
+        return self.db.get_categories(self.current_user_id)
 
     def copy_to_clipboard(self, text: str) -> Tuple[bool, str]:
         """نسخ النص إلى الحافظة مع المسح التلقائي"""
@@ -377,9 +622,49 @@ class PasswordManager:
         except:
             pass
 
-    def generate_secure_password(self, length: int = 16) -> str:
+    def generate_secure_password(self, length: int = 16, policy: PasswordPolicy = None) -> str:
         """إنشاء كلمة مرور آمنة"""
-        return self.crypto.generate_secure_password(length)
+        return self.crypto.generate_secure_password(length, policy)
+
+    def generate_secure_passwords(self, count: int, policy: PasswordPolicy = None) -> List[str]:
+        """إنشاء دفعة من كلمات المرور (لمهام التدوير الجماعي)"""
+        return self.crypto.generate_secure_passwords(count, policy)
+
+    def generate_passphrase(self, words: int = 6, separator: str = '-', capitalize: bool = False) -> str:
+        """إنشاء عبارة مرور"""
+        return self.crypto.generate_passphrase(words, separator, capitalize)
+
+    def estimate_password_strength(self, password: str) -> Dict:
+        """تقدير قوة كلمة مرور"""
+        return password_strength.estimate_strength(password).to_dict()
+
+    def password_health_report(self) -> Dict:
+        """تقرير صحة الخزنة: كلمات المرور الضعيفة والمكررة وتوزيع الدرجات"""
+        if not self.current_user_id or not self.master_key:
+            return {}
+
+        entries = self.decrypt_all_entries()
+        results = password_strength.score_many(entry['password'] for entry in entries)
+
+        distribution = [0] * len(password_strength.SCORE_LABELS)
+        weak = []
+        by_password = {}
+
+        for entry, result in zip(entries, results):
+            distribution[result.score] += 1
+            if result.score < 3:
+                weak.append({'id': entry['id'], 'title': entry['title'], **result.to_dict()})
+            by_password.setdefault(entry['password'], []).append(entry['id'])
+
+        reused = [ids for ids in by_password.values() if len(ids) > 1]
+
+        return {
+            'total': len(entries),
+            'distribution': distribution,
+            'weak': weak,
+            'reused': reused,
+            'average_score': sum(r.score for r in results) / len(results) if results else 0
+        }
 
     def export_passwords(self, file_path: str, password: str) -> Tuple[bool, str]:
         """تصدير كلمات المرور"""
@@ -387,17 +672,15 @@ class PasswordManager:
             return False, "يجب تسجيل الدخول أولاً"
 
         try:
-            # الحصول على جميع المدخلات
-            entries = self.get_all_passwords()
-            export_data = []
-
-            for entry_summary in entries:
-                success, entry_data, _ = self.get_password(entry_summary['id'])
-                if success:
-                    export_data.append(entry_data)
+            # فك تشفير جميع المدخلات على دفعات متوازية من لقطة قراءة متسقة
+            # لا تحجز اتصال الكتابة (سجل التدقيق والتعديلات تستمر أثناءها)
+            with self.db.snapshot():
+                export_data = self.decrypt_all_entries()
 
             # تشفير بيانات التصدير
-            export_json = json.dumps(export_data, ensure_ascii=False, indent=2)
+            export_json = json.dumps(
+                [entry.to_dict() for entry in export_data], ensure_ascii=False, indent=2
+            )
 
             # إنشاء مفتاح تصدير من كلمة المرور المقدمة
             export_salt = self.crypto.generate_salt()
@@ -459,19 +742,16 @@ class PasswordManager:
             decrypted_json = self.crypto.decrypt_data(encrypted_data, export_key)
             import_data = json.loads(decrypted_json)
 
-            # استيراد المدخلات
-            imported_count = 0
-            for entry_data in import_data:
-                # إضافة المدخل
-                success, message = self.add_password(entry_data)
-                if success:
-                    imported_count += 1
-
-            # تسجيل العملية
-            self.db.add_audit_log(
+            # تجاهل المدخلات الناقصة ثم التشفير على دفعات متوازية والإدراج
+            # بـ executemany في معاملة واحدة مع سجل تدقيق ملخص
+            valid_entries = [
+                entry_data for entry_data in import_data
+                if isinstance(entry_data, dict) and entry_data.get('title') and entry_data.get('password')
+            ]
+            imported_count = self.db.add_password_entries_bulk(
                 self.current_user_id,
-                "IMPORT",
-                f"Imported {imported_count} entries from {file_path}"
+                self.iter_encrypt_entries(valid_entries),
+                source=file_path
             )
 
             return True, f"تم الاستيراد بنجاح ({imported_count} مدخل)"
@@ -479,6 +759,40 @@ class PasswordManager:
         except Exception as e:
             return False, f"خطأ في الاستيراد: {str(e)}"
 
+    def create_backup(self) -> Tuple[bool, str]:
+        """إنشاء نسخة احتياطية من الخزنة المشفرة الآن"""
+        if not self.current_user_id:
+            return False, "يجب تسجيل الدخول أولاً"
+
+        if not self.backups:
+            return False, "النسخ الاحتياطي غير متاح لهذا النوع من التخزين"
+
+        try:
+            path = self.backups.create_snapshot()
+            self.db.add_audit_log(self.current_user_id, "BACKUP", f"Backup created: {path}")
+            return True, f"تم إنشاء النسخة الاحتياطية: {path}"
+
+        except Exception as e:
+            return False, f"خطأ في النسخ الاحتياطي: {str(e)}"
+
+    def get_storage_report(self) -> Dict:
+        """حجم ملف الخزنة ونسبة الصفحات الحرة وتقرير آخر صيانة"""
+        if not self.maintenance:
+            return {}
+
+        return {
+            'stats': self.db.storage_stats(),
+            'last_maintenance': self.maintenance.last_report
+        }
+
+    def get_settings(self) -> Dict:
+        """الحصول على إعدادات المستخدم الحالي"""
+        if not self.current_user_id:
+            return {}
+
+        settings = self.db.get_user_settings(self.current_user_id)
+        return settings if settings else {}
+
     def update_settings(self, settings: Dict) -> Tuple[bool, str]:
         """تحديث إعدادات المستخدم"""
         if not self.current_user_id:
@@ -491,79 +805,193 @@ class PasswordManager:
             if 'clipboard_timeout' in settings:
                 self.clipboard_timeout = settings['clipboard_timeout']
 
+            if 'quick_unlock_window' in settings:
+                self.quick_unlock_window = settings['quick_unlock_window']
+
             if 'auto_lock_timeout' in settings:
                 self.auto_lock_timeout = settings['auto_lock_timeout']
                 self.reset_auto_lock_timer()
 
+            if 'audit_retention_days' in settings or 'audit_max_rows' in settings:
+                # الحدان من الصف المدمج حتى لا يعود الحد غير المرسل إلى الافتراضي
+                stored = self.db.get_user_settings(self.current_user_id)
+                self.audit_retention.schedule(
+                    self.current_user_id,
+                    stored['audit_retention_days'],
+                    stored['audit_max_rows']
+                )
+
             return True, "تم تحديث الإعدادات بنجاح"
 
         except Exception as e:
             return False, f"خطأ في تحديث الإعدادات: {str(e)}"
 
-    def get_audit_logs(self, limit: int = 50) -> List[Dict]:
-        """الحصول على سجلات التدقيق"""
+    def get_audit_logs(self, limit: int = 50, before: Dict = None) -> List[Dict]:
+        """الحصول على سجلات التدقيق
+
+        للصفحة التالية يُمرر آخر سجل من الصفحة السابقة في before.
+        """
         if not self.current_user_id:
             return []
 
-        return self.db.get_audit_logs(self.current_user_id, limit)
+        if before is None:
+            return self.db.get_audit_logs(self.current_user_id, limit)
+        return self.db.get_audit_logs_page(self.current_user_id, before, limit)
+
+    def iter_audit_logs(self, page_size: int = 200):
+        """تدفق سجلات التدقيق من الأحدث إلى الأقدم"""
+        if not self.current_user_id:
+            return iter(())
+        return self.db.iter_audit_logs(self.current_user_id, page_size)
 
-    def change_master_password(self, current_password: str, new_password: str) -> Tuple[bool, str]:
-        """تغيير كلمة المرور الرئيسية"""
+    def iter_archived_audit_logs(self):
+        """تدفق السجلات المؤرشفة من الأحدث إلى الأقدم"""
+        if not self.current_user_id:
+            return iter(())
+        return self.db.iter_archived_audit_logs(self.current_user_id)
+
+    def change_master_password(self, current_password: str, new_password: str,
+                               progress_callback=None) -> Tuple[bool, str]:
+        """تغيير كلمة المرور الرئيسية مع إعادة تشفير جميع المدخلات
+
+        تُعاد التشفير على دفعات متوازية وتُحفظ كل دفعة مع تقدم السجل في
+        معاملة واحدة، فإذا انقطعت العملية تُستأنف عند الدخول التالي بكلمة
+        المرور القديمة أو الجديدة. progress_callback(processed, rate) اختياري.
+        """
         if not self.current_user_id or not self.master_key:
             return False, "يجب تسجيل الدخول أولاً"
 
         try:
             # التحقق من كلمة المرور الحالية
-            cursor = self.db.conn.cursor()
-            cursor.execute('''
-                SELECT password_hash, salt FROM master_user WHERE id = ?
-            ''', (self.current_user_id,))
-
-            user = cursor.fetchone()
+            user = self.db.get_master_user_by_id(self.current_user_id)
             if not user:
                 return False, "المستخدم غير موجود"
 
-            is_valid = self.crypto.verify_password(
-                current_password,
-                user['password_hash'],
-                user['salt']
-            )
-
-            if not is_valid:
+            old_key = self._authenticate(user, current_password)
+            if not old_key:
                 return False, "كلمة المرور الحالية غير صحيحة"
 
-            # تجزئة كلمة المرور الجديدة
-            new_hashed_data = self.crypto.hash_password(new_password)
+            # اشتقاق المفتاح وقيمة التحقق الجديدين بمعاملات معايرة لهذا الجهاز
+            kdf = self.get_calibrated_kdf()
+            new_salt = self.crypto.generate_salt()
+            new_login_keys = self.crypto.derive_login_keys(
+                new_password, new_salt, kdf['algorithm'], kdf['params']
+            )
+            new_key = new_login_keys['key']
+
+            # بدء السجل قبل تعديل أي مدخل
+            journal = {
+                'new_password_hash': new_login_keys['verifier'],
+                'new_salt': base64.b64encode(new_salt).decode('utf-8'),
+                'new_kdf_algorithm': kdf['algorithm'],
+                'new_kdf_params': kdf['params'],
+                'wrapped_new_key': self.crypto.wrap_key(new_key, old_key),
+                'wrapped_old_key': self.crypto.wrap_key(old_key, new_key)
+            }
+            self.db.start_reencryption_journal(self.current_user_id, journal)
+
+            # إعادة تشفير جميع كلمات المرور بالمفتاح الجديد؛ كل دفعة في معاملة
+            # مستقلة مع تقدم السجل، ثم اعتماد بيانات الدخول وتسجيل العملية معاً
+            try:
+                stats = self._run_reencryption(self.current_user_id, old_key, new_key, 0, progress_callback)
+                with self.db.transaction():
+                    self.db.finish_reencryption(self.current_user_id, journal, self.crypto.LOGIN_SCHEME_VERSION)
+                    self.db.add_audit_log(
+                        self.current_user_id,
+                        "CHANGE_MASTER_PASSWORD",
+                        f"تم تغيير كلمة المرور الرئيسية وإعادة تشفير {stats['processed']} مدخل "
+                        f"({stats['rate']:.0f} مدخل/ثانية)"
+                    )
+            except Exception:
+                # المدخلات الآن بمفتاحين مختلفين: إنهاء الجلسة ليُستأنف السجل عند الدخول التالي
+                self.logout()
+                raise
 
-            # تحديث كلمة المرور في قاعدة البيانات
-            cursor.execute('''
-                UPDATE master_user 
-                SET password_hash = ?, salt = ? 
-                WHERE id = ?
-            ''', (
-                new_hashed_data['hash'],
-                new_hashed_data['salt'],
-                self.current_user_id
-            ))
+            # متابعة الجلسة بالمفتاح الجديد (رمز الفتح السريع يغلف المفتاح القديم)
+            self.master_key = new_key
+            self.session_cipher = self.crypto.create_session_cipher(new_key)
+            self._quick_unlock_wrapped = None
 
-            # إعادة تشفير جميع كلمات المرور بالمفتاح الجديد
-            # (في تطبيق حقيقي، قد تحتاج إلى إعادة تشفير جميع البيانات)
+            return True, f"تم تغيير كلمة المرور بنجاح (أعيد تشفير {stats['processed']} مدخل)"
 
-            self.db.conn.commit()
+        except Exception as e:
+            return False, f"خطأ في تغيير كلمة المرور: {str(e)}"
 
-            # تسجيل العملية
-            self.db.add_audit_log(
-                self.current_user_id,
-                "CHANGE_MASTER_PASSWORD",
-                "تم تغيير كلمة المرور الرئيسية"
+    @staticmethod
+    def _reencrypt_chunk(entries: List[Dict], old_cipher, new_cipher) -> List[tuple]:
+        """فك تشفير دفعة بالمفتاح القديم وتشفيرها بالجديد"""
+        updates = []
+        for entry in entries:
+            plaintexts = old_cipher.decrypt_many_blobs([entry['password_blob'], entry['notes_blob']])
+            new_password, new_notes = new_cipher.encrypt_many_blobs(plaintexts)
+            updates.append((entry['id'], new_password, new_notes))
+        return updates
+
+    def _run_reencryption(self, user_id: int, old_key: bytes, new_key: bytes, after_id: int,
+                          progress_callback=None) -> Dict:
+        """إعادة تشفير المدخلات بعد after_id على دفعات مع حفظ التقدم"""
+        old_cipher = self.crypto.create_session_cipher(old_key)
+        new_cipher = self.crypto.create_session_cipher(new_key)
+        workers = self.BULK_WORKERS
+        processed = 0
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch in self.db.iter_encrypted_entries(user_id, self.REENCRYPT_BATCH_SIZE, after_id):
+                # تقسيم الدفعة على الخيوط مع الحفاظ على الترتيب
+                size = max(1, -(-len(batch) // workers))
+                parts = [batch[i:i + size] for i in range(0, len(batch), size)]
+                updates = []
+                for part in pool.map(lambda p: self._reencrypt_chunk(p, old_cipher, new_cipher), parts):
+                    updates.extend(part)
+
+                self.db.apply_reencrypted_batch(user_id, updates, batch[-1]['id'])
+                processed += len(updates)
+
+                if progress_callback:
+                    elapsed = time.perf_counter() - start
+                    progress_callback(processed, processed / elapsed if elapsed else 0.0)
+
+        elapsed = time.perf_counter() - start
+        return {
+            'processed': processed,
+            'seconds': elapsed,
+            'rate': processed / elapsed if elapsed else 0.0
+        }
+
+    def _resume_reencryption(self, user: Dict, journal: Dict, master_password: str,
+                             master_key: Optional[bytes]) -> Optional[bytes]:
+        """إكمال إعادة تشفير منقطعة بكلمة المرور القديمة أو الجديدة"""
+        if master_key:
+            # تم الدخول بكلمة المرور القديمة
+            old_key = master_key
+            new_key = self.crypto.unwrap_key(journal['wrapped_new_key'], old_key)
+        else:
+            # محاولة الدخول بكلمة المرور الجديدة المسجلة في السجل
+            login_keys = self.crypto.derive_login_keys(
+                master_password,
+                base64.b64decode(journal['new_salt']),
+                journal['new_kdf_algorithm'],
+                journal['new_kdf_params']
             )
+            if not self.crypto.check_login_verifier(login_keys['verifier'], journal['new_password_hash']):
+                return None
+            new_key = login_keys['key']
+            old_key = self.crypto.unwrap_key(journal['wrapped_old_key'], new_key)
 
-            return True, "تم تغيير كلمة المرور بنجاح"
+        self._run_reencryption(user['id'], old_key, new_key, journal['last_entry_id'])
+        with self.db.transaction():
+            self.db.finish_reencryption(user['id'], journal, self.crypto.LOGIN_SCHEME_VERSION)
+            self.db.add_audit_log(user['id'], "CHANGE_MASTER_PASSWORD", "تم استئناف إعادة التشفير وإكمالها")
 
-        except Exception as e:
-            return False, f"خطأ في تغيير كلمة المرور: {str(e)}"
+        return new_key
 
     def close(self):
         """إغلاق مدير كلمات المرور"""
+        # لا صيانة عند الإغلاق حتى لا يتأخر الخروج
+        if self.maintenance:
+            self.maintenance.stop()
+        # تسجيل الخروج يوقف النسخ الدوري أيضاً
         self.logout()
+        self.audit_retention.stop()
         self.db.close()
\ No newline at end of file
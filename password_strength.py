@@ -0,0 +1,393 @@
+"""
+مقدّر قوة كلمات المرور (بأسلوب zxcvbn)
+
+يقسّم كلمة المرور إلى أنماط معروفة (كلمات قاموس، تسلسلات، تكرار، مسارات
+لوحة المفاتيح، تواريخ) ويختار التقسيم الأقل تخميناً بالبرمجة الديناميكية.
+القواميس تُبنى عند أول استخدام ومشتركة بين جميع الاستدعاءات، والتقدير
+تزايدي: عند إضافة حرف في نهاية كلمة المرور تُحسب الأنماط المنتهية عنده فقط.
+"""
+import datetime
+import math
+import threading
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from password_generator import get_builtin_wordlist
+
+
+# كلمات المرور الأكثر شيوعاً مرتبة حسب الانتشار
+_COMMON_PASSWORDS = """
+    password 123456 12345678 qwerty abc123 123456789 111111 1234567 iloveyou
+    adobe123 123123 admin 1234567890 letmein photoshop 1234 monkey shadow
+    sunshine 12345 password1 princess azerty trustno1 000000 welcome dragon
+    football baseball master michael superman batman hello charlie login
+    starwars whatever freedom qwertyuiop passw0rd mustang access flower
+    hottie loveme zaq1zaq1 solo jesus ninja 654321 666666 121212 123321
+    112233 987654321 qazwsx asdfgh zxcvbnm asdfghjkl secret summer winter
+    spring autumn computer internet pokemon killer soccer hockey jordan
+    harley ranger buster thomas tigger robert daniel andrew joshua matthew
+    jennifer hunter maggie ginger cookie pepper cheese chocolate banana
+    orange purple silver golden diamond samsung apple google facebook
+    yankees cowboys lakers chelsea arsenal liverpool barcelona
+"""
+
+_L33T_TABLES = (
+    str.maketrans({'4': 'a', '@': 'a', '8': 'b', '(': 'c', '3': 'e', '6': 'g',
+                   '1': 'i', '!': 'i', '0': 'o', '$': 's', '5': 's', '7': 't',
+                   '+': 't', '2': 'z'}),
+    str.maketrans({'4': 'a', '@': 'a', '8': 'b', '(': 'c', '3': 'e', '6': 'g',
+                   '1': 'l', '|': 'l', '0': 'o', '$': 's', '5': 's', '7': 't',
+                   '+': 't', '2': 'z'}),
+)
+
+_KEYBOARD_ROWS = (
+    "`1234567890-=",
+    "qwertyuiop[]\\",
+    "asdfghjkl;'",
+    "zxcvbnm,./",
+)
+_KEYBOARD_SHIFTED = (
+    "~!@#$%^&*()_+",
+    "QWERTYUIOP{}|",
+    'ASDFGHJKL:"',
+    "ZXCVBNM<>?",
+)
+_KEYBOARD_STARTS = 94
+_KEYBOARD_DEGREE = 4
+
+# أقصى طول لنمط واحد (يحد من كلفة كل حرف جديد)
+MAX_TOKEN_LENGTH = 24
+MIN_TOKEN_LENGTH = 3
+
+SCORE_LABELS = ("ضعيفة جداً", "ضعيفة", "متوسطة", "قوية", "قوية جداً")
+
+# حدود التخمين (log2) لكل درجة: 10^3، 10^6، 10^8، 10^10
+_SCORE_THRESHOLDS = (math.log2(1e3), math.log2(1e6), math.log2(1e8), math.log2(1e10))
+
+_FEEDBACK = {
+    'dictionary': "تحتوي على كلمة أو كلمة مرور شائعة",
+    'sequence': "تحتوي على تسلسل متتابع مثل abc أو 123",
+    'repeat': "تحتوي على أحرف أو مقاطع مكررة",
+    'keyboard': "تحتوي على مسار متجاور على لوحة المفاتيح",
+    'date': "تحتوي على سنة أو تاريخ",
+}
+
+_ranked_dictionary = None
+_keyboard_positions = None
+_dictionary_lock = threading.Lock()
+
+
+def _load_dictionaries():
+    """بناء القواميس عند أول استخدام: قاموس واحد كلمة -> ترتيب"""
+    global _ranked_dictionary, _keyboard_positions
+    if _ranked_dictionary is None:
+        with _dictionary_lock:
+            if _ranked_dictionary is None:
+                ranked = {}
+                for word in _COMMON_PASSWORDS.split():
+                    ranked.setdefault(word, len(ranked) + 1)
+                for word in get_builtin_wordlist():
+                    ranked.setdefault(word, len(ranked) + 1)
+
+                positions = {}
+                for layout in (_KEYBOARD_ROWS, _KEYBOARD_SHIFTED):
+                    for row, keys in enumerate(layout):
+                        for col, key in enumerate(keys):
+                            # إزاحة الصفوف كما في لوحة المفاتيح الفعلية
+                            positions[key] = (row, col + row * 0.5)
+
+                _keyboard_positions = positions
+                _ranked_dictionary = ranked
+    return _ranked_dictionary, _keyboard_positions
+
+
+def _char_cardinality(char):
+    """حجم فئة الحرف لتقدير التخمين بالقوة الغاشمة"""
+    if char.islower() and char.isascii():
+        return 26
+    if char.isupper() and char.isascii():
+        return 26
+    if char.isdigit() and char.isascii():
+        return 10
+    if char.isascii():
+        return 33
+    return 100
+
+
+class StrengthResult:
+    """نتيجة تقدير قوة كلمة المرور"""
+
+    __slots__ = ('score', 'guesses_log2', 'patterns')
+
+    def __init__(self, score, guesses_log2, patterns):
+        self.score = score
+        self.guesses_log2 = guesses_log2
+        self.patterns = patterns
+
+    @property
+    def label(self):
+        """وصف الدرجة"""
+        return SCORE_LABELS[self.score]
+
+    @property
+    def feedback(self):
+        """ملاحظات لتحسين كلمة المرور"""
+        return [_FEEDBACK[p] for p in self.patterns if p in _FEEDBACK]
+
+    def to_dict(self):
+        """تحويل النتيجة إلى قاموس"""
+        return {
+            'score': self.score,
+            'label': self.label,
+            'guesses_log2': round(self.guesses_log2, 2),
+            'feedback': self.feedback
+        }
+
+
+class StrengthEstimator:
+    """مقدّر تزايدي لقوة كلمة المرور (نسخة لكل حقل إدخال)"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """مسح الحالة التزايدية"""
+        self._password = ''
+        # أقل log2 للتخمين لكل بادئة، ونوع النمط الأخير في التقسيم الأمثل
+        self._best = [0.0]
+        self._back = [None]
+
+    def estimate(self, password: str) -> StrengthResult:
+        """تقدير قوة كلمة المرور (يعيد استخدام حساب البادئة المشتركة)"""
+        common = 0
+        limit = min(len(password), len(self._password))
+        while common < limit and password[common] == self._password[common]:
+            common += 1
+
+        del self._best[common + 1:]
+        del self._back[common + 1:]
+        self._password = password
+
+        for end in range(common + 1, len(password) + 1):
+            self._extend(end)
+
+        return self._result()
+
+    def _extend(self, end):
+        """حساب أفضل تقسيم للبادئة password[:end]"""
+        password = self._password
+        best = self._best[end - 1] + math.log2(_char_cardinality(password[end - 1]))
+        back = (end - 1, 'bruteforce')
+
+        for start in range(max(0, end - MAX_TOKEN_LENGTH), end - MIN_TOKEN_LENGTH + 1):
+            match = _match_token(password[start:end])
+            if match is None:
+                continue
+            pattern, guesses_log2 = match
+            candidate = self._best[start] + guesses_log2
+            if candidate < best:
+                best = candidate
+                back = (start, pattern)
+
+        self._best.append(best)
+        self._back.append(back)
+
+    def _result(self):
+        """بناء النتيجة من جدول البرمجة الديناميكية"""
+        guesses_log2 = self._best[-1]
+
+        patterns = []
+        position = len(self._password)
+        while position > 0:
+            start, pattern = self._back[position]
+            if pattern != 'bruteforce' and pattern not in patterns:
+                patterns.append(pattern)
+            position = start
+
+        score = sum(1 for threshold in _SCORE_THRESHOLDS if guesses_log2 >= threshold)
+        return StrengthResult(score, guesses_log2, patterns)
+
+
+@lru_cache(maxsize=4096)
+def _match_token(token) -> Optional[tuple]:
+    """أقل تقدير تخمين (log2) للمقطع كنمط معروف، أو None"""
+    candidates = [
+        m for m in (
+            _dictionary_match(token),
+            _sequence_match(token),
+            _repeat_match(token),
+            _keyboard_match(token),
+            _date_match(token),
+        ) if m is not None
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda m: m[1])
+
+
+def _dictionary_match(token):
+    """مطابقة القاموس مع الأحرف الكبيرة وبدائل l33t والعكس"""
+    ranked, _ = _load_dictionaries()
+    lower = token.lower()
+    best = None
+
+    variants = [(lower, 1)]
+    for table in _L33T_TABLES:
+        unleet = lower.translate(table)
+        if unleet != lower:
+            changed = sum(1 for a, b in zip(lower, unleet) if a != b)
+            variants.append((unleet, 2 ** changed))
+
+    for word, multiplier in variants:
+        for candidate, reversed_factor in ((word, 1), (word[::-1], 2)):
+            rank = ranked.get(candidate)
+            if rank is None:
+                continue
+            guesses = rank * multiplier * reversed_factor * _uppercase_variations(token)
+            if best is None or guesses < best:
+                best = guesses
+
+    return ('dictionary', math.log2(best)) if best else None
+
+
+def _uppercase_variations(token):
+    """عدد تنويعات الأحرف الكبيرة المحتملة"""
+    upper = sum(1 for c in token if c.isupper())
+    if upper == 0 or token.islower():
+        return 1
+    if token.isupper() or (upper == 1 and token[0].isupper()):
+        return 2
+    lower = sum(1 for c in token if c.islower())
+    return sum(math.comb(upper + lower, i) for i in range(1, min(upper, lower) + 1))
+
+
+def _sequence_match(token):
+    """تسلسل متتابع بفارق ثابت ±1 (abc، 321، xyz)"""
+    delta = ord(token[1]) - ord(token[0])
+    if abs(delta) != 1:
+        return None
+    for a, b in zip(token[1:], token[2:]):
+        if ord(b) - ord(a) != delta:
+            return None
+
+    first = token[0]
+    if first in 'aAzZ019':
+        base = 4
+    elif first.isdigit():
+        base = 10
+    else:
+        base = 26
+    if delta < 0:
+        base *= 2
+    return ('sequence', math.log2(base * len(token)))
+
+
+def _repeat_match(token):
+    """حرف أو مقطع مكرر (aaa، abcabc)"""
+    length = len(token)
+    for size in range(1, length // 2 + 1):
+        if length % size:
+            continue
+        block = token[:size]
+        if block * (length // size) == token:
+            block_log2 = sum(math.log2(_char_cardinality(c)) for c in block)
+            return ('repeat', block_log2 + math.log2(length // size))
+    return None
+
+
+def _keyboard_match(token):
+    """مسار من مفاتيح متجاورة على لوحة المفاتيح"""
+    _, positions = _load_dictionaries()
+    coords = [positions.get(c) for c in token]
+    if None in coords:
+        return None
+
+    turns = 0
+    direction = None
+    for (r1, c1), (r2, c2) in zip(coords, coords[1:]):
+        step = (r2 - r1, c2 - c1)
+        if abs(step[0]) > 1 or abs(step[1]) > 1 or step == (0, 0):
+            return None
+        if step != direction:
+            turns += 1
+            direction = step
+
+    shifted = sum(1 for c in token if c.isupper() or c in _KEYBOARD_SHIFTED[0])
+    guesses = _KEYBOARD_STARTS * len(token) * _KEYBOARD_DEGREE ** turns
+    if shifted:
+        guesses *= 2
+    return ('keyboard', math.log2(guesses))
+
+
+# مواضع (السنة، الشهر، اليوم) في التواريخ الرقمية بلا فواصل
+_DATE_LAYOUTS = {
+    6: (
+        ((4, 6), (2, 4), (0, 2)),    # DDMMYY
+        ((4, 6), (0, 2), (2, 4)),    # MMDDYY
+        ((0, 2), (2, 4), (4, 6)),    # YYMMDD
+    ),
+    8: (
+        ((4, 8), (2, 4), (0, 2)),    # DDMMYYYY
+        ((4, 8), (0, 2), (2, 4)),    # MMDDYYYY
+        ((0, 4), (4, 6), (6, 8)),    # YYYYMMDD
+    ),
+}
+
+
+def _date_year(digits):
+    """السنة من رقمين أو أربعة أرقام، أو None إذا كانت خارج 1900-2099"""
+    year = int(digits)
+    if len(digits) == 2:
+        return year + (1900 if year > 50 else 2000)
+    return year if 1900 <= year <= 2099 else None
+
+
+def _year_space(year):
+    """عدد السنوات المحتملة حول السنة المرجعية كما في zxcvbn"""
+    return max(abs(year - 2020), 20)
+
+
+def _date_match(token):
+    """سنة (1900-2099) أو تاريخ رقمي صحيح من 6 أو 8 أرقام"""
+    if not token.isdigit():
+        return None
+
+    if len(token) == 4 and token[:2] in ('19', '20'):
+        return ('date', math.log2(_year_space(int(token))))
+
+    best = None
+    for year_at, month_at, day_at in _DATE_LAYOUTS.get(len(token), ()):
+        year = _date_year(token[slice(*year_at)])
+        if year is None:
+            continue
+        # تاريخ حقيقي فقط (31 فبراير أو 29 فبراير في سنة غير كبيسة ليس تاريخاً)
+        try:
+            datetime.date(year, int(token[slice(*month_at)]), int(token[slice(*day_at)]))
+        except ValueError:
+            continue
+
+        guesses = 365 * _year_space(year)
+        if best is None or guesses < best:
+            best = guesses
+
+    return ('date', math.log2(best)) if best else None
+
+
+def estimate_strength(password: str) -> StrengthResult:
+    """تقدير قوة كلمة مرور واحدة"""
+    return StrengthEstimator().estimate(password)
+
+
+def score_many(passwords: Iterable[str]) -> List[StrengthResult]:
+    """تقدير قوة مجموعة كلمات مرور (يشارك ذاكرة مطابقة الأنماط)"""
+    estimator = StrengthEstimator()
+    results = []
+    for password in passwords:
+        estimator.reset()
+        results.append(estimator.estimate(password or ''))
+    return results
+
+
+def clear_cache():
+    """مسح ذاكرة مطابقة الأنماط (تحتوي على مقاطع من كلمات المرور)"""
+    _match_token.cache_clear()
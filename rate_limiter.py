@@ -0,0 +1,93 @@
+"""
+محدد معدل محاولات الدخول
+
+نافذة منزلقة لكل اسم مستخدم في الذاكرة لا تحتفظ إلا بآخر max_attempts
+محاولة فاشلة، فالتحقق O(1). تُحفظ الحالة بصيغة مضغوطة عبر مخزن خارجي
+(قاعدة البيانات) لتبقى بعد إعادة التشغيل، وتنتهي المحاولات القديمة تلقائياً.
+"""
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def pack_attempts(attempts):
+    """تعبئة أوقات المحاولات (ثوانٍ منذ epoch) في كتلة ثنائية"""
+    return struct.pack(f'<{len(attempts)}I', *(int(t) for t in attempts))
+
+
+def unpack_attempts(blob):
+    """فك كتلة أوقات المحاولات"""
+    return list(struct.unpack(f'<{len(blob) // 4}I', blob)) if blob else []
+
+
+class LoginRateLimiter:
+    """تحديد عدد محاولات الدخول الفاشلة لكل مستخدم ضمن نافذة زمنية"""
+
+    def __init__(self, store=None, max_attempts=5, window=3600, max_tracked=1024):
+        """store: كائن يوفر get_login_throttle وsave_login_throttle
+        وdelete_login_throttle وpurge_login_throttle (اختياري)"""
+        self.store = store
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_tracked = max_tracked
+
+        # username -> deque بآخر max_attempts محاولة (الأحدث استخداماً في النهاية)
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+        # حذف الحالات المنتهية من المخزن عند البدء ثم مرة كل نافذة على الأكثر
+        self._last_purge = 0
+        self._purge(time.time())
+
+    def _purge(self, now):
+        """حذف الحالات التي انتهت كل محاولاتها من المخزن"""
+        if self.store and now - self._last_purge >= self.window:
+            self._last_purge = now
+            self.store.purge_login_throttle(int(now) - self.window)
+
+    def _get(self, username, now):
+        """حالة المستخدم بعد حذف المحاولات الخارجة عن النافذة"""
+        attempts = self._attempts.get(username)
+        if attempts is None:
+            stored = self.store.get_login_throttle(username) if self.store else []
+            attempts = deque(stored, maxlen=self.max_attempts)
+            self._attempts[username] = attempts
+
+            # الإبقاء على عدد محدود من المستخدمين في الذاكرة
+            while len(self._attempts) > self.max_tracked:
+                self._attempts.popitem(last=False)
+        else:
+            self._attempts.move_to_end(username)
+
+        cutoff = now - self.window
+        while attempts and attempts[0] <= cutoff:
+            attempts.popleft()
+        return attempts
+
+    def retry_after(self, username):
+        """الثواني المتبقية حتى يُسمح بمحاولة جديدة (0 إذا لم يكن محظوراً)"""
+        with self._lock:
+            now = time.time()
+            attempts = self._get(username, now)
+            if len(attempts) < self.max_attempts:
+                return 0
+            return max(0, int(attempts[0] + self.window - now))
+
+    def record_failure(self, username):
+        """تسجيل محاولة فاشلة وحفظ الحالة"""
+        with self._lock:
+            now = time.time()
+            attempts = self._get(username, now)
+            attempts.append(int(now))
+            if self.store:
+                self.store.save_login_throttle(username, list(attempts))
+            self._purge(now)
+
+    def reset(self, username):
+        """مسح محاولات المستخدم بعد دخول ناجح"""
+        with self._lock:
+            attempts = self._attempts.pop(username, None)
+            # لا حاجة للكتابة إذا كانت الحالة المحملة فارغة
+            if self.store and (attempts is None or attempts):
+                self.store.delete_login_throttle(username)
@@ -0,0 +1,136 @@
+"""
+سجلات مضغوطة لنتائج قاعدة البيانات
+
+كائنات بـ __slots__ بدلاً من قاموس لكل صف، تُبنى مباشرة من صفوف sqlite3
+عبر row_factory. تدعم الوصول بأسلوب القاموس (record['title']، get، in،
+dict(record)) حتى تعمل الشيفرة القائمة دون تغيير.
+"""
+
+
+class Record:
+    """أساس السجلات: حقول ثابتة في __slots__ مع واجهة شبيهة بالقاموس"""
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, *values, **kwargs):
+        """البناء بالقيم حسب ترتيب FIELDS أو بالأسماء (الحقول الناقصة None)"""
+        for name, value in zip(self.FIELDS, values):
+            setattr(self, name, value)
+        for name in self.FIELDS[len(values):]:
+            setattr(self, name, kwargs.pop(name, None))
+        if kwargs:
+            raise TypeError(f"حقول غير معروفة: {', '.join(kwargs)}")
+
+    @classmethod
+    def columns(cls, prefix=''):
+        """قائمة الأعمدة لاستعلام SELECT بترتيب الحقول"""
+        return ', '.join(prefix + name for name in cls.FIELDS)
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """row_factory لـ sqlite3 يبني السجل من الصف مباشرة"""
+        return cls(*row)
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """البناء من قاموس أو sqlite3.Row"""
+        keys = mapping.keys()
+        return cls(*(mapping[name] if name in keys else None for name in cls.FIELDS))
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.values() == other.values()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+    def get(self, key, default=None):
+        """قيمة الحقل أو default إذا لم يكن من حقول السجل"""
+        if key not in self.FIELDS:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return self.FIELDS
+
+    def values(self):
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def items(self):
+        return tuple((name, getattr(self, name)) for name in self.FIELDS)
+
+    def copy(self):
+        """نسخة سطحية من السجل"""
+        return type(self)(*self.values())
+
+    def to_dict(self):
+        """تحويل إلى قاموس (للتصدير بصيغة JSON مثلاً)"""
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+class EntryRecord(Record):
+    """بيانات مدخل غير مشفرة (للقوائم والبحث)"""
+
+    FIELDS = ('id', 'title', 'username', 'email', 'url', 'category', 'created_at', 'updated_at')
+    __slots__ = FIELDS
+
+
+class EncryptedEntryRecord(Record):
+    """صف مدخل كامل مع الكتل المشفرة"""
+
+    FIELDS = (
+        'id', 'user_id', 'title', 'username', 'email', 'password_blob', 'url',
+        'category', 'notes_blob', 'created_at', 'updated_at', 'last_accessed'
+    )
+    __slots__ = FIELDS
+
+
+class PasswordEntry(Record):
+    """مدخل بعد فك التشفير"""
+
+    FIELDS = (
+        'id', 'title', 'username', 'email', 'password', 'url',
+        'category', 'notes', 'created_at', 'updated_at'
+    )
+    __slots__ = FIELDS
+
+
+class AuditRecord(Record):
+    """سجل تدقيق"""
+
+    FIELDS = ('id', 'user_id', 'action', 'details', 'ip_address', 'timestamp')
+    __slots__ = FIELDS
+
+
+class SettingsRecord(Record):
+    """إعدادات مستخدم"""
+
+    FIELDS = (
+        'user_id', 'clipboard_timeout', 'auto_lock_timeout', 'theme', 'language',
+        'quick_unlock_window', 'audit_retention_days', 'audit_max_rows'
+    )
+    __slots__ = FIELDS
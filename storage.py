@@ -0,0 +1,191 @@
+"""
+واجهة التخزين لمدير كلمات المرور
+
+كل وصول إلى الخزنة يمر عبر StorageBackend، فيمكن استبدال محرك SQLite
+(PasswordDatabase) بمحرك آخر مثل MemoryStorage دون تعديل PasswordManager.
+القيم المشفرة تصل إلى المحرك جاهزة، فلا يرى المحرك أي بيانات مكشوفة.
+"""
+from abc import ABC, abstractmethod
+
+
+class StorageBackend(ABC):
+    """العمليات التي يحتاجها PasswordManager من محرك التخزين"""
+
+    # المعاملات
+
+    @abstractmethod
+    def transaction(self):
+        """مدير سياق لوحدة عمل ذرية (قابلة للتداخل)"""
+
+    @abstractmethod
+    def snapshot(self):
+        """مدير سياق لقراءات متسقة في الخيط الحالي دون حجز الكتابة"""
+
+    @abstractmethod
+    def close(self):
+        """كتابة العمليات المؤجلة وإغلاق المحرك"""
+
+    # المستخدم الرئيسي
+
+    @abstractmethod
+    def create_master_user(self, username, password_hash, salt, kdf_version=1,
+                           kdf_algorithm='scrypt', kdf_params=None):
+        """إنشاء مستخدم رئيسي مع إعدادات افتراضية؛ None إذا كان الاسم مستخدماً"""
+
+    @abstractmethod
+    def get_master_user(self, username):
+        """بيانات المستخدم الرئيسي (قاموس) باسم المستخدم أو None"""
+
+    @abstractmethod
+    def get_master_user_by_id(self, user_id):
+        """بيانات المستخدم الرئيسي (قاموس) بالمعرف أو None"""
+
+    @abstractmethod
+    def update_master_credentials(self, user_id, password_hash, salt, kdf_version,
+                                  kdf_algorithm='scrypt', kdf_params=None):
+        """تحديث بيانات اعتماد المستخدم الرئيسي ومعاملات KDF"""
+
+    # الإعدادات
+
+    @abstractmethod
+    def get_user_settings(self, user_id):
+        """إعدادات المستخدم (SettingsRecord) أو None"""
+
+    @abstractmethod
+    def update_user_settings(self, user_id, settings):
+        """تحديث الحقول المرسلة من إعدادات المستخدم (إنشاؤها إن لم توجد)"""
+
+    # المدخلات
+
+    @abstractmethod
+    def add_password_entry(self, user_id, entry_data, encrypted_password, notes_encrypted=None):
+        """إضافة مدخل مشفر وإرجاع معرفه"""
+
+    @abstractmethod
+    def add_password_entries_bulk(self, user_id, entries, source=None):
+        """إضافة مُكرِّر من (entry_data, password_blob, notes_blob) وإرجاع العدد"""
+
+    @abstractmethod
+    def get_password_entry(self, user_id, entry_id):
+        """المدخل المشفر (EncryptedEntryRecord) مع تسجيل وقت الوصول، أو None"""
+
+    @abstractmethod
+    def flush_access_times(self):
+        """كتابة أوقات الوصول المعلقة"""
+
+    @abstractmethod
+    def get_entries_page(self, user_id, category=None, after=None, limit=100):
+        """صفحة من EntryRecord مرتبة حسب (title, id) تبدأ بعد المدخل after"""
+
+    @abstractmethod
+    def search_entries(self, user_id, query, limit=50):
+        """البحث في العنوان واسم المستخدم والبريد والرابط والتصنيف"""
+
+    @abstractmethod
+    def get_categories(self, user_id):
+        """التصنيفات المستخدمة مرتبة أبجدياً"""
+
+    @abstractmethod
+    def iter_encrypted_entries(self, user_id, chunk_size=500, after_id=0):
+        """دفعات من EncryptedEntryRecord مرتبة حسب المعرف بعد after_id"""
+
+    @abstractmethod
+    def update_password_entry(self, user_id, entry_id, entry_data, encrypted_password=None, notes_encrypted=None):
+        """تحديث مدخل؛ True إذا وُجد"""
+
+    @abstractmethod
+    def delete_password_entry(self, user_id, entry_id):
+        """حذف مدخل؛ True إذا وُجد"""
+
+    def iter_entries(self, user_id, category=None, page_size=500):
+        """تدفق المدخلات صفحة بعد صفحة بذاكرة ثابتة"""
+        after = None
+        while True:
+            page = self.get_entries_page(user_id, category, after, page_size)
+            yield from page
+
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+    def get_all_entries(self, user_id, category=None):
+        """الحصول على جميع المدخلات"""
+        return list(self.iter_entries(user_id, category))
+
+    # سجل التدقيق
+
+    @abstractmethod
+    def add_audit_log(self, user_id, action, details=None, ip_address=None):
+        """إضافة سجل تدقيق (يُلغى إذا تم التراجع عن المعاملة الحالية)"""
+
+    @abstractmethod
+    def flush_audit_log(self, timeout=None):
+        """انتظار كتابة سجلات التدقيق المعلقة؛ True إذا كُتبت فعلاً"""
+
+    @abstractmethod
+    def get_audit_logs_page(self, user_id, before=None, limit=50):
+        """صفحة من AuditRecord من الأحدث إلى الأقدم تبدأ قبل السجل before"""
+
+    @abstractmethod
+    def archive_audit_logs(self, user_id, max_age_days, max_rows, batch_size=500):
+        """نقل دفعة من السجلات المستحقة إلى الأرشيف وإرجاع عددها"""
+
+    @abstractmethod
+    def iter_archived_audit_logs(self, user_id):
+        """تدفق السجلات المؤرشفة من الأحدث إلى الأقدم"""
+
+    def iter_audit_logs(self, user_id, page_size=200):
+        """تدفق سجلات التدقيق من الأحدث إلى الأقدم بذاكرة ثابتة"""
+        self.flush_audit_log()
+
+        before = None
+        while True:
+            page = self.get_audit_logs_page(user_id, before, page_size)
+            yield from page
+
+            if len(page) < page_size:
+                return
+            before = page[-1]
+
+    def get_audit_logs(self, user_id, limit=50):
+        """الحصول على سجلات التدقيق"""
+        # إظهار السجلات التي لم تُكتب بعد
+        self.flush_audit_log()
+
+        return self.get_audit_logs_page(user_id, limit=limit)
+
+    # محاولات الدخول الفاشلة (LoginRateLimiter)
+
+    @abstractmethod
+    def get_login_throttle(self, username):
+        """أوقات المحاولات الفاشلة المحفوظة لمستخدم"""
+
+    @abstractmethod
+    def save_login_throttle(self, username, attempts):
+        """حفظ أوقات المحاولات الفاشلة لمستخدم"""
+
+    @abstractmethod
+    def delete_login_throttle(self, username):
+        """مسح المحاولات الفاشلة لمستخدم"""
+
+    @abstractmethod
+    def purge_login_throttle(self, before):
+        """حذف الحالات التي انتهت كل محاولاتها قبل before"""
+
+    # إعادة التشفير عند تغيير كلمة المرور الرئيسية
+
+    @abstractmethod
+    def start_reencryption_journal(self, user_id, journal):
+        """بدء سجل إعادة التشفير (يستبدل أي سجل سابق)"""
+
+    @abstractmethod
+    def get_reencryption_journal(self, user_id):
+        """سجل إعادة تشفير غير مكتمل (قاموس) أو None"""
+
+    @abstractmethod
+    def apply_reencrypted_batch(self, user_id, updates, last_entry_id):
+        """حفظ دفعة (entry_id, password_blob, notes_blob) وتقدم السجل معاً"""
+
+    @abstractmethod
+    def finish_reencryption(self, user_id, journal, kdf_version):
+        """اعتماد بيانات الدخول الجديدة وحذف السجل معاً"""
@@ -0,0 +1,49 @@
+"""إعدادات مشتركة لاختبارات pytest"""
+import os
+import sys
+
+import pytest
+
+# إضافة مسارات المشروع إلى مسار البحث
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'githab')]
+
+from database import PasswordDatabase  # noqa: E402
+from memory_storage import MemoryStorage  # noqa: E402
+from password_manager import PasswordManager  # noqa: E402
+
+# محركات التخزين التي يجب أن تتصرف بالطريقة نفسها
+STORAGE_ENGINES = {
+    'sqlite': lambda: PasswordDatabase(':memory:'),
+    'memory': MemoryStorage,
+}
+
+
+@pytest.fixture(params=sorted(STORAGE_ENGINES))
+def db(request):
+    """محرك تخزين جديد: SQLite في الذاكرة وMemoryStorage"""
+    storage = STORAGE_ENGINES[request.param]()
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def file_db(tmp_path):
+    """قاعدة بيانات SQLite في ملف (WAL واتصالات قراءة مستقلة)"""
+    database = PasswordDatabase(str(tmp_path / 'vault.db'))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def user_id(db):
+    """مستخدم رئيسي في محرك التخزين"""
+    return db.create_master_user('alice', 'hash', b'\0' * 16)
+
+
+@pytest.fixture
+def pm(db):
+    """مدير كلمات مرور على محرك التخزين"""
+    manager = PasswordManager(storage=db)
+    yield manager
+    manager.close()
@@ -0,0 +1,117 @@
+"""اختبارات الكتابة المؤجلة لأوقات الوصول إلى المدخلات"""
+import threading
+import time
+
+from access_tracker import AccessTracker
+
+BLOB = b'\x02' + b'\0' * 28
+
+
+class Sink:
+    """دالة كتابة مصطنعة تسجل الدفعات ويمكن أن تفشل عند الطلب"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.lock = threading.Lock()
+
+    def __call__(self, accesses):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise OSError("database is locked")
+            self.batches.append(sorted(accesses, key=lambda access: access[1]))
+
+
+def test_repeated_touches_coalesce_per_entry():
+    sink = Sink()
+    tracker = AccessTracker(sink, flush_interval=60)
+    for _ in range(5):
+        tracker.touch(1, 10)
+    tracker.touch(1, 11)
+    tracker.touch(2, 10)
+
+    tracker.flush()
+    tracker.flush()
+
+    (batch,) = sink.batches
+    assert sorted((user_id, entry_id) for _, entry_id, user_id in batch) == [(1, 10), (1, 11), (2, 10)]
+    tracker.close()
+
+
+def test_failed_write_is_retried():
+    sink = Sink(failures=1)
+    tracker = AccessTracker(sink, flush_interval=60)
+    tracker.touch(1, 10)
+
+    tracker.flush()
+    assert sink.batches == []
+
+    tracker.touch(1, 11)
+    tracker.flush()
+    assert [entry_id for _, entry_id, _ in sink.batches[0]] == [10, 11]
+    tracker.close()
+
+
+def test_periodic_flush_and_close():
+    sink = Sink()
+    tracker = AccessTracker(sink, flush_interval=0.05)
+    tracker.touch(1, 10)
+
+    deadline = time.monotonic() + 5
+    while not sink.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(sink.batches) == 1
+
+    tracker.touch(1, 12)
+    tracker.close()
+    assert [entry_id for _, entry_id, _ in sink.batches[-1]] == [12]
+
+
+def test_read_is_visible_after_flush(db, user_id):
+    entry_id = db.add_password_entry(user_id, {'title': 'mail'}, BLOB)
+
+    db.get_password_entry(user_id, entry_id)
+    db.flush_access_times()
+
+    assert db.get_password_entry(user_id, entry_id)['last_accessed'] is not None
+    assert db.get_password_entry(user_id, 999) is None
+
+
+def test_reads_do_not_write_until_flush(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    entry_id = file_db.add_password_entry(user_id, {'title': 'mail'}, BLOB)
+    file_db.access_tracker.flush_interval = 60
+
+    # القراءة لا تحتاج اتصال الكتابة حتى لو كان محجوزاً في خيط آخر
+    with file_db.connections.write():
+        entry = run_in_thread(lambda: file_db.get_password_entry(user_id, entry_id))
+    assert entry['title'] == 'mail'
+
+    def stored_access():
+        with file_db.connections.write() as conn:
+            return conn.execute("SELECT last_accessed FROM passwords WHERE id = ?", (entry_id,)).fetchone()[0]
+
+    assert stored_access() is None
+    file_db.flush_access_times()
+    assert stored_access() is not None
+
+
+def test_older_access_never_overwrites_newer(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    entry_id = file_db.add_password_entry(user_id, {'title': 'mail'}, BLOB)
+
+    file_db.record_access_times([('2024-06-01 12:00:00', entry_id, user_id)])
+    file_db.record_access_times([('2024-01-01 12:00:00', entry_id, user_id)])
+
+    assert file_db.get_password_entry(user_id, entry_id)['last_accessed'] == '2024-06-01 12:00:00'
+
+
+def run_in_thread(target):
+    """تشغيل دالة في خيط آخر خلال مهلة وإرجاع نتيجتها"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(target()))
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    return result[0]
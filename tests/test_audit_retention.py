@@ -0,0 +1,19 @@
+"""اختبارات جدولة أرشفة سجل التدقيق من إعدادات المستخدم"""
+from password_manager import PasswordManager
+
+
+def test_partial_settings_update_keeps_other_retention_limit(tmp_path):
+    pm = PasswordManager(str(tmp_path / 'vault.db'))
+    scheduled = []
+    pm.audit_retention.schedule = lambda user_id, days, rows: scheduled.append((days, rows))
+    try:
+        assert pm.register_user('alice', 'retention-password')[0]
+        assert pm.login('alice', 'retention-password')[0]
+
+        assert pm.update_settings({'audit_retention_days': 30, 'audit_max_rows': 200})[0]
+        assert pm.update_settings({'audit_max_rows': 1000})[0]
+        assert pm.update_settings({'audit_retention_days': 7})[0]
+    finally:
+        pm.close()
+
+    assert scheduled[-3:] == [(30, 200), (30, 1000), (7, 1000)]
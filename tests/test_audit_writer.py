@@ -0,0 +1,133 @@
+"""اختبارات كاتب سجل التدقيق غير المتزامن"""
+import threading
+import time
+
+import pytest
+
+from audit_writer import AuditWriter
+from database import PasswordDatabase
+
+
+class Sink:
+    """دالة كتابة مصطنعة تسجل الدفعات ويمكن أن تفشل عند الطلب"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.lock = threading.Lock()
+
+    def __call__(self, records):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise OSError("disk full")
+            self.batches.append(list(records))
+
+    @property
+    def records(self):
+        with self.lock:
+            return [record for batch in self.batches for record in batch]
+
+
+@pytest.fixture
+def sink():
+    """مستقبل الدفعات"""
+    return Sink()
+
+
+def make_writer(sink, **kwargs):
+    """كاتب بمهلة طويلة حتى لا تُكتب الدفعات إلا بالحجم أو بالطلب"""
+    kwargs.setdefault('flush_interval', 60)
+    return AuditWriter(sink, **kwargs)
+
+
+def test_records_are_written_in_size_bounded_batches(sink):
+    writer = make_writer(sink, max_batch=10)
+    for i in range(25):
+        writer.submit(1, 'ADD', f'entry {i}')
+
+    assert writer.flush(timeout=5)
+
+    assert [len(batch) for batch in sink.batches] == [10, 10, 5]
+    assert [record[2] for record in sink.records] == [f'entry {i}' for i in range(25)]
+    writer.close()
+
+
+def test_records_carry_submission_timestamp(sink):
+    writer = make_writer(sink)
+    writer.submit(1, 'LOGIN')
+    writer.submit(2, 'LOGOUT', 'bye', '127.0.0.1', '2020-01-02 03:04:05')
+    assert writer.flush(timeout=5)
+
+    (first, second) = sink.records
+    assert first[:4] == (1, 'LOGIN', None, None)
+    assert time.strptime(first[4], '%Y-%m-%d %H:%M:%S')
+    assert second == (2, 'LOGOUT', 'bye', '127.0.0.1', '2020-01-02 03:04:05')
+    writer.close()
+
+
+def test_interval_flushes_without_explicit_request(sink):
+    writer = make_writer(sink, flush_interval=0.05)
+    writer.submit(1, 'COPY')
+
+    deadline = time.monotonic() + 5
+    while not sink.records and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(sink.records) == 1
+    writer.close()
+
+
+def test_failed_batch_is_kept_for_retry():
+    sink = Sink(failures=1)
+    writer = make_writer(sink)
+    writer.submit(1, 'ADD')
+
+    assert not writer.flush(timeout=5)
+    assert sink.records == []
+
+    writer.submit(1, 'DELETE')
+    assert writer.flush(timeout=5)
+    assert [record[1] for record in sink.records] == ['ADD', 'DELETE']
+    writer.close()
+
+
+def test_close_drains_queue_and_rejects_new_records(sink):
+    writer = make_writer(sink, max_batch=1000)
+    for i in range(50):
+        writer.submit(1, 'ADD', str(i))
+
+    writer.close(timeout=5)
+
+    assert len(sink.records) == 50
+    assert writer.flush()
+    with pytest.raises(RuntimeError):
+        writer.submit(1, 'ADD')
+    writer.close()
+
+
+def test_database_flush_inside_transaction_does_not_wait(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+
+    with file_db.transaction():
+        file_db.add_audit_log(user_id, 'ADD', 'pending')
+        assert file_db.flush_audit_log(timeout=5) is False
+
+    assert file_db.flush_audit_log(timeout=5) is True
+    assert [log['details'] for log in file_db.get_audit_logs(user_id)] == ['pending']
+
+
+def test_database_close_flushes_pending_records(tmp_path):
+    path = str(tmp_path / 'vault.db')
+    database = PasswordDatabase(path)
+    user_id = database.create_master_user('alice', 'hash', b'\0' * 16)
+    database.audit_writer.flush_interval = 60
+    for i in range(5):
+        database.add_audit_log(user_id, 'ADD', str(i))
+    database.close()
+
+    reopened = PasswordDatabase(path)
+    try:
+        assert len(reopened.get_audit_logs(user_id)) == 5
+    finally:
+        reopened.close()
@@ -0,0 +1,45 @@
+"""اختبارات اللقطات الاحتياطية وجدولتها أثناء الجلسة"""
+import os
+import sqlite3
+
+from backup import BackupManager
+from password_manager import PasswordManager
+
+
+def test_scheduler_runs_only_during_a_session(tmp_path):
+    pm = PasswordManager(str(tmp_path / 'vault.db'))
+    try:
+        assert pm.backups._thread is None
+        assert pm.register_user('alice', 'backup-password')[0]
+        assert pm.backups._thread is None
+
+        assert pm.login('alice', 'backup-password')[0]
+        assert pm.backups._thread.is_alive()
+
+        pm.lock()
+        assert pm.backups._thread is None
+
+        # إعادة البدء بعد الإيقاف
+        assert pm.login('alice', 'backup-password')[0]
+        assert pm.backups._thread.is_alive()
+    finally:
+        pm.close()
+
+    assert pm.backups._thread is None
+    assert not os.path.exists(tmp_path / 'backups')
+
+
+def test_snapshots_are_complete_and_rotated(file_db, tmp_path):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    file_db.add_password_entry(user_id, {'title': 'site'}, b'blob')
+    backups = BackupManager(file_db, str(tmp_path / 'snapshots'), keep=2, pause=0)
+
+    paths = [backups.create_snapshot() for _ in range(3)]
+
+    assert backups.snapshots() == paths[:0:-1]
+    assert not os.path.exists(paths[0])
+    conn = sqlite3.connect(paths[-1])
+    try:
+        assert conn.execute("SELECT title FROM passwords").fetchall() == [('site',)]
+    finally:
+        conn.close()
@@ -0,0 +1,69 @@
+"""اختبارات صيغة الكتل الثنائية للحقول المشفرة (إصدار + nonce + نص مشفر + وسم)"""
+import base64
+import os
+
+import pytest
+
+from crypto_utils import CryptoManager, SessionCipher
+from database import PasswordDatabase
+
+MASTER_PASSWORD = 'blob master password'
+TAG_SIZE = 16
+
+
+@pytest.fixture
+def key():
+    """مفتاح تشفير عشوائي"""
+    return os.urandom(CryptoManager.KEY_SIZE)
+
+
+@pytest.mark.parametrize('plaintext', ['', 'secret', 'كلمة سر'])
+def test_new_blobs_are_version_2_with_12_byte_nonce(key, plaintext):
+    blob = SessionCipher(key).encrypt_blob(plaintext)
+
+    assert blob[0] == CryptoManager.BLOB_VERSION == 2
+    assert len(blob) == 1 + 12 + len(plaintext.encode('utf-8')) + TAG_SIZE
+
+
+def test_legacy_v1_blob_decrypts_with_session_cipher(key):
+    legacy = CryptoManager.encrypt_data('legacy secret', key)
+    assert len(legacy['iv']) == 16
+
+    blob = CryptoManager.pack_encrypted(legacy)
+
+    assert blob[0] == 1
+    assert len(blob) == 1 + 16 + len('legacy secret') + TAG_SIZE
+    assert SessionCipher(key).decrypt_blob(blob) == 'legacy secret'
+
+
+def test_unknown_version_is_rejected(key):
+    blob = bytes((9,)) + SessionCipher(key).encrypt_blob('secret')[1:]
+
+    with pytest.raises(KeyError):
+        SessionCipher(key).decrypt_blob(blob)
+
+
+def test_legacy_columns_repack_without_key(key):
+    legacy = CryptoManager.encrypt_data('repacked', key)
+    columns = [base64.b64encode(legacy[name]).decode('ascii') for name in ('iv', 'ciphertext', 'tag')]
+
+    blob = PasswordDatabase._pack_legacy_fields(*columns)
+
+    assert blob == CryptoManager.pack_encrypted(legacy)
+    assert SessionCipher(key).decrypt_blob(blob) == 'repacked'
+    assert PasswordDatabase._pack_legacy_fields(None, None, None) is None
+
+
+def test_storage_holds_raw_bytes(pm):
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    assert pm.add_password({'title': 'mail', 'password': 'p@ss', 'notes': 'codes'})[0]
+    assert pm.add_password({'title': 'bank', 'password': 'pin'})[0]
+
+    mail, bank = [pm.db.get_password_entry(pm.current_user_id, entry['id'])
+                  for entry in sorted(pm.get_all_passwords(), key=lambda entry: entry['title'], reverse=True)]
+
+    assert isinstance(mail.password_blob, bytes)
+    assert mail.password_blob[0] == CryptoManager.BLOB_VERSION
+    assert len(mail.notes_blob) == 1 + 12 + len('codes') + TAG_SIZE
+    assert bank.notes_blob is None
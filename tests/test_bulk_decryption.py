@@ -0,0 +1,54 @@
+"""اختبارات فك التشفير المتوازي لجميع مدخلات الخزنة"""
+import os
+
+import pytest
+
+MASTER_PASSWORD = 'bulk master password'
+ENTRY_COUNT = 37
+
+
+@pytest.fixture
+def session(pm):
+    """خزنة فيها ENTRY_COUNT مدخلاً بترتيب الإضافة"""
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    for i in range(ENTRY_COUNT):
+        assert pm.add_password({
+            'title': f'site-{i:02d}',
+            'password': f'secret-{i}',
+            'notes': f'notes-{i}' if i % 2 else None
+        })[0]
+    return pm
+
+
+@pytest.mark.parametrize('chunk_size, workers', [(1, 1), (4, 3), (10, 8), (500, 2)])
+def test_parallel_decryption_keeps_id_order(session, chunk_size, workers):
+    entries = session.decrypt_all_entries(chunk_size=chunk_size, workers=workers)
+
+    assert [entry.password for entry in entries] == [f'secret-{i}' for i in range(ENTRY_COUNT)]
+    assert [entry.notes for entry in entries] == [
+        f'notes-{i}' if i % 2 else None for i in range(ENTRY_COUNT)
+    ]
+    ids = [entry.id for entry in entries]
+    assert ids == sorted(ids)
+
+
+def test_corrupted_entry_is_skipped(session):
+    victim = session.get_all_passwords()[5]
+    broken = bytes((2,)) + os.urandom(40)
+    session.db.update_password_entry(session.current_user_id, victim['id'], {}, encrypted_password=broken)
+
+    entries = session.decrypt_all_entries(chunk_size=4, workers=2)
+
+    assert len(entries) == ENTRY_COUNT - 1
+    assert victim['id'] not in {entry.id for entry in entries}
+
+
+def test_streaming_matches_list(session):
+    streamed = [entry.password for entry in session.iter_decrypted_entries(chunk_size=3, workers=2)]
+    assert streamed == [entry.password for entry in session.decrypt_all_entries()]
+
+
+def test_nothing_without_session(session):
+    session.logout()
+    assert session.decrypt_all_entries() == []
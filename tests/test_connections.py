@@ -0,0 +1,158 @@
+"""اختبارات اتصال الكتابة ومجموعة اتصالات القراءة (WAL)"""
+import sqlite3
+import threading
+
+import pytest
+
+from connection_manager import ConnectionManager
+
+BLOB = b'\x02' + b'\0' * 28
+
+
+def add_entry(db, user_id, title):
+    """إضافة مدخل بكتلة ثابتة"""
+    return db.add_password_entry(user_id, {'title': title}, BLOB)
+
+
+def run_in_thread(target):
+    """تشغيل دالة في خيط آخر وإرجاع نتيجتها أو رفع خطئها"""
+    outcome = {}
+
+    def runner():
+        try:
+            outcome['result'] = target()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+def test_readers_see_committed_state_while_writer_is_open(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    add_entry(file_db, user_id, 'committed')
+
+    with file_db.transaction():
+        add_entry(file_db, user_id, 'pending')
+
+        # الكاتب يرى تعديلاته والقراء الآخرون لا يُحجبون ولا يرونها
+        assert len(file_db.get_all_entries(user_id)) == 2
+        titles = run_in_thread(lambda: [e['title'] for e in file_db.get_all_entries(user_id)])
+        assert titles == ['committed']
+
+    assert len(run_in_thread(lambda: file_db.get_all_entries(user_id))) == 2
+
+
+def test_concurrent_readers_alongside_writer(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    total = 60
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        try:
+            for i in range(total):
+                add_entry(file_db, user_id, f'site-{i:03d}')
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def reader():
+        last = 0
+        try:
+            while not done.is_set():
+                count = len(file_db.get_all_entries(user_id))
+                # كل قراءة ترى لقطة محفوظة ولا تتراجع
+                assert count >= last
+                last = count
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(6)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert errors == []
+    assert [e['title'] for e in file_db.get_all_entries(user_id)] == [f'site-{i:03d}' for i in range(total)]
+
+
+def test_reader_connections_are_read_only(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'plain.db'))
+    manager.writer.execute("CREATE TABLE t (x)")
+
+    with manager.reader() as conn:
+        assert conn is not manager.writer
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO t VALUES (1)")
+    manager.close()
+
+
+def test_nested_reads_reuse_the_borrowed_connection(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'plain.db'), max_readers=1)
+
+    with manager.reader() as outer:
+        with manager.reader() as inner:
+            assert inner is outer
+
+    # الاتصال أُعيد إلى المجموعة ويُستعار مجدداً
+    with manager.reader() as again:
+        assert again is outer
+    manager.close()
+
+
+def test_reader_pool_is_bounded(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'plain.db'), max_readers=2)
+    borrowed = threading.Barrier(3)
+    release = threading.Event()
+    peak = []
+    lock = threading.Lock()
+    active = [0]
+
+    def hold():
+        with manager.reader():
+            with lock:
+                active[0] += 1
+                peak.append(active[0])
+            if len(peak) <= 2:
+                borrowed.wait(5)
+            release.wait(5)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=hold) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    borrowed.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert max(peak) == 2
+    manager.close()
+
+
+def test_writer_thread_reads_through_writer(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'plain.db'))
+
+    with manager.write() as writer:
+        assert manager.owns_writer()
+        with manager.reader() as conn:
+            assert conn is writer
+    assert not manager.owns_writer()
+    manager.close()
+
+
+def test_memory_database_uses_single_connection():
+    manager = ConnectionManager(':memory:')
+
+    with manager.reader() as conn:
+        assert conn is manager.writer
+    manager.close()
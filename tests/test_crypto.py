@@ -0,0 +1,58 @@
+"""اختبارات سياق تشفير الجلسة وصيغة الكتل المخزنة"""
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from crypto_utils import CryptoManager, SessionCipher
+
+
+@pytest.fixture
+def cipher():
+    """سياق تشفير بمفتاح عشوائي"""
+    return SessionCipher(os.urandom(CryptoManager.KEY_SIZE))
+
+
+@pytest.mark.parametrize('plaintext', ['', 'secret', 'كلمة سر عربية', 'x' * 10000])
+def test_blob_round_trip(cipher, plaintext):
+    assert cipher.decrypt_blob(cipher.encrypt_blob(plaintext)) == plaintext
+
+
+def test_binary_plaintext_round_trip(cipher):
+    data = bytes(range(256))
+    assert cipher.decrypt_blob(cipher.encrypt_blob(data)) == data
+
+
+def test_each_blob_uses_a_fresh_nonce(cipher):
+    assert cipher.encrypt_blob('same') != cipher.encrypt_blob('same')
+
+
+def test_batch_round_trip_keeps_order_and_none(cipher):
+    plaintexts = ['a', None, 'c', '', None]
+    blobs = cipher.encrypt_many_blobs(plaintexts)
+
+    assert [blob is None for blob in blobs] == [p is None for p in plaintexts]
+    assert cipher.decrypt_many_blobs(blobs) == plaintexts
+
+
+def test_tampered_tag_is_rejected(cipher):
+    blob = bytearray(cipher.encrypt_blob('secret'))
+    blob[-1] ^= 0x01
+
+    with pytest.raises(InvalidTag):
+        cipher.decrypt_blob(bytes(blob))
+
+
+def test_tampered_ciphertext_is_rejected(cipher):
+    blob = bytearray(cipher.encrypt_blob('secret'))
+    blob[14] ^= 0x01
+
+    with pytest.raises(InvalidTag):
+        cipher.decrypt_blob(bytes(blob))
+
+
+def test_wrong_key_is_rejected(cipher):
+    blob = cipher.encrypt_blob('secret')
+
+    with pytest.raises(InvalidTag):
+        SessionCipher(os.urandom(CryptoManager.KEY_SIZE)).decrypt_blob(blob)
@@ -0,0 +1,101 @@
+"""اختبارات التصدير والاستيراد الجماعي بـ executemany"""
+import base64
+import json
+
+import pytest
+
+from crypto_utils import CryptoManager
+
+MASTER_PASSWORD = 'import master password'
+EXPORT_PASSWORD = 'export file password'
+
+
+class Boom(Exception):
+    """خطأ مصطنع أثناء التشفير"""
+
+
+@pytest.fixture
+def session(pm):
+    """مدير كلمات مرور بمستخدم مسجل الدخول"""
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    return pm
+
+
+def write_export(path, entries, password=EXPORT_PASSWORD):
+    """كتابة ملف تصدير بالصيغة 1.0 لقائمة مدخلات"""
+    salt = CryptoManager.generate_salt()
+    encrypted = CryptoManager.encrypt_data(json.dumps(entries), CryptoManager.derive_key(password, salt))
+    package = {'version': '1.0', 'salt': base64.b64encode(salt).decode('ascii')}
+    package.update({name: base64.b64encode(encrypted[name]).decode('ascii') for name in ('ciphertext', 'tag', 'iv')})
+    path.write_text(json.dumps(package), encoding='utf-8')
+    return str(path)
+
+
+def audit_actions(pm):
+    """أنواع سجلات التدقيق للمستخدم الحالي بعد كتابة المعلق منها"""
+    pm.db.flush_audit_log()
+    return [log['action'] for log in pm.db.get_audit_logs(pm.current_user_id, limit=1000)]
+
+
+def test_export_import_round_trip(session, tmp_path):
+    session.BULK_CHUNK_SIZE = 4
+    for i in range(11):
+        assert session.add_password({
+            'title': f'site-{i}', 'password': f'secret-{i}', 'notes': f'notes-{i}' if i % 3 else None
+        })[0]
+    path = str(tmp_path / 'vault.export')
+    assert session.export_passwords(path, EXPORT_PASSWORD)[0]
+
+    assert session.register_user('bob', MASTER_PASSWORD)[0]
+    session.logout()
+    assert session.login('bob', MASTER_PASSWORD)[0]
+    assert not session.import_passwords(path, 'wrong password')[0]
+    success, message = session.import_passwords(path, EXPORT_PASSWORD)
+
+    assert success and '11' in message
+    imported = session.decrypt_all_entries()
+    assert [(e.title, e.password, e.notes) for e in imported] == [
+        (f'site-{i}', f'secret-{i}', f'notes-{i}' if i % 3 else None) for i in range(11)
+    ]
+    assert audit_actions(session).count('IMPORT') == 1
+
+
+def test_incomplete_entries_are_skipped(session, tmp_path):
+    path = write_export(tmp_path / 'mixed.export', [
+        {'title': 'ok', 'password': 'one', 'category': 'عمل'},
+        {'title': 'no password'},
+        {'password': 'no title'},
+        'not an entry',
+        {'title': 'also ok', 'password': 'two', 'notes': 'n'},
+    ])
+
+    success, message = session.import_passwords(path, EXPORT_PASSWORD)
+
+    assert success and '2' in message
+    assert [(e.title, e.category) for e in session.decrypt_all_entries()] == [('ok', 'عمل'), ('also ok', 'عام')]
+
+
+def test_unsupported_version_is_rejected(session, tmp_path):
+    path = tmp_path / 'future.export'
+    path.write_text(json.dumps({'version': '9.0'}), encoding='utf-8')
+
+    assert not session.import_passwords(str(path), EXPORT_PASSWORD)[0]
+
+
+def test_bulk_insert_is_one_transaction(session):
+    blob = session.session_cipher.encrypt_blob('x')
+
+    def entries():
+        yield {'title': 'first'}, blob, None
+        yield {'title': 'second'}, blob, None
+        raise Boom()
+
+    with pytest.raises(Boom):
+        session.db.add_password_entries_bulk(session.current_user_id, entries())
+
+    assert session.get_all_passwords() == []
+    assert 'IMPORT' not in audit_actions(session)
+
+    assert session.db.add_password_entries_bulk(session.current_user_id, iter([])) == 0
+    assert 'IMPORT' not in audit_actions(session)
@@ -0,0 +1,95 @@
+"""اختبارات معايرة KDF وتخزين معاملاتها لكل مستخدم"""
+import pytest
+
+from crypto_utils import CryptoManager
+
+MASTER_PASSWORD = 'calibrated master password'
+# معاملات رخيصة حتى تبقى الاختبارات سريعة
+CHEAP_SCRYPT = {'algorithm': CryptoManager.KDF_SCRYPT, 'params': {'n': 2 ** 10, 'r': 8, 'p': 1}}
+
+
+def fixed_timer(monkeypatch, elapsed_ms):
+    """استبدال قياس الزمن بقيمة ثابتة وتسجيل المعاملات المقاسة"""
+    measured = []
+
+    def timer(algorithm, kdf_params):
+        measured.append(dict(kdf_params))
+        return elapsed_ms
+
+    monkeypatch.setattr(CryptoManager, '_time_kdf', staticmethod(timer))
+    return measured
+
+
+@pytest.mark.parametrize('algorithm', [CryptoManager.KDF_SCRYPT, CryptoManager.KDF_PBKDF2])
+def test_slow_machine_never_goes_below_defaults(monkeypatch, algorithm):
+    fixed_timer(monkeypatch, 10000)
+
+    kdf = CryptoManager.calibrate_kdf(target_ms=100, algorithm=algorithm)
+
+    assert kdf['algorithm'] == algorithm
+    assert kdf['params'] == CryptoManager.default_kdf_params(algorithm)
+
+
+def test_scrypt_cost_doubles_up_to_the_cap(monkeypatch):
+    measured = fixed_timer(monkeypatch, 0.001)
+
+    kdf = CryptoManager.calibrate_kdf(target_ms=500, algorithm=CryptoManager.KDF_SCRYPT)
+
+    assert kdf['params']['n'] == CryptoManager.SCRYPT_MAX_N
+    assert [params['n'] for params in measured] == [
+        2 ** k for k in range(14, CryptoManager.SCRYPT_MAX_N.bit_length())
+    ]
+
+
+def test_scrypt_stops_before_exceeding_target(monkeypatch):
+    monkeypatch.setattr(
+        CryptoManager, '_time_kdf',
+        staticmethod(lambda algorithm, params: params['n'] / CryptoManager.SCRYPT_N * 100)
+    )
+
+    kdf = CryptoManager.calibrate_kdf(target_ms=450, algorithm=CryptoManager.KDF_SCRYPT)
+
+    # 100 ثم 200 ثم 400 مللي ثانية، والمضاعفة التالية تتجاوز الهدف
+    assert kdf['params']['n'] == CryptoManager.SCRYPT_N * 4
+
+
+def test_pbkdf2_iterations_are_scaled_and_capped(monkeypatch):
+    fixed_timer(monkeypatch, 50)
+    kdf = CryptoManager.calibrate_kdf(target_ms=200, algorithm=CryptoManager.KDF_PBKDF2)
+    assert kdf['params']['iterations'] == CryptoManager.PBKDF2_MIN_ITERATIONS * 4
+
+    fixed_timer(monkeypatch, 0.001)
+    kdf = CryptoManager.calibrate_kdf(target_ms=200, algorithm=CryptoManager.KDF_PBKDF2)
+    assert kdf['params']['iterations'] == CryptoManager.PBKDF2_MAX_ITERATIONS
+
+
+def test_calibration_runs_once_per_manager(pm, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        CryptoManager, 'calibrate_kdf',
+        staticmethod(lambda target_ms=None, algorithm=None: calls.append(target_ms) or CHEAP_SCRYPT)
+    )
+
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    assert pm.register_user('bob', MASTER_PASSWORD)[0]
+    assert calls == [pm.kdf_target_ms]
+
+
+@pytest.mark.parametrize('kdf', [
+    CHEAP_SCRYPT,
+    {'algorithm': CryptoManager.KDF_PBKDF2, 'params': {'iterations': 150000}},
+])
+def test_user_kdf_params_are_stored_and_used(pm, kdf):
+    pm._calibrated_kdf = kdf
+
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    user = pm.db.get_master_user('alice')
+    assert user['kdf_algorithm'] == kdf['algorithm']
+    assert user['kdf_params'] == kdf['params']
+
+    # الدخول يستخدم معاملات المستخدم المخزنة لا معاملات الجهاز الحالية
+    pm._calibrated_kdf = None
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    assert pm._calibrated_kdf is None
+    assert pm.add_password({'title': 'mail', 'password': 'p@ss'})[0]
+    assert [entry.password for entry in pm.decrypt_all_entries()] == ['p@ss']
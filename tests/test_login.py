@@ -0,0 +1,85 @@
+"""اختبارات الدخول بتشغيل KDF واحد وترقية الحسابات من المخطط القديم"""
+import base64
+import os
+
+import pytest
+
+from crypto_utils import CryptoManager, SessionCipher
+
+MASTER_PASSWORD = 'single stretch password'
+
+
+@pytest.fixture
+def kdf_runs(monkeypatch):
+    """عداد لتشغيلات derive_key"""
+    runs = []
+    derive_key = CryptoManager.derive_key
+
+    def counting(*args, **kwargs):
+        runs.append(args[0])
+        return derive_key(*args, **kwargs)
+
+    monkeypatch.setattr(CryptoManager, 'derive_key', staticmethod(counting))
+    return runs
+
+
+def test_verifier_is_derived_from_key_but_differs_from_it():
+    salt = os.urandom(CryptoManager.SALT_SIZE)
+    first = CryptoManager.derive_login_keys(MASTER_PASSWORD, salt)
+    second = CryptoManager.derive_login_keys(MASTER_PASSWORD, salt)
+
+    assert first['key'] == second['key']
+    assert first['verifier'] == second['verifier']
+    assert base64.b64decode(first['verifier']) != first['key']
+    assert CryptoManager.check_login_verifier(first['verifier'], second['verifier'])
+    assert not CryptoManager.check_login_verifier(
+        CryptoManager.derive_login_keys('other password', salt)['verifier'], first['verifier']
+    )
+
+
+def test_registration_stores_verifier_only(pm):
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    user = pm.db.get_master_user('alice')
+
+    assert user['kdf_version'] == CryptoManager.LOGIN_SCHEME_VERSION
+    key = CryptoManager.derive_key(
+        MASTER_PASSWORD, base64.b64decode(user['salt']), user['kdf_algorithm'], user['kdf_params']
+    )
+    assert user['password_hash'] == CryptoManager.compute_login_verifier(key)
+
+
+def test_login_runs_the_kdf_once(pm, kdf_runs):
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    kdf_runs.clear()
+
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    assert kdf_runs == [MASTER_PASSWORD]
+
+    pm.logout()
+    kdf_runs.clear()
+    assert not pm.login('alice', 'wrong password')[0]
+    assert len(kdf_runs) == 1
+
+
+def test_legacy_account_is_upgraded_on_login(pm):
+    # حساب بالمخطط 1: تجزئة PBKDF2 منفصلة ومفتاح Scrypt بالمعاملات الافتراضية
+    hashed = CryptoManager.hash_password(MASTER_PASSWORD)
+    user_id = pm.db.create_master_user(
+        'alice', hashed['hash'], hashed['salt'], CryptoManager.LOGIN_SCHEME_LEGACY
+    )
+    legacy_key = CryptoManager.derive_key(MASTER_PASSWORD, base64.b64decode(hashed['salt']))
+    pm.db.add_password_entry(user_id, {'title': 'old'}, SessionCipher(legacy_key).encrypt_blob('legacy secret'))
+
+    assert not pm.login('alice', 'wrong password')[0]
+    assert pm.db.get_master_user('alice')['kdf_version'] == CryptoManager.LOGIN_SCHEME_LEGACY
+
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    user = pm.db.get_master_user('alice')
+    assert user['kdf_version'] == CryptoManager.LOGIN_SCHEME_VERSION
+    assert user['salt'] == hashed['salt']
+    assert user['password_hash'] == CryptoManager.compute_login_verifier(legacy_key)
+
+    # المفتاح لم يتغير فالبيانات القديمة ما زالت مقروءة بالمخطط الجديد
+    pm.logout()
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    assert [entry.password for entry in pm.decrypt_all_entries()] == ['legacy secret']
@@ -0,0 +1,107 @@
+"""اختبارات صيانة ملف قاعدة البيانات (incremental_vacuum وANALYZE)"""
+import sqlite3
+
+import pytest
+
+from database import PasswordDatabase
+from maintenance import DatabaseMaintenance
+from password_manager import PasswordManager
+
+NOTES = b'\x02' + b'n' * 4000
+
+
+@pytest.fixture
+def churned(file_db):
+    """قاعدة حُذف أغلب مدخلاتها فتركت صفحات حرة"""
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    ids = [
+        file_db.add_password_entry(user_id, {'title': f'site-{i}'}, b'\x02' + b'\0' * 28, NOTES)
+        for i in range(200)
+    ]
+    for entry_id in ids[:180]:
+        file_db.delete_password_entry(user_id, entry_id)
+    file_db.optimize()
+    return file_db
+
+
+def test_new_files_use_incremental_auto_vacuum(file_db):
+    stats = file_db.storage_stats()
+
+    assert stats['auto_vacuum'] == 'incremental'
+    assert stats['churn'] == 0
+
+
+def test_incremental_vacuum_frees_pages_in_steps(churned):
+    before = churned.storage_stats()
+    assert before['free_pages'] > 20
+
+    assert churned.incremental_vacuum(10) == 10
+    freed = 10 + churned.incremental_vacuum(10 ** 6)
+    churned.optimize()
+
+    after = churned.storage_stats()
+    assert freed == before['free_pages']
+    assert after['free_pages'] == 0
+    assert after['file_size'] < before['file_size']
+    assert after['page_count'] == before['page_count'] - freed
+
+
+def test_vacuum_waits_outside_transactions(churned):
+    with churned.transaction():
+        assert churned.incremental_vacuum() == 0
+    assert churned.incremental_vacuum() > 0
+
+
+def test_maintenance_report(churned):
+    maintenance = DatabaseMaintenance(churned, churn_threshold=100, vacuum_step=16, pause=0)
+    assert maintenance.is_due()
+
+    report = maintenance.run_once()
+
+    assert report['freed_pages'] == report['before']['free_pages']
+    assert report['analyzed'] and not report['converted']
+    assert report['after']['free_pages'] == 0
+    assert report['after']['churn'] == 0
+    assert maintenance.last_report is report
+    assert not maintenance.is_due()
+
+
+def test_background_maintenance_stops_cleanly(churned):
+    maintenance = DatabaseMaintenance(churned, vacuum_step=1, pause=0.01)
+
+    maintenance.schedule()
+    maintenance.stop()
+    maintenance.schedule()
+
+    assert maintenance._thread is None
+    assert churned.storage_stats()['free_pages'] > 0
+
+
+def test_legacy_file_is_converted_once(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE legacy (x)")
+    conn.close()
+
+    database = PasswordDatabase(path)
+    try:
+        assert database.storage_stats()['auto_vacuum'] == 'none'
+
+        report = DatabaseMaintenance(database).run_once(force=True)
+
+        assert report['converted'] and report['analyzed']
+        assert report['after']['auto_vacuum'] == 'incremental'
+    finally:
+        database.close()
+
+
+def test_storage_report_only_for_sqlite_files(pm, tmp_path):
+    assert pm.get_storage_report() == {}
+
+    manager = PasswordManager(str(tmp_path / 'vault.db'))
+    try:
+        report = manager.get_storage_report()
+        assert report['stats']['auto_vacuum'] == 'incremental'
+        assert report['last_maintenance'] is None
+    finally:
+        manager.close()
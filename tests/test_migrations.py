@@ -0,0 +1,275 @@
+"""اختبارات ترقية قاعدة بيانات بمخطط الإصدار الأول عبر كل الترحيلات"""
+import base64
+import hashlib
+import os
+import sqlite3
+import time
+
+import pytest
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from crypto_utils import SessionCipher
+from database import PasswordDatabase
+from password_manager import PasswordManager
+from rate_limiter import unpack_attempts
+
+MASTER_PASSWORD = 'baseline-password'
+
+# مخطط الإصدار الأول كما أنشأه setup_database قبل الترحيلات (user_version = 0)
+BASELINE_SCHEMA = '''
+    CREATE TABLE master_user (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        salt TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE passwords (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        username TEXT,
+        email TEXT,
+        password_cipher TEXT NOT NULL,
+        password_tag TEXT NOT NULL,
+        iv TEXT NOT NULL,
+        url TEXT,
+        category TEXT,
+        notes_cipher TEXT,
+        notes_tag TEXT,
+        notes_iv TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_accessed TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES master_user (id)
+    );
+    CREATE TABLE audit_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        details TEXT,
+        ip_address TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES master_user (id)
+    );
+    CREATE TABLE failed_attempts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        ip_address TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE settings (
+        user_id INTEGER PRIMARY KEY,
+        clipboard_timeout INTEGER DEFAULT 30,
+        auto_lock_timeout INTEGER DEFAULT 300,
+        theme TEXT DEFAULT 'dark',
+        language TEXT DEFAULT 'ar',
+        FOREIGN KEY (user_id) REFERENCES master_user (id)
+    );
+'''
+
+ENTRIES = [
+    {'title': 'mail', 'username': 'alice', 'password': 'mail-secret', 'notes': 'recovery codes'},
+    {'title': 'bank', 'username': 'alice99', 'password': 'bank-secret', 'notes': None},
+    {'title': 'forum', 'username': None, 'password': 'forum-secret', 'notes': 'old account'},
+]
+
+
+def legacy_encrypt(plaintext, key):
+    """تشفير الإصدار الأول: AES-GCM مع IV من 16 بايت وثلاثة أعمدة base64"""
+    iv = os.urandom(16)
+    encryptor = Cipher(algorithms.AES(key), modes.GCM(iv)).encryptor()
+    ciphertext = encryptor.update(plaintext.encode('utf-8')) + encryptor.finalize()
+    return tuple(base64.b64encode(value).decode('utf-8') for value in (ciphertext, encryptor.tag, iv))
+
+
+def legacy_key(password, salt):
+    """مفتاح الإصدار الأول: scrypt (n=2^14, r=8, p=1)"""
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=2 ** 14, r=8, p=1, dklen=32)
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """ملف بمخطط الإصدار الأول وبياناته: مستخدم ومدخلات مشفرة ومحاولات فاشلة"""
+    path = str(tmp_path / 'baseline.db')
+    salt = os.urandom(32)
+    password_hash = hashlib.pbkdf2_hmac('sha512', MASTER_PASSWORD.encode('utf-8'), salt, 100000, 64)
+    key = legacy_key(MASTER_PASSWORD, salt)
+
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute(
+        "INSERT INTO master_user (username, password_hash, salt) VALUES (?, ?, ?)",
+        ('alice', base64.b64encode(password_hash).decode('utf-8'), base64.b64encode(salt).decode('utf-8'))
+    )
+    conn.execute("INSERT INTO settings (user_id, auto_lock_timeout) VALUES (1, 900)")
+
+    for entry in ENTRIES:
+        password_cipher, password_tag, iv = legacy_encrypt(entry['password'], key)
+        notes = legacy_encrypt(entry['notes'], key) if entry['notes'] else (None, None, None)
+        conn.execute('''
+            INSERT INTO passwords (
+                user_id, title, username, password_cipher, password_tag, iv,
+                category, notes_cipher, notes_tag, notes_iv
+            ) VALUES (1, ?, ?, ?, ?, ?, 'عام', ?, ?, ?)
+        ''', (entry['title'], entry['username'], password_cipher, password_tag, iv, *notes))
+        conn.execute(
+            "INSERT INTO audit_log (user_id, action, details) VALUES (1, 'ADD_PASSWORD', ?)",
+            (f"Added entry: {entry['title']}",)
+        )
+
+    # bob: خمس محاولات حديثة (محظور)، وcarol: محاولات منتهية فقط، وalice: محاولتان حديثتان
+    failures = [('bob', '-1 minutes')] * 5 + [('carol', '-2 hours')] * 3 + [('alice', '-5 minutes')] * 2
+    conn.executemany(
+        "INSERT INTO failed_attempts (username, timestamp) VALUES (?, datetime('now', ?))",
+        failures
+    )
+    conn.commit()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+
+    return path, key
+
+
+def columns(db, table):
+    """أسماء أعمدة جدول"""
+    with db.connections.reader() as conn:
+        return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def tables(db):
+    """أسماء الجداول في قاعدة البيانات"""
+    with db.connections.reader() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_baseline_upgrades_to_latest_schema(baseline_db):
+    path, _ = baseline_db
+    db = PasswordDatabase(path)
+    try:
+        with db.connections.reader() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == PasswordDatabase.SCHEMA_VERSION
+
+        # v2 وv3 وv7: أعمدة جديدة بقيم افتراضية مع بقاء القيم القديمة
+        assert {'kdf_version', 'kdf_algorithm', 'kdf_params'} <= columns(db, 'master_user')
+        user = db.get_master_user('alice')
+        assert user['kdf_version'] == 1
+        settings = db.get_user_settings(user['id'])
+        assert settings['auto_lock_timeout'] == 900
+        assert settings['quick_unlock_window'] == 600
+        assert settings['audit_retention_days'] == 180
+        assert settings['audit_max_rows'] == 5000
+
+        # v4 وv7 وv8: جداول جديدة، وجدول المحاولات القديم محذوف
+        found = tables(db)
+        assert {'reencryption_journal', 'audit_archive', 'login_throttle'} <= found
+        assert 'failed_attempts' not in found
+
+        # v1 وv6: الفهارس والبحث في المدخلات الموجودة
+        assert [entry['title'] for entry in db.get_all_entries(user['id'])] == ['bank', 'forum', 'mail']
+        assert [entry['title'] for entry in db.search_entries(user['id'], 'alice99')] == ['bank']
+        assert len(db.get_audit_logs(user['id'])) == len(ENTRIES)
+    finally:
+        db.close()
+
+
+def test_legacy_fields_repacked_into_blobs(baseline_db):
+    path, key = baseline_db
+    db = PasswordDatabase(path)
+    try:
+        assert columns(db, 'passwords') >= {'password_blob', 'notes_blob'}
+        assert not columns(db, 'passwords') & {'password_cipher', 'password_tag', 'iv', 'notes_iv'}
+
+        # v5: الكتل تُفك بالمفتاح القديم نفسه دون إعادة تشفير
+        cipher = SessionCipher(key)
+        expected = {entry['title']: entry for entry in ENTRIES}
+        for batch in db.iter_encrypted_entries(1):
+            for entry in batch:
+                original = expected.pop(entry['title'])
+                assert cipher.decrypt_blob(entry['password_blob']) == original['password']
+                if original['notes']:
+                    assert cipher.decrypt_blob(entry['notes_blob']) == original['notes']
+                else:
+                    assert entry['notes_blob'] is None
+        assert not expected
+    finally:
+        db.close()
+
+
+def test_recent_failed_attempts_carried_into_login_throttle(baseline_db):
+    path, _ = baseline_db
+    db = PasswordDatabase(path)
+    try:
+        now = time.time()
+        bob = db.get_login_throttle('bob')
+        assert len(bob) == 5
+        assert all(now - 3600 < attempt <= now + 1 for attempt in bob)
+        assert len(db.get_login_throttle('alice')) == 2
+
+        # المحاولات الأقدم من ساعة لا تُنقل
+        assert db.get_login_throttle('carol') == []
+        with db.connections.reader() as conn:
+            row = conn.execute("SELECT attempts FROM login_throttle WHERE username = 'bob'").fetchone()
+        assert unpack_attempts(row[0]) == bob
+    finally:
+        db.close()
+
+
+def test_upgraded_vault_logs_in_and_keeps_throttle(baseline_db):
+    path, _ = baseline_db
+    pm = PasswordManager(path)
+    try:
+        # الحظر المنقول من الجدول القديم ما زال سارياً
+        assert pm.login_retry_after('bob') > 0
+        assert not pm.login('bob', 'anything')[0]
+
+        assert pm.login('alice', MASTER_PASSWORD)[0]
+        passwords = {entry.title: entry.password for entry in pm.decrypt_all_entries()}
+        assert passwords == {entry['title']: entry['password'] for entry in ENTRIES}
+
+        # الدخول الناجح يمسح محاولات alice المنقولة
+        assert pm.db.get_login_throttle('alice') == []
+    finally:
+        pm.close()
+
+
+def test_reopening_upgraded_vault_is_a_no_op(baseline_db):
+    path, _ = baseline_db
+    PasswordDatabase(path).close()
+
+    db = PasswordDatabase(path)
+    try:
+        with db.connections.reader() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == PasswordDatabase.SCHEMA_VERSION
+        assert len(db.get_all_entries(1)) == len(ENTRIES)
+    finally:
+        db.close()
+
+
+def test_failed_migration_keeps_previous_version(baseline_db, monkeypatch):
+    path, key = baseline_db
+
+    def broken(self, cursor):
+        cursor.execute("DROP TABLE audit_archive")
+        raise RuntimeError("migration failed")
+
+    monkeypatch.setattr(PasswordDatabase, '_migration_008_login_throttle', broken)
+    with pytest.raises(RuntimeError):
+        PasswordDatabase(path)
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 7
+        found = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert 'audit_archive' in found and 'failed_attempts' in found
+    finally:
+        conn.close()
+
+    # المحاولة التالية تكمل من الإصدار 7
+    monkeypatch.undo()
+    db = PasswordDatabase(path)
+    try:
+        assert len(db.get_login_throttle('bob')) == 5
+        assert SessionCipher(key).decrypt_blob(db.get_password_entry(1, 1)['password_blob']) == 'mail-secret'
+    finally:
+        db.close()
@@ -0,0 +1,84 @@
+"""اختبارات الترقيم حسب المفتاح للمدخلات وسجلات التدقيق على محركي التخزين"""
+import pytest
+
+BLOB = b'\x02' + b'\0' * 28
+
+
+def add_entries(db, user_id, titles, category='عام'):
+    """إضافة مدخلات بالعناوين المعطاة"""
+    for title in titles:
+        db.add_password_entry(user_id, {'title': title, 'category': category}, BLOB)
+
+
+def all_pages(fetch, limit):
+    """جمع الصفحات غير الفارغة حتى أول صفحة فارغة"""
+    pages = []
+    cursor = None
+    while True:
+        page = fetch(cursor, limit)
+        if not page:
+            return pages
+        assert len(page) <= limit
+        pages.append(page)
+        cursor = page[-1]
+
+
+@pytest.mark.parametrize('count, limit', [(12, 4), (12, 5), (1, 1), (5, 10)])
+def test_pages_end_on_exact_boundaries(db, user_id, count, limit):
+    add_entries(db, user_id, [f'site-{i:02d}' for i in range(count)])
+
+    pages = all_pages(lambda after, n: db.get_entries_page(user_id, after=after, limit=n), limit)
+
+    assert len(pages) == -(-count // limit)
+    assert [e['title'] for page in pages for e in page] == [f'site-{i:02d}' for i in range(count)]
+
+
+def test_duplicate_titles_split_across_pages(db, user_id):
+    add_entries(db, user_id, ['same'] * 7 + ['alpha', 'zulu'])
+
+    pages = all_pages(lambda after, n: db.get_entries_page(user_id, after=after, limit=3), 3)
+    entries = [e for page in pages for e in page]
+
+    ids = [e['id'] for e in entries]
+    assert len(ids) == len(set(ids)) == 9
+    assert [e['title'] for e in entries] == ['alpha'] + ['same'] * 7 + ['zulu']
+    same_ids = [e['id'] for e in entries if e['title'] == 'same']
+    assert same_ids == sorted(same_ids)
+
+
+def test_pages_are_per_user_and_category(db, user_id):
+    other = db.create_master_user('bob', 'hash', b'\0' * 16)
+    add_entries(db, user_id, ['a', 'b', 'c'], category='عمل')
+    add_entries(db, user_id, ['d'], category='شخصي')
+    add_entries(db, other, ['e'], category='عمل')
+
+    work = all_pages(lambda after, n: db.get_entries_page(user_id, 'عمل', after, n), 2)
+
+    assert [e['title'] for page in work for e in page] == ['a', 'b', 'c']
+    assert [e['title'] for e in db.iter_entries(user_id, page_size=1)] == ['a', 'b', 'c', 'd']
+
+
+def test_audit_pages_have_no_duplicates(db, user_id):
+    # السجلات المتتالية تشترك غالباً في الثانية نفسها فيفصل بينها id
+    for i in range(13):
+        db.add_audit_log(user_id, 'ADD', str(i))
+    db.flush_audit_log()
+
+    pages = all_pages(lambda before, n: db.get_audit_logs_page(user_id, before=before, limit=n), 4)
+    logs = [log for page in pages for log in page]
+
+    assert len(pages) == 4
+    assert len({log['id'] for log in logs}) == 13
+    # من الأحدث إلى الأقدم، والمتساوية في الوقت حسب id تنازلياً
+    assert [log['details'] for log in logs] == [str(i) for i in range(12, -1, -1)]
+    assert [log['details'] for log in db.iter_audit_logs(user_id, page_size=5)] == [log['details'] for log in logs]
+
+
+def test_audit_pages_with_identical_timestamps(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    file_db.add_audit_logs([(user_id, 'ADD', str(i), None, '2024-01-01 00:00:00') for i in range(9)])
+
+    pages = all_pages(lambda before, n: file_db.get_audit_logs_page(user_id, before=before, limit=n), 3)
+
+    assert [len(page) for page in pages] == [3, 3, 3]
+    assert [log['details'] for page in pages for log in page] == [str(i) for i in range(8, -1, -1)]
@@ -0,0 +1,95 @@
+"""اختبارات سياسات ومولد كلمات المرور وعبارات المرور"""
+import math
+from collections import Counter
+
+import pytest
+
+from crypto_utils import CryptoManager
+from password_generator import PasswordGenerator, PasswordPolicy, get_builtin_wordlist
+
+
+@pytest.fixture
+def generator():
+    """مولد بمخزن صغير حتى يُعاد ملؤه كثيراً أثناء الاختبار"""
+    return PasswordGenerator(buffer_size=64)
+
+
+def test_every_required_class_is_present(generator):
+    policy = PasswordPolicy(length=4)
+
+    for password in generator.generate_many(500, policy):
+        assert len(password) == 4
+        assert set(password) <= set(policy.alphabet)
+        for chars in policy.classes:
+            assert any(c in chars for c in password)
+
+
+def test_ambiguous_and_excluded_characters_never_appear(generator):
+    policy = PasswordPolicy(length=32, exclude_ambiguous=True, exclude_chars='xyz#')
+
+    used = set(''.join(generator.generate_many(200, policy)))
+
+    assert not used & set(PasswordPolicy.AMBIGUOUS + 'xyz#')
+    assert 'x' not in policy.alphabet
+
+
+def test_length_range_is_respected(generator):
+    policy = PasswordPolicy(min_length=8, max_length=12)
+
+    lengths = {len(password) for password in generator.generate_many(300, policy)}
+
+    assert lengths == set(range(8, 13))
+
+
+def test_single_class_policy(generator):
+    policy = PasswordPolicy(length=20, lowercase=False, uppercase=False, symbols=False)
+
+    assert all(password.isdigit() for password in generator.generate_many(50, policy))
+    assert policy.entropy_bits() == pytest.approx(20 * math.log2(10))
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'lowercase': False, 'uppercase': False, 'digits': False, 'symbols': False},
+    {'digits': False, 'lowercase': False, 'uppercase': False, 'exclude_chars': PasswordPolicy.SYMBOLS},
+    {'length': 3},
+    {'min_length': 10, 'max_length': 8},
+])
+def test_invalid_policies_are_rejected(kwargs):
+    with pytest.raises(ValueError):
+        PasswordPolicy(**kwargs)
+
+
+def test_characters_are_roughly_uniform(generator):
+    policy = PasswordPolicy(length=64, require_each_class=False, uppercase=False, symbols=False)
+
+    counts = Counter(''.join(generator.generate_many(500, policy)))
+    expected = 500 * 64 / len(policy.alphabet)
+
+    assert set(counts) == set(policy.alphabet)
+    assert all(abs(count - expected) < expected * 0.25 for count in counts.values())
+
+
+def test_randbelow_stays_in_range(generator):
+    assert {generator.randbelow(3) for _ in range(300)} == {0, 1, 2}
+    assert all(0 <= generator.randbelow(1000) < 1000 for _ in range(300))
+    with pytest.raises(ValueError):
+        generator.randbelow(0)
+
+
+@pytest.mark.parametrize('length', [0, 1, 2, 3, 16])
+def test_short_lengths_from_crypto_manager(length):
+    assert len(CryptoManager.generate_secure_password(length)) == length
+
+
+def test_passphrases(generator):
+    wordlist = get_builtin_wordlist()
+    assert get_builtin_wordlist() is wordlist
+
+    phrase = generator.generate_passphrase(words=5, separator=' ', capitalize=True)
+    words = phrase.split(' ')
+    assert len(words) == 5
+    assert all(word[0].isupper() and word.lower() in wordlist for word in words)
+
+    custom = generator.generate_passphrases(10, words=3, wordlist=('alpha', 'beta'))
+    assert all(set(p.split('-')) <= {'alpha', 'beta'} for p in custom)
+    assert PasswordGenerator.passphrase_entropy_bits(4, ('a', 'b')) == 4
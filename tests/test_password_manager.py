@@ -0,0 +1,112 @@
+"""اختبارات PasswordManager على محركي التخزين (SQLite وMemoryStorage)"""
+import pytest
+
+MASTER_PASSWORD = 'correct horse battery'
+
+
+@pytest.fixture
+def session(pm):
+    """مدير كلمات مرور بمستخدم مسجل الدخول"""
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    return pm
+
+
+def add_entries(pm, count, category='عام'):
+    """إضافة مدخلات مرقمة site-000 وما بعدها"""
+    for i in range(count):
+        assert pm.add_password({
+            'title': f'site-{i:03d}',
+            'username': f'user{i}',
+            'password': f'secret-{i}',
+            'category': category,
+            'notes': f'notes {i}'
+        })[0]
+
+
+def test_register_rejects_duplicate_username(pm):
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    assert not pm.register_user('alice', 'another password')[0]
+
+
+def test_login_requires_the_right_password(pm):
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+
+    assert not pm.login('alice', 'wrong password')[0]
+    assert not pm.login('nobody', MASTER_PASSWORD)[0]
+    assert pm.current_user_id is None
+
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    assert pm.current_user == 'alice'
+
+
+def test_add_and_read_back(session):
+    assert session.add_password({
+        'title': 'mail', 'username': 'alice', 'password': 'p@ss', 'notes': 'backup codes'
+    })[0]
+
+    (entry,) = session.get_all_passwords()
+    success, decrypted, _ = session.get_password(entry['id'])
+    assert success
+    assert decrypted['password'] == 'p@ss'
+    assert decrypted['notes'] == 'backup codes'
+
+
+def test_update_and_delete(session):
+    assert session.add_password({'title': 'old', 'password': 'one'})[0]
+    entry_id = session.get_all_passwords()[0]['id']
+
+    assert session.update_password(entry_id, {'title': 'new', 'password': 'two'})[0]
+    assert [entry['title'] for entry in session.get_all_passwords()] == ['new']
+    assert session.get_password(entry_id)[1]['password'] == 'two'
+
+    assert session.delete_password(entry_id)[0]
+    assert session.get_all_passwords() == []
+
+
+def test_search_matches_metadata_only(session):
+    assert session.add_password({'title': 'GitHub', 'username': 'octo', 'password': 'hunter2'})[0]
+    assert session.add_password({'title': 'Bank', 'email': 'me@example.com', 'password': 'octo-pin'})[0]
+
+    assert [entry['title'] for entry in session.search('octo')] == ['GitHub']
+    assert [entry['title'] for entry in session.search('example')] == ['Bank']
+    # كلمات المرور مشفرة فلا يُبحث فيها
+    assert session.search('hunter2') == []
+
+
+def test_keyset_pages_cover_every_entry_once(session):
+    add_entries(session, 23)
+
+    seen = []
+    after = None
+    while True:
+        page = session.get_all_passwords(limit=5, after=after)
+        seen.extend(entry['title'] for entry in page)
+        if len(page) < 5:
+            break
+        after = page[-1]
+
+    assert seen == [f'site-{i:03d}' for i in range(23)]
+    assert [entry['title'] for entry in session.iter_passwords(page_size=4)] == seen
+
+
+def test_category_pages_and_categories(session):
+    add_entries(session, 3, category='عمل')
+    assert session.add_password({'title': 'other', 'password': 'x', 'category': 'شخصي'})[0]
+
+    assert [entry['title'] for entry in session.get_all_passwords('عمل', limit=2)] == ['site-000', 'site-001']
+    assert sorted(session.get_categories()) == sorted(['عمل', 'شخصي'])
+
+
+def test_change_master_password(session):
+    add_entries(session, 7)
+    session.REENCRYPT_BATCH_SIZE = 3
+
+    assert not session.change_master_password('wrong password', 'new master password')[0]
+    assert session.change_master_password(MASTER_PASSWORD, 'new master password')[0]
+    session.logout()
+
+    assert not session.login('alice', MASTER_PASSWORD)[0]
+    assert session.login('alice', 'new master password')[0]
+    passwords = sorted(entry.password for entry in session.decrypt_all_entries())
+    assert passwords == sorted(f'secret-{i}' for i in range(7))
@@ -0,0 +1,69 @@
+"""اختبارات مقدّر قوة كلمات المرور"""
+import pytest
+
+import password_strength
+from password_strength import StrengthEstimator, _date_match, estimate_strength, score_many
+
+PASSWORDS = ['', 'a', 'password', 'P@ssw0rd', 'qwertyuiop', 'abcdef123', '19871225',
+             'correct-horse-battery', 'Tr0ub4dor&3', 'xK#9vL!2mQ$7wZ']
+
+
+@pytest.mark.parametrize('token', [
+    '311299',      # DDMMYY
+    '123199',      # MMDDYY
+    '991231',      # YYMMDD
+    '290200',      # 29 فبراير 2000 (سنة كبيسة)
+    '19991231',    # YYYYMMDD
+    '31121999',    # DDMMYYYY
+    '1987',
+])
+def test_real_dates_match(token):
+    assert _date_match(token)[0] == 'date'
+
+
+@pytest.mark.parametrize('token', [
+    '999999',
+    '310299',      # 31 فبراير
+    '290299',      # 29 فبراير في سنة غير كبيسة
+    '310499',      # 31 أبريل
+    '99999999',
+    '20231301',
+    '1750',
+    '12345',
+])
+def test_impossible_dates_do_not_match(token):
+    assert _date_match(token) is None
+
+
+def same_result(a, b):
+    """تطابق نتيجتين بالدرجة وعدد التخمينات والأنماط"""
+    return (a.score, round(a.guesses_log2, 9), a.patterns) == (b.score, round(b.guesses_log2, 9), b.patterns)
+
+
+@pytest.mark.parametrize('password', PASSWORDS)
+def test_typing_character_by_character_matches_one_shot(password):
+    estimator = StrengthEstimator()
+    for end in range(len(password) + 1):
+        result = estimator.estimate(password[:end])
+
+    assert same_result(result, estimate_strength(password))
+
+
+def test_editing_in_the_middle_matches_one_shot():
+    estimator = StrengthEstimator()
+    # إدخال ثم حذف ثم لصق: كل خطوة تعيد استخدام بادئة مختلفة
+    for text in ['passw', 'password123', 'pass', 'pass1987', 'qwerty1987', '', 'Tr0ub4dor']:
+        assert same_result(estimator.estimate(text), estimate_strength(text))
+
+
+def test_score_many_matches_one_shot():
+    password_strength.clear_cache()
+    results = score_many(PASSWORDS + [None])
+
+    assert [r.score for r in results] == [estimate_strength(p).score for p in PASSWORDS + ['']]
+
+
+def test_scores_are_ordered():
+    assert estimate_strength('password').score == 0
+    assert estimate_strength('xK#9vL!2mQ$7wZ').score == 4
+    assert 'dictionary' in estimate_strength('P@ssw0rd').patterns
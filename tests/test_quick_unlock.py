@@ -0,0 +1,86 @@
+"""اختبارات الفتح السريع برمز PIN بعد القفل"""
+import time
+
+import pytest
+
+from crypto_utils import CryptoManager
+
+MASTER_PASSWORD = 'quick unlock master password'
+PIN = '4821'
+
+
+@pytest.fixture
+def locked(pm):
+    """جلسة فيها مدخل واحد، مقفلة بعد تعيين PIN"""
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    assert pm.add_password({'title': 'mail', 'password': 'p@ss'})[0]
+    assert pm.set_quick_unlock_pin(PIN)[0]
+    pm.lock()
+    return pm
+
+
+def test_pin_requires_session_and_minimum_length(pm):
+    assert not pm.set_quick_unlock_pin(PIN)[0]
+
+    assert pm.register_user('alice', MASTER_PASSWORD)[0]
+    assert pm.login('alice', MASTER_PASSWORD)[0]
+    assert not pm.set_quick_unlock_pin('123')[0]
+    assert pm.set_quick_unlock_pin(PIN)[0]
+
+
+def test_lock_clears_the_session(locked):
+    assert locked.current_user_id is None
+    assert locked.master_key is None
+    assert locked.quick_unlock_available('alice')
+    assert not locked.quick_unlock_available('bob')
+
+
+def test_correct_pin_restores_session_without_full_kdf(locked, monkeypatch):
+    def no_kdf(*args, **kwargs):
+        raise AssertionError('الفتح السريع يجب ألا يشغل KDF الكامل')
+
+    monkeypatch.setattr(CryptoManager, 'derive_key', staticmethod(no_kdf))
+
+    assert locked.quick_unlock(PIN)[0]
+    assert locked.current_user == 'alice'
+    assert [entry.password for entry in locked.decrypt_all_entries()] == ['p@ss']
+    assert not locked.quick_unlock_available()
+
+    # PIN يبقى مفعلاً للقفل التالي
+    locked.lock()
+    assert locked.quick_unlock(PIN)[0]
+
+
+def test_wrong_pin_counts_down_then_locks_out(locked):
+    for remaining in range(locked.QUICK_UNLOCK_MAX_ATTEMPTS - 1, 0, -1):
+        success, message = locked.quick_unlock('0000')
+        assert not success
+        assert str(remaining) in message
+        assert locked.quick_unlock_available()
+
+    assert not locked.quick_unlock('0000')[0]
+    assert not locked.quick_unlock_available()
+    # حتى PIN الصحيح مرفوض بعد استنفاد المحاولات
+    assert not locked.quick_unlock(PIN)[0]
+    assert locked.current_user_id is None
+    assert locked.login('alice', MASTER_PASSWORD)[0]
+
+
+def test_expired_window_requires_master_password(locked):
+    locked._quick_unlock_state['expires_at'] = time.monotonic() - 1
+
+    assert not locked.quick_unlock_available()
+    assert not locked.quick_unlock(PIN)[0]
+
+
+def test_disabled_window_and_logout_drop_quick_unlock(locked):
+    assert locked.quick_unlock(PIN)[0]
+    locked.logout()
+    assert not locked.quick_unlock_available()
+
+    assert locked.login('alice', MASTER_PASSWORD)[0]
+    assert locked.set_quick_unlock_pin(PIN)[0]
+    locked.quick_unlock_window = 0
+    locked.lock()
+    assert not locked.quick_unlock_available()
@@ -0,0 +1,115 @@
+"""اختبارات محدد محاولات الدخول ونافذته المحفوظة"""
+import types
+
+import pytest
+
+import rate_limiter
+from database import PasswordDatabase
+from password_manager import PasswordManager
+from rate_limiter import LoginRateLimiter, pack_attempts, unpack_attempts
+
+MASTER_PASSWORD = 'rate limited password'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ساعة يدوية بدلاً من time.time داخل محدد المعدل"""
+    fake = types.SimpleNamespace(now=1_700_000_000.0)
+    monkeypatch.setattr(rate_limiter, 'time', types.SimpleNamespace(time=lambda: fake.now))
+    return fake
+
+
+def fail(limiter, username, times):
+    """تسجيل عدد من المحاولات الفاشلة"""
+    for _ in range(times):
+        limiter.record_failure(username)
+
+
+def test_attempts_pack_round_trip():
+    attempts = [1_700_000_000, 1_700_000_060, 4_000_000_000]
+    assert unpack_attempts(pack_attempts(attempts)) == attempts
+    assert len(pack_attempts(attempts)) == 12
+    assert unpack_attempts(None) == []
+
+
+def test_blocks_after_max_attempts_until_window_passes(db, clock):
+    limiter = LoginRateLimiter(db, max_attempts=3, window=600)
+
+    fail(limiter, 'alice', 2)
+    assert limiter.retry_after('alice') == 0
+
+    clock.now += 100
+    fail(limiter, 'alice', 1)
+    # الانتظار يُحسب من أقدم محاولة في النافذة
+    assert limiter.retry_after('alice') == 500
+    assert limiter.retry_after('bob') == 0
+
+    # أقدم محاولة تخرج من النافذة فيُسمح بمحاولة جديدة
+    clock.now += 500
+    assert limiter.retry_after('alice') == 0
+
+
+def test_window_survives_restart(db, clock):
+    fail(LoginRateLimiter(db, max_attempts=3, window=600), 'alice', 3)
+
+    clock.now += 60
+    restarted = LoginRateLimiter(db, max_attempts=3, window=600)
+
+    assert restarted.retry_after('alice') == 540
+    assert len(db.get_login_throttle('alice')) == 3
+
+
+def test_only_latest_attempts_are_kept(db, clock):
+    limiter = LoginRateLimiter(db, max_attempts=3, window=600)
+    for _ in range(10):
+        limiter.record_failure('alice')
+        clock.now += 1
+
+    assert db.get_login_throttle('alice') == [int(clock.now) - 3, int(clock.now) - 2, int(clock.now) - 1]
+
+
+def test_evicted_user_reloads_from_store(db, clock):
+    limiter = LoginRateLimiter(db, max_attempts=2, window=600, max_tracked=2)
+    fail(limiter, 'alice', 2)
+    for name in ('bob', 'carol', 'dave'):
+        limiter.retry_after(name)
+
+    assert 'alice' not in limiter._attempts
+    assert limiter.retry_after('alice') == 600
+
+
+def test_reset_clears_memory_and_store(db, clock):
+    limiter = LoginRateLimiter(db, max_attempts=2, window=600)
+    fail(limiter, 'alice', 2)
+
+    limiter.reset('alice')
+
+    assert limiter.retry_after('alice') == 0
+    assert db.get_login_throttle('alice') == []
+    assert LoginRateLimiter(db, max_attempts=2, window=600).retry_after('alice') == 0
+
+
+def test_expired_state_is_purged_from_store(db, clock):
+    fail(LoginRateLimiter(db, max_attempts=3, window=600), 'alice', 1)
+
+    clock.now += 601
+    LoginRateLimiter(db, max_attempts=3, window=600)
+
+    assert db.get_login_throttle('alice') == []
+
+
+def test_lockout_survives_manager_restart(tmp_path):
+    path = str(tmp_path / 'vault.db')
+    manager = PasswordManager(storage=PasswordDatabase(path))
+    assert manager.register_user('alice', MASTER_PASSWORD)[0]
+    for _ in range(manager.rate_limiter.max_attempts):
+        assert not manager.login('alice', 'wrong password')[0]
+    manager.close()
+
+    manager = PasswordManager(storage=PasswordDatabase(path))
+    try:
+        assert manager.login_retry_after('alice') > 0
+        assert not manager.login('alice', MASTER_PASSWORD)[0]
+        assert manager.current_user_id is None
+    finally:
+        manager.close()
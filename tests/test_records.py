@@ -0,0 +1,93 @@
+"""اختبارات السجلات المضغوطة لنتائج قاعدة البيانات"""
+import json
+import sqlite3
+
+import pytest
+
+from records import AuditRecord, EntryRecord, PasswordEntry, SettingsRecord
+
+BLOB = b'\x02' + b'\0' * 28
+
+
+def test_records_have_no_instance_dict():
+    record = EntryRecord(1, 'mail')
+
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(AttributeError):
+        record.extra = 'x'
+
+
+def test_construction_by_position_and_name():
+    record = AuditRecord(7, 1, action='LOGIN', timestamp='2024-01-01 00:00:00')
+
+    assert record.values() == (7, 1, 'LOGIN', None, None, '2024-01-01 00:00:00')
+    with pytest.raises(TypeError):
+        AuditRecord(1, unknown='x')
+
+
+def test_mapping_access():
+    record = EntryRecord(1, 'mail', 'alice', category='عام')
+
+    assert record['title'] == record.title == 'mail'
+    assert record.get('email') is None
+    assert record.get('password', 'hidden') == 'hidden'
+    assert 'username' in record and 'password' not in record
+    assert list(record) == list(EntryRecord.FIELDS) == list(record.keys())
+    assert len(record) == len(EntryRecord.FIELDS)
+    assert dict(record)['category'] == 'عام'
+    with pytest.raises(KeyError):
+        record['password']
+
+    record['title'] = 'webmail'
+    assert record.title == 'webmail'
+    with pytest.raises(KeyError):
+        record['password'] = 'x'
+
+
+def test_copy_is_independent():
+    record = PasswordEntry(1, 'mail', password='p@ss')
+    copy = record.copy()
+
+    copy['password'] = 'changed'
+
+    assert record.password == 'p@ss'
+    assert copy == PasswordEntry(1, 'mail', password='changed')
+    assert copy != record
+
+
+def test_to_dict_and_equality_with_dict():
+    record = SettingsRecord(1, 30, 300, 'dark', 'ar', 600, 90, 10000)
+
+    assert record.to_dict() == dict(zip(SettingsRecord.FIELDS, record.values()))
+    assert record == record.to_dict()
+    assert json.loads(json.dumps(record.to_dict()))['theme'] == 'dark'
+    assert record != EntryRecord()
+    assert 'theme=' in repr(record)
+
+
+def test_row_factory_and_from_mapping():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT 5 AS id, 'mail' AS title, 'x' AS ignored").fetchone()
+
+    record = EntryRecord.from_mapping(row)
+    assert (record.id, record.title, record.url) == (5, 'mail', None)
+    assert EntryRecord.from_mapping({'title': 'bank'}).title == 'bank'
+
+    conn.row_factory = AuditRecord.row_factory
+    audit = conn.execute("SELECT 1, 2, 'ADD', NULL, NULL, '2024-01-01'").fetchone()
+    assert isinstance(audit, AuditRecord) and audit.action == 'ADD'
+    assert AuditRecord.columns('a.').startswith('a.id, a.user_id')
+
+
+def test_storage_returns_records(db, user_id):
+    entry_id = db.add_password_entry(user_id, {'title': 'mail', 'username': 'alice'}, BLOB)
+
+    (listed,) = db.get_all_entries(user_id)
+    assert isinstance(listed, EntryRecord)
+    assert listed['username'] == 'alice'
+
+    # تعديل النسخة المعادة لا يغير ما في المخزن
+    listed['title'] = 'changed'
+    assert db.get_password_entry(user_id, entry_id)['title'] == 'mail'
+    assert isinstance(db.get_user_settings(user_id), SettingsRecord)
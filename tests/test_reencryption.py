@@ -0,0 +1,147 @@
+"""اختبارات استئناف إعادة التشفير بعد انقطاع تغيير كلمة المرور الرئيسية"""
+import pytest
+
+from password_manager import PasswordManager
+
+OLD_PASSWORD = 'old-master-password'
+NEW_PASSWORD = 'new-master-password'
+ENTRY_COUNT = 23
+BATCH_SIZE = 5
+
+
+class Crash(Exception):
+    """انقطاع متعمد أثناء إعادة التشفير"""
+
+
+@pytest.fixture
+def vault_path(tmp_path):
+    """خزنة فيها مدخلات مشفرة بكلمة المرور القديمة"""
+    path = str(tmp_path / 'vault.db')
+    pm = PasswordManager(path)
+    assert pm.register_user('alice', OLD_PASSWORD)[0]
+    assert pm.login('alice', OLD_PASSWORD)[0]
+    for i in range(ENTRY_COUNT):
+        entry = {'title': f'site-{i}', 'password': f'secret-{i}'}
+        if i % 3:
+            entry['notes'] = f'notes-{i}'
+        assert pm.add_password(entry)[0]
+    pm.close()
+    return path
+
+
+def interrupt_change(path, fail_on_batch, partial=False):
+    """تغيير كلمة المرور مع انقطاع عند الدفعة fail_on_batch
+
+    partial: تنفيذ الدفعة ثم الانقطاع قبل حفظ معاملتها (انقطاع وسط الدفعة).
+    """
+    pm = PasswordManager(path)
+    pm.REENCRYPT_BATCH_SIZE = BATCH_SIZE
+    assert pm.login('alice', OLD_PASSWORD)[0]
+
+    apply_batch = pm.db.apply_reencrypted_batch
+    calls = []
+
+    def crashing(user_id, updates, last_entry_id):
+        calls.append(last_entry_id)
+        if len(calls) < fail_on_batch:
+            return apply_batch(user_id, updates, last_entry_id)
+        if partial:
+            with pm.db.transaction():
+                apply_batch(user_id, updates, last_entry_id)
+                raise Crash
+        raise Crash
+
+    pm.db.apply_reencrypted_batch = crashing
+    success, _ = pm.change_master_password(OLD_PASSWORD, NEW_PASSWORD)
+    journal = pm.db.get_reencryption_journal(pm.db.get_master_user('alice')['id'])
+    pm.close()
+
+    assert not success
+    return calls, journal
+
+
+def assert_all_under_new_key(path):
+    """كل المدخلات تُفك بالمفتاح الجديد فقط وبقيمها الأصلية"""
+    pm = PasswordManager(path)
+    try:
+        assert not pm.login('alice', OLD_PASSWORD)[0]
+        assert pm.login('alice', NEW_PASSWORD)[0]
+        assert pm.db.get_reencryption_journal(pm.current_user_id) is None
+
+        cipher = pm.crypto.create_session_cipher(pm.master_key)
+        seen = 0
+        for batch in pm.db.iter_encrypted_entries(pm.current_user_id):
+            for entry in batch:
+                i = int(entry['title'].split('-')[1])
+                assert cipher.decrypt_blob(entry['password_blob']) == f'secret-{i}'
+                notes = entry['notes_blob']
+                assert (cipher.decrypt_blob(notes) if notes else None) == (f'notes-{i}' if i % 3 else None)
+                seen += 1
+        assert seen == ENTRY_COUNT
+    finally:
+        pm.close()
+
+
+@pytest.mark.parametrize('partial', [False, True], ids=['between-batches', 'mid-batch'])
+def test_interruption_keeps_journal_at_last_saved_batch(vault_path, partial):
+    calls, journal = interrupt_change(vault_path, fail_on_batch=3, partial=partial)
+
+    # الدفعتان الأوليان فقط محفوظتان، والدفعة المنقطعة لم تُحفظ منها أي مدخلات
+    assert journal is not None
+    assert journal['last_entry_id'] == calls[1]
+
+
+@pytest.mark.parametrize('password', [OLD_PASSWORD, NEW_PASSWORD], ids=['old', 'new'])
+@pytest.mark.parametrize('partial', [False, True], ids=['between-batches', 'mid-batch'])
+def test_resume_with_either_password(vault_path, password, partial):
+    interrupt_change(vault_path, fail_on_batch=3, partial=partial)
+
+    pm = PasswordManager(vault_path)
+    try:
+        success, _ = pm.login('alice', password)
+        assert success
+        assert len(pm.decrypt_all_entries()) == ENTRY_COUNT
+    finally:
+        pm.close()
+
+    assert_all_under_new_key(vault_path)
+
+
+def test_wrong_password_does_not_resume(vault_path):
+    _, journal = interrupt_change(vault_path, fail_on_batch=2)
+
+    pm = PasswordManager(vault_path)
+    try:
+        assert not pm.login('alice', 'not-the-password')[0]
+        user_id = pm.db.get_master_user('alice')['id']
+        assert pm.db.get_reencryption_journal(user_id)['last_entry_id'] == journal['last_entry_id']
+    finally:
+        pm.close()
+
+
+def test_uninterrupted_change_reencrypts_everything(vault_path):
+    pm = PasswordManager(vault_path)
+    pm.REENCRYPT_BATCH_SIZE = BATCH_SIZE
+    try:
+        assert pm.login('alice', OLD_PASSWORD)[0]
+        assert pm.change_master_password(OLD_PASSWORD, NEW_PASSWORD)[0]
+    finally:
+        pm.close()
+
+    assert_all_under_new_key(vault_path)
+
+
+def test_progress_reported_per_batch(vault_path):
+    pm = PasswordManager(vault_path)
+    pm.REENCRYPT_BATCH_SIZE = BATCH_SIZE
+    reports = []
+    try:
+        assert pm.login('alice', OLD_PASSWORD)[0]
+        assert pm.change_master_password(
+            OLD_PASSWORD, NEW_PASSWORD, lambda processed, rate: reports.append((processed, rate))
+        )[0]
+    finally:
+        pm.close()
+
+    assert [processed for processed, _ in reports] == [5, 10, 15, 20, ENTRY_COUNT]
+    assert all(rate >= 0 for _, rate in reports)
@@ -0,0 +1,92 @@
+"""اختبارات فهرس البحث FTS5 ومزامنته والبحث البديل بـ LIKE"""
+import pytest
+
+BLOB = b'\x02' + b'\0' * 28
+
+
+@pytest.fixture
+def vault(file_db):
+    """قاعدة SQLite بمستخدم وثلاثة مدخلات"""
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    for entry in [
+        {'title': 'GitHub', 'username': 'octocat', 'url': 'https://github.com', 'category': 'عمل'},
+        {'title': 'Gmail', 'email': 'alice@example.com', 'category': 'شخصي'},
+        {'title': 'Bank of Café', 'username': 'alice99', 'category': 'مالية'},
+    ]:
+        file_db.add_password_entry(user_id, entry, BLOB)
+    return file_db, user_id
+
+
+def titles(db, user_id, query):
+    """عناوين نتائج البحث مرتبة أبجدياً"""
+    return sorted(entry['title'] for entry in db.search_entries(user_id, query))
+
+
+def check_index(db):
+    """فحص تطابق الفهرس مع جدول المحتوى (يرفع خطأ عند عدم التطابق)"""
+    with db.connections.write() as conn:
+        conn.execute("INSERT INTO passwords_fts (passwords_fts) VALUES ('integrity-check')")
+
+
+def test_prefix_and_multi_word_queries(vault):
+    db, user_id = vault
+    assert db.search_index_enabled
+
+    assert titles(db, user_id, 'git') == ['GitHub']
+    assert titles(db, user_id, 'exam') == ['Gmail']
+    assert titles(db, user_id, 'alice') == ['Bank of Café', 'Gmail']
+    assert titles(db, user_id, 'bank cafe') == ['Bank of Café']
+    assert titles(db, user_id, 'عمل') == ['GitHub']
+    assert titles(db, user_id, '"*') == []
+    assert titles(db, user_id, '  ') == []
+
+
+def test_title_matches_rank_first(vault):
+    db, user_id = vault
+    db.add_password_entry(user_id, {'title': 'Forum', 'username': 'github-fan'}, BLOB)
+
+    assert [entry['title'] for entry in db.search_entries(user_id, 'github')][0] == 'GitHub'
+
+
+def test_index_follows_update_and_delete(vault):
+    db, user_id = vault
+    github = db.search_entries(user_id, 'github')[0]
+
+    db.update_password_entry(user_id, github['id'], {'title': 'GitLab', 'url': 'https://gitlab.com'})
+    assert titles(db, user_id, 'github') == []
+    assert titles(db, user_id, 'gitlab') == ['GitLab']
+
+    # تحديث كلمة المرور وحدها لا يمس الفهرس
+    db.update_password_entry(user_id, github['id'], {}, encrypted_password=BLOB)
+    assert titles(db, user_id, 'gitlab') == ['GitLab']
+
+    db.delete_password_entry(user_id, github['id'])
+    assert titles(db, user_id, 'gitlab') == []
+    check_index(db)
+
+
+def test_results_are_scoped_to_user(vault):
+    db, user_id = vault
+    other = db.create_master_user('bob', 'hash', b'\0' * 16)
+    theirs = db.add_password_entry(other, {'title': 'GitHub'}, BLOB)
+
+    assert theirs not in [entry['id'] for entry in db.search_entries(user_id, 'github')]
+    assert [entry['id'] for entry in db.search_entries(other, 'github')] == [theirs]
+
+
+def test_like_fallback_without_fts(vault):
+    db, user_id = vault
+    with db.transaction() as cursor:
+        cursor.execute("DROP TABLE passwords_fts")
+        for trigger in ('insert', 'delete', 'update'):
+            cursor.execute(f"DROP TRIGGER passwords_fts_{trigger}")
+    db._search_index_enabled = None
+
+    assert not db.search_index_enabled
+    # البديل يطابق أي جزء من النص لا بدايات الكلمات فقط
+    assert titles(db, user_id, 'hub') == ['GitHub']
+    assert titles(db, user_id, 'example.com') == ['Gmail']
+    assert titles(db, user_id, '') == []
+
+    db.add_password_entry(user_id, {'title': 'Hubspot'}, BLOB)
+    assert titles(db, user_id, 'hub') == ['GitHub', 'Hubspot']
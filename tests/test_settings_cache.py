@@ -0,0 +1,96 @@
+"""اختبارات الذاكرة المؤقتة لإعدادات المستخدمين"""
+import pytest
+
+
+class Boom(Exception):
+    """خطأ مصطنع لإلغاء المعاملة"""
+
+
+def write_behind_cache(db, user_id, **values):
+    """تعديل صف الإعدادات مباشرة دون المرور بإبطال الذاكرة المؤقتة"""
+    assignments = ', '.join(f"{name} = ?" for name in values)
+    with db.connections.write() as conn:
+        conn.execute(f"UPDATE settings SET {assignments} WHERE user_id = ?", [*values.values(), user_id])
+
+
+def test_partial_updates_merge(db, user_id):
+    db.update_user_settings(user_id, {'theme': 'light'})
+    db.update_user_settings(user_id, {'clipboard_timeout': 10})
+
+    settings = db.get_user_settings(user_id)
+    assert (settings['theme'], settings['clipboard_timeout']) == ('light', 10)
+    assert settings['auto_lock_timeout'] == 300
+
+
+def test_returned_settings_are_copies(db, user_id):
+    db.update_user_settings(user_id, {'theme': 'light'})
+
+    db.get_user_settings(user_id)['theme'] = 'changed'
+
+    assert db.get_user_settings(user_id)['theme'] == 'light'
+
+
+def test_unknown_keys_are_rejected(db, user_id):
+    db.update_user_settings(user_id, {})
+
+    with pytest.raises(ValueError):
+        db.update_user_settings(user_id, {'theme': 'light', 'password': 'x'})
+    assert db.get_user_settings(user_id)['theme'] == 'dark'
+
+
+def test_rollback_does_not_poison_cache(db, user_id):
+    db.update_user_settings(user_id, {'theme': 'light'})
+    db.get_user_settings(user_id)
+
+    with pytest.raises(Boom):
+        with db.transaction():
+            db.update_user_settings(user_id, {'theme': 'dark'})
+            assert db.get_user_settings(user_id)['theme'] == 'dark'
+            raise Boom()
+
+    assert db.get_user_settings(user_id)['theme'] == 'light'
+
+
+def test_second_read_is_served_from_cache(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    file_db.update_user_settings(user_id, {'theme': 'light'})
+    assert file_db.get_user_settings(user_id)['theme'] == 'light'
+
+    write_behind_cache(file_db, user_id, theme='blue')
+    assert file_db.get_user_settings(user_id)['theme'] == 'light'
+
+    file_db.invalidate_settings(user_id)
+    assert file_db.get_user_settings(user_id)['theme'] == 'blue'
+
+    write_behind_cache(file_db, user_id, theme='green')
+    file_db.invalidate_settings()
+    assert file_db.get_user_settings(user_id)['theme'] == 'green'
+
+
+def test_reads_inside_transaction_are_not_cached(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    file_db.update_user_settings(user_id, {'theme': 'light'})
+
+    with file_db.transaction():
+        assert file_db.get_user_settings(user_id)['theme'] == 'light'
+        assert user_id not in file_db._settings_cache
+
+
+def test_stale_read_racing_an_update_is_not_cached(file_db, monkeypatch):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+    file_db.update_user_settings(user_id, {'theme': 'light'})
+    query = file_db._query
+
+    def racing_query(conn, record, sql, params=()):
+        # تحديث يُحفظ في خيط آخر بعد أن قرأ هذا الخيط الصف القديم
+        cursor = query(conn, record, sql, params)
+        write_behind_cache(file_db, user_id, theme='dark')
+        file_db.invalidate_settings(user_id)
+        return cursor
+
+    monkeypatch.setattr(file_db, '_query', racing_query)
+    file_db.get_user_settings(user_id)
+    monkeypatch.undo()
+
+    assert user_id not in file_db._settings_cache
+    assert file_db.get_user_settings(user_id)['theme'] == 'dark'
@@ -0,0 +1,175 @@
+"""اختبارات المعاملات المتداخلة وسجل التدقيق في محركات التخزين"""
+import sqlite3
+import threading
+
+import pytest
+
+from password_manager import PasswordManager
+
+
+class Boom(Exception):
+    """خطأ متعمد لإلغاء كتلة معاملة"""
+
+
+def titles(db, user_id):
+    """عناوين مدخلات المستخدم المحفوظة"""
+    return sorted(entry['title'] for entry in db.get_all_entries(user_id))
+
+
+def actions(db, user_id):
+    """إجراءات سجل التدقيق المكتوبة من الأقدم إلى الأحدث"""
+    return [log['action'] for log in reversed(db.get_audit_logs(user_id, 100))]
+
+
+def test_nested_savepoint_rollback_keeps_outer_work(db, user_id):
+    with db.transaction():
+        db.add_password_entry(user_id, {'title': 'outer'}, b'blob')
+
+        with pytest.raises(Boom):
+            with db.transaction():
+                db.add_password_entry(user_id, {'title': 'inner'}, b'blob')
+                raise Boom
+
+        db.add_password_entry(user_id, {'title': 'after'}, b'blob')
+
+    assert titles(db, user_id) == ['after', 'outer']
+
+
+def test_doubly_nested_rollback_only_undoes_its_level(db, user_id):
+    with db.transaction():
+        with db.transaction():
+            db.add_password_entry(user_id, {'title': 'level-1'}, b'blob')
+
+            with pytest.raises(Boom):
+                with db.transaction():
+                    db.add_password_entry(user_id, {'title': 'level-2'}, b'blob')
+                    raise Boom
+
+    assert titles(db, user_id) == ['level-1']
+
+
+def test_outer_rollback_discards_released_savepoints(db, user_id):
+    with pytest.raises(Boom):
+        with db.transaction():
+            with db.transaction():
+                db.add_password_entry(user_id, {'title': 'released'}, b'blob')
+            raise Boom
+
+    assert titles(db, user_id) == []
+
+
+def test_failed_import_entry_rolls_back_alone(db, user_id):
+    imported = ['one', 'broken', 'three']
+    failed = []
+
+    with db.transaction():
+        for title in imported:
+            try:
+                with db.transaction():
+                    db.add_password_entry(user_id, {'title': title}, b'blob')
+                    if title == 'broken':
+                        raise Boom
+            except Boom:
+                failed.append(title)
+
+    assert failed == ['broken']
+    assert titles(db, user_id) == ['one', 'three']
+    assert actions(db, user_id) == ['ADD_PASSWORD', 'ADD_PASSWORD']
+
+
+def test_constraint_violation_rolls_back_alone(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+
+    with file_db.transaction():
+        file_db.add_password_entry(user_id, {'title': 'one'}, b'blob')
+        with pytest.raises(sqlite3.IntegrityError):
+            file_db.add_password_entry(user_id, {'title': None}, b'blob')
+
+    assert titles(file_db, user_id) == ['one']
+    assert actions(file_db, user_id) == ['ADD_PASSWORD']
+
+
+def test_failed_bulk_import_adds_nothing(db, user_id):
+    def entries():
+        yield {'title': 'one'}, b'blob', None
+        raise Boom
+
+    with pytest.raises(Boom):
+        db.add_password_entries_bulk(user_id, entries(), source='import.json')
+
+    assert titles(db, user_id) == []
+    assert 'IMPORT' not in actions(db, user_id)
+
+
+def test_audit_records_dropped_on_rollback(db, user_id):
+    with pytest.raises(Boom):
+        with db.transaction():
+            db.add_password_entry(user_id, {'title': 'gone'}, b'blob')
+            db.add_audit_log(user_id, "CUSTOM", "rolled back")
+            raise Boom
+
+    assert actions(db, user_id) == []
+
+
+def test_audit_records_dropped_with_their_savepoint(db, user_id):
+    with db.transaction():
+        db.add_audit_log(user_id, "KEPT")
+
+        with pytest.raises(Boom):
+            with db.transaction():
+                db.add_audit_log(user_id, "DROPPED")
+                raise Boom
+
+    assert actions(db, user_id) == ['KEPT']
+
+
+def test_audit_records_written_only_after_commit(file_db):
+    user_id = file_db.create_master_user('alice', 'hash', b'\0' * 16)
+
+    with file_db.transaction():
+        file_db.add_audit_log(user_id, "PENDING")
+        assert file_db.flush_audit_log() is False
+        assert actions(file_db, user_id) == []
+
+    assert actions(file_db, user_id) == ['PENDING']
+
+
+def test_snapshot_does_not_block_writers(file_db):
+    db = file_db
+    user_id = db.create_master_user('alice', 'hash', b'\0' * 16)
+    db.add_password_entry(user_id, {'title': 'before'}, b'blob')
+
+    with db.snapshot():
+        assert not db.connections.owns_writer()
+
+        # الكتابة من خيط آخر تنتهي أثناء اللقطة ولا تظهر فيها
+        writer = threading.Thread(
+            target=db.add_password_entry, args=(user_id, {'title': 'during'}, b'blob')
+        )
+        writer.start()
+        writer.join(timeout=5)
+        assert not writer.is_alive()
+        assert titles(db, user_id) == ['before']
+
+    assert titles(db, user_id) == ['before', 'during']
+
+
+def test_export_reads_from_snapshot_without_writer(tmp_path):
+    pm = PasswordManager(str(tmp_path / 'vault.db'))
+    try:
+        assert pm.register_user('alice', 'export-password')[0]
+        assert pm.login('alice', 'export-password')[0]
+        assert pm.add_password({'title': 'site', 'password': 'secret'})[0]
+
+        decrypt_all_entries = pm.decrypt_all_entries
+        held = []
+
+        def tracking(*args, **kwargs):
+            held.append(pm.db.connections.owns_writer())
+            return decrypt_all_entries(*args, **kwargs)
+
+        pm.decrypt_all_entries = tracking
+        assert pm.export_passwords(str(tmp_path / 'export.json'), 'file-password')[0]
+        assert held == [False]
+    finally:
+        pm.close()